@@ -0,0 +1,351 @@
+import asyncio
+import bisect
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+import aiohttp
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from config import settings
+from health import BACKFILL_GAPS, BACKFILL_POINTS, require_admin
+from scheduler import is_market_open
+from sharding import coordinator
+from sources import binance_ws, yahoo_finance
+from symbols import registry
+from ticks import Tick
+from writers.influxdb_writer import InfluxDBWriter
+
+logger = logging.getLogger("market-feeder.backfill")
+
+SOURCE = "backfill"
+# Longest range one history request covers: a day of Yahoo 1m bars, KLINES_LIMIT Binance bars
+MAX_SPAN_NS = {
+    "yahoo": 86_400 * 1_000_000_000,
+    "binance": binance_ws.KLINES_LIMIT * 60 * 1_000_000_000,
+}
+# Step used to check whether a market was in session at some point of a gap
+SESSION_STEP = timedelta(minutes=5)
+# Pause between checks while the writer queue is more than half full
+BACKPRESSURE_WAIT = 0.5
+# Longest lookback accepted on demand: Yahoo keeps 1-minute bars for a few weeks at most
+MAX_LOOKBACK_HOURS = 7 * 24
+
+# Interval between consecutive points longer than minGap, ending at _time
+_GAPS = """
+from(bucket: params.bucket)
+  |> range(start: params.start)
+  |> filter(fn: (r) => r._measurement == "price" and r._field == "last" and r.exchange == params.exchange)
+  |> elapsed(unit: 1s)
+  |> filter(fn: (r) => r.elapsed > params.minGap)
+  |> keep(columns: ["_time", "symbol", "elapsed"])
+"""
+
+_LAST = """
+from(bucket: params.bucket)
+  |> range(start: params.start)
+  |> filter(fn: (r) => r._measurement == "price" and r._field == "last" and r.exchange == params.exchange)
+  |> last()
+  |> keep(columns: ["_time", "symbol"])
+"""
+
+Fetcher = Callable[[aiohttp.ClientSession, str, int, int], Awaitable[list[Tick]]]
+_FETCHERS: dict[str, Fetcher] = {
+    "yahoo": yahoo_finance.fetch_history,
+    "binance": binance_ws.fetch_klines,
+}
+
+
+def _ns(when: datetime) -> int:
+    return int(when.timestamp() * 1_000_000) * 1000
+
+
+def _in_session(asset_type: str, start_ns: int, end_ns: int) -> bool:
+    """Whether the market for ``asset_type`` was open at some point between two times."""
+    when = datetime.fromtimestamp(start_ns / 1e9, timezone.utc)
+    end = datetime.fromtimestamp(end_ns / 1e9, timezone.utc)
+    while when < end:
+        if is_market_open(asset_type, when):
+            return True
+        when += SESSION_STEP
+    return False
+
+
+def _windows(gaps: list[tuple[int, int]], span: int) -> list[tuple[int, int]]:
+    """Cover sorted ``gaps`` with as few fetch windows of at most ``span`` as possible."""
+    windows: list[tuple[int, int]] = []
+    for start, end in gaps:
+        if windows and end - windows[-1][0] <= span:
+            windows[-1] = (windows[-1][0], end)
+            continue
+        while end - start > span:
+            windows.append((start, start + span))
+            start += span
+        windows.append((start, end))
+    return windows
+
+
+def _min_gap() -> int:
+    """BACKFILL_MIN_GAP, raised above the longest silence of a healthy series.
+
+    With the change filter on, an unchanged price is only written again after
+    CHANGE_FILTER_HEARTBEAT seconds, at the next poll, so shorter intervals
+    between points are not gaps.
+    """
+    if not settings.change_filter_enabled:
+        return settings.backfill_min_gap
+    quiet = settings.change_filter_heartbeat + max(settings.collection_interval_rest, settings.coingecko_interval)
+    return max(settings.backfill_min_gap, quiet)
+
+
+class Backfiller:
+    """Find holes in the stored price series and fill them from history APIs.
+
+    Gaps are found with two cheap Flux queries per exchange: intervals
+    between consecutive ``last`` points longer than ``backfill_min_gap``,
+    and the time since each series' last point. Yahoo gaps during which the
+    market never opened are skipped. Gaps are fetched as 1-minute closes
+    (Yahoo charts, Binance klines), a few series at a time, and only the
+    bars inside a gap are written, through the writer, as source ``backfill``.
+
+    Bars are stamped at their close, so re-running a range overwrites the
+    same points instead of duplicating them. A checkpoint file records, per
+    series, the time up to which gaps were filled; an interrupted run resumes
+    from there. While the writer queue is more than half full, backfill waits
+    so live sources keep their share of it. Only symbols this shard owns are
+    backfilled.
+    """
+
+    def __init__(self):
+        self._checkpoint: dict[str, int] = {}
+        self._wake: asyncio.Event | None = None
+        self._requested_hours: int | None = None
+        self._running = False
+        self._last_run = 0.0
+        self._last_duration = 0.0
+        self._last_gaps = 0
+        self._last_points = 0
+        self._failed: list[str] = []
+
+    def trigger(self, hours: int | None = None) -> dict:
+        """Queue a run over the last ``hours`` (default BACKFILL_LOOKBACK_HOURS)."""
+        if self._wake is None:
+            raise RuntimeError("backfill is not running")
+        self._requested_hours = hours
+        self._wake.set()
+        return {"queued": True, "running": self._running, "lookback_hours": hours or settings.backfill_lookback_hours}
+
+    async def run(self, writer: InfluxDBWriter, session: aiohttp.ClientSession, stop_event: asyncio.Event):
+        """Backfill after BACKFILL_STARTUP_DELAY, then every BACKFILL_INTERVAL and when triggered."""
+        if not settings.backfill_enabled:
+            logger.info("Backfill disabled, skipping")
+            return
+
+        self._wake = asyncio.Event()
+        self._load_checkpoint()
+        # Let the live sources and the shard claim settle before the first scan
+        delay = settings.backfill_startup_delay
+        logger.info("Backfill started — first scan in %.0fs", delay)
+        try:
+            while True:
+                await self._sleep(stop_event, delay)
+                if stop_event.is_set():
+                    break
+                self._wake.clear()
+                hours = self._requested_hours or settings.backfill_lookback_hours
+                self._requested_hours = None
+                try:
+                    await self._run_once(writer, session, stop_event, hours)
+                except Exception:
+                    logger.exception("Backfill run failed")
+                delay = settings.backfill_interval or None
+        finally:
+            self._wake = None
+            logger.info("Backfill stopped")
+
+    async def _sleep(self, stop_event: asyncio.Event, timeout: float | None):
+        waiters = [asyncio.create_task(stop_event.wait()), asyncio.create_task(self._wake.wait())]
+        try:
+            await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+    def _series(self) -> dict[str, dict[str, tuple[str, str]]]:
+        """Per exchange, the owned symbols mapped to (provider symbol, asset type)."""
+        return {
+            "yahoo": {
+                instrument.symbol: (instrument.providers["yahoo"], instrument.asset_type)
+                for instrument in registry.for_provider("yahoo")
+                if coordinator.owns(instrument.symbol)
+            } if settings.yahoo_finance_enabled else {},
+            "binance": {symbol: (pair, "crypto") for pair, symbol in binance_ws.stream_manager.streamed().items()},
+        }
+
+    async def _run_once(self, writer: InfluxDBWriter, session: aiohttp.ClientSession, stop_event: asyncio.Event, hours: int):
+        started = time.monotonic()
+        self._running = True
+        self._failed = []
+        now = datetime.now(timezone.utc)
+        query_api = writer.query_api()
+        semaphore = asyncio.Semaphore(max(1, settings.backfill_concurrency))
+        jobs = []
+        gap_count = 0
+        try:
+            for exchange, series in self._series().items():
+                if not series:
+                    continue
+                gaps = await self._find_gaps(query_api, exchange, series, now - timedelta(hours=hours), now)
+                for symbol, symbol_gaps in gaps.items():
+                    gap_count += len(symbol_gaps)
+                    BACKFILL_GAPS.labels(exchange=exchange).inc(len(symbol_gaps))
+                    provider_symbol = series[symbol][0]
+                    jobs.append(self._fill(writer, session, stop_event, semaphore, exchange, symbol, provider_symbol, symbol_gaps))
+
+            logger.info("Backfill scanning %dh — %d gaps in %d series", hours, gap_count, len(jobs))
+            self._last_gaps = gap_count
+            self._last_points = sum(await asyncio.gather(*jobs))
+        finally:
+            self._running = False
+            self._last_run = time.time()
+            self._last_duration = time.monotonic() - started
+        logger.info(
+            "Backfill done in %.1fs — %d points written, %d series failed",
+            self._last_duration, self._last_points, len(self._failed),
+        )
+
+    async def _find_gaps(
+        self, query_api, exchange: str, series: dict[str, tuple[str, str]], start: datetime, now: datetime,
+    ) -> dict[str, list[tuple[int, int]]]:
+        """Gaps per symbol as (start, end) nanosecond pairs, oldest first, not yet checkpointed."""
+        min_gap = _min_gap()
+        params = {"bucket": settings.influxdb_bucket, "start": start, "exchange": exchange, "minGap": min_gap}
+        found: dict[str, list[tuple[int, int]]] = {symbol: [] for symbol in series}
+
+        for table in await query_api.query(_GAPS, params=params):
+            for record in table.records:
+                symbol = record.values.get("symbol")
+                if symbol in found:
+                    end = _ns(record.get_time())
+                    found[symbol].append((end - int(record.values["elapsed"]) * 1_000_000_000, end))
+
+        # Time since each series' last point (or the whole window if it has none)
+        last_seen = {}
+        for table in await query_api.query(_LAST, params=params):
+            for record in table.records:
+                last_seen[record.values.get("symbol")] = _ns(record.get_time())
+        now_ns, start_ns = _ns(now), _ns(start)
+        for symbol in series:
+            last = last_seen.get(symbol, start_ns)
+            if now_ns - last > min_gap * 1_000_000_000:
+                found[symbol].append((last, now_ns))
+
+        gaps = {}
+        for symbol, symbol_gaps in found.items():
+            done = self._checkpoint.get(f"{exchange}:{symbol}", 0)
+            asset_type = series[symbol][1]
+            kept = sorted(
+                (max(gap_start, done), gap_end) for gap_start, gap_end in symbol_gaps
+                if gap_end > done and _in_session(asset_type, max(gap_start, done), gap_end)
+            )
+            if kept:
+                gaps[symbol] = kept
+        return gaps
+
+    async def _fill(
+        self,
+        writer: InfluxDBWriter,
+        session: aiohttp.ClientSession,
+        stop_event: asyncio.Event,
+        semaphore: asyncio.Semaphore,
+        exchange: str,
+        symbol: str,
+        provider_symbol: str,
+        gaps: list[tuple[int, int]],
+    ) -> int:
+        """Fetch and write the bars inside ``gaps``, checkpointing after each window."""
+        fetch = _FETCHERS[exchange]
+        starts = [start for start, _ in gaps]
+        key = f"{exchange}:{symbol}"
+        written = 0
+        async with semaphore:
+            try:
+                for window_start, window_end in _windows(gaps, MAX_SPAN_NS[exchange]):
+                    if stop_event.is_set():
+                        break
+                    points = []
+                    for tick in await fetch(session, provider_symbol, window_start, window_end):
+                        i = bisect.bisect_left(starts, tick.time) - 1
+                        if i >= 0 and tick.time < gaps[i][1]:
+                            points.append(tick)
+                    if points:
+                        await self._write(writer, points)
+                        BACKFILL_POINTS.labels(exchange=exchange).inc(len(points))
+                        written += len(points)
+                    self._checkpoint[key] = max(self._checkpoint.get(key, 0), window_end)
+                    self._save_checkpoint()
+            except Exception as e:
+                self._failed.append(key)
+                logger.warning("Backfill of %s failed after %d points: %s", key, written, e)
+        return written
+
+    async def _write(self, writer: InfluxDBWriter, points: list[Tick]):
+        # Leave the writer queue to the live sources while it is busy
+        while writer.backlog > settings.writer_queue_size // 2:
+            await asyncio.sleep(BACKPRESSURE_WAIT)
+        await writer.write_points(points, source=SOURCE)
+
+    def _load_checkpoint(self):
+        try:
+            with open(settings.backfill_checkpoint_file) as f:
+                self._checkpoint = {key: int(value) for key, value in json.load(f).items()}
+            logger.info("Backfill checkpoint loaded — %d series", len(self._checkpoint))
+        except FileNotFoundError:
+            self._checkpoint = {}
+        except (OSError, ValueError, AttributeError):
+            logger.exception("Unreadable backfill checkpoint %s — starting over", settings.backfill_checkpoint_file)
+            self._checkpoint = {}
+
+    def _save_checkpoint(self):
+        path = settings.backfill_checkpoint_file
+        tmp = f"{path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(self._checkpoint, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("Cannot save backfill checkpoint %s: %s", path, e)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.backfill_enabled,
+            "running": self._running,
+            "last_run": round(self._last_run, 1),
+            "last_duration_s": round(self._last_duration, 1),
+            "last_gaps": self._last_gaps,
+            "last_points": self._last_points,
+            "failed": self._failed,
+            "checkpointed_series": len(self._checkpoint),
+        }
+
+
+backfiller = Backfiller()
+
+router = APIRouter(prefix="/admin/backfill", dependencies=[Depends(require_admin)])
+
+
+@router.get("")
+async def get_backfill():
+    return backfiller.stats()
+
+
+@router.post("", status_code=202)
+async def post_backfill(hours: int | None = Query(None, ge=1, le=MAX_LOOKBACK_HOURS)):
+    try:
+        return backfiller.trigger(hours)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
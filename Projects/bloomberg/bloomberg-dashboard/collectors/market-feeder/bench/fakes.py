@@ -0,0 +1,246 @@
+"""Local stand-ins for Binance, Yahoo Finance, CoinGecko and InfluxDB.
+
+Run in a separate process by ``bench.run`` so their CPU time does not count
+against the feeder under test.
+"""
+import asyncio
+import json
+import random
+import time
+from array import array
+
+from aiohttp import web
+
+# Messages are sent in bursts on this period to reach the target rate
+_SEND_PERIOD = 0.01
+
+
+class _Walk:
+    """Random-walk prices so the change filter sees real movement."""
+
+    def __init__(self):
+        self._prices: dict[str, float] = {}
+
+    def next(self, symbol: str) -> float:
+        price = self._prices.get(symbol, random.uniform(1, 1000))
+        price *= 1 + random.gauss(0, 0.0005)
+        self._prices[symbol] = price
+        return round(price, 6)
+
+
+def _ticker(symbol: str, price: float) -> dict:
+    return {
+        "e": "24hrTicker",
+        "E": time.time_ns() // 1_000_000,
+        "s": symbol,
+        "c": f"{price}",
+        "b": f"{price * 0.9999:.6f}",
+        "a": f"{price * 1.0001:.6f}",
+        "v": f"{random.uniform(1e3, 1e6):.2f}",
+        "P": f"{random.uniform(-5, 5):.3f}",
+    }
+
+
+class FakeBinance:
+    """Combined-stream WebSocket server streaming ticker events at ``rate`` messages per second.
+
+    Clients subscribe with SUBSCRIBE/UNSUBSCRIBE control messages, as on the
+    real endpoint. The rate is shared across connections in proportion to
+    their streams. Messages are synthetic tickers for the subscribed pairs
+    or, with ``replay``, the recorded ticker events (one raw event per JSONL
+    line) for those pairs, looped with a fresh event time.
+    """
+
+    def __init__(self, rate: float, replay: str | None = None):
+        self._rate = rate
+        self._walk = _Walk()
+        self._subscribed = 0
+        self._recorded: dict[str, list[dict]] = {}
+        if replay:
+            with open(replay) as f:
+                for line in f:
+                    if line.strip():
+                        event = json.loads(line)
+                        self._recorded.setdefault(event["s"], []).append(event)
+
+    def _event(self, pair: str, i: int) -> str:
+        recorded = self._recorded.get(pair)
+        if recorded:
+            event = dict(recorded[i % len(recorded)])
+            event["E"] = time.time_ns() // 1_000_000
+        else:
+            event = _ticker(pair, self._walk.next(pair))
+        # Compact separators, like the real endpoint
+        return json.dumps({"stream": f"{pair.lower()}@ticker", "data": event}, separators=(",", ":"))
+
+    async def _control(self, ws: web.WebSocketResponse, pairs: set[str]):
+        async for msg in ws:
+            if msg.type != web.WSMsgType.TEXT:
+                continue
+            request = json.loads(msg.data)
+            streams = {p.split("@")[0].upper() for p in request.get("params", [])}
+            before = len(pairs)
+            if request.get("method") == "SUBSCRIBE":
+                pairs |= streams
+            elif request.get("method") == "UNSUBSCRIBE":
+                pairs -= streams
+            self._subscribed += len(pairs) - before
+            await ws.send_str(json.dumps({"result": None, "id": request.get("id")}))
+
+    async def handle(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        pairs: set[str] = set()
+        control = asyncio.create_task(self._control(ws, pairs))
+        loop = asyncio.get_running_loop()
+        last = loop.time()
+        owed = 0.0
+        i = 0
+        try:
+            while not ws.closed:
+                await asyncio.sleep(_SEND_PERIOD)
+                now = loop.time()
+                if pairs:
+                    owed += (now - last) * self._rate * len(pairs) / max(1, self._subscribed)
+                    order = sorted(pairs)
+                    while owed >= 1:
+                        await ws.send_str(self._event(order[i % len(order)], i))
+                        i += 1
+                        owed -= 1
+                last = now
+        except ConnectionResetError:
+            pass  # feeder went away mid-send
+        finally:
+            self._subscribed -= len(pairs)
+            control.cancel()
+        return ws
+
+
+class FakeYahoo:
+    def __init__(self):
+        self._walk = _Walk()
+
+    async def cookie(self, request: web.Request) -> web.Response:
+        # Like fc.yahoo.com: a 404 that still sets the session cookie
+        resp = web.Response(status=404)
+        resp.set_cookie("A3", "bench")
+        return resp
+
+    async def crumb(self, request: web.Request) -> web.Response:
+        if "A3=bench" not in request.headers.get("Cookie", ""):
+            return web.Response(status=401)
+        return web.Response(text="bench-crumb")
+
+    async def quote(self, request: web.Request) -> web.Response:
+        if request.query.get("crumb") != "bench-crumb":
+            return web.Response(status=401)
+        result = []
+        for symbol in request.query.get("symbols", "").split(","):
+            price = self._walk.next(symbol)
+            result.append({
+                "symbol": symbol,
+                "regularMarketPrice": price,
+                "regularMarketChangePercent": random.uniform(-2, 2),
+                "regularMarketVolume": random.randint(1, 10**7),
+                "bid": price * 0.9999,
+                "ask": price * 1.0001,
+            })
+        return web.json_response({"quoteResponse": {"result": result, "error": None}})
+
+    async def chart(self, request: web.Request) -> web.Response:
+        price = self._walk.next(request.match_info["ticker"])
+        return web.json_response({"chart": {"result": [{
+            "meta": {"regularMarketPrice": price, "chartPreviousClose": price * 0.99},
+            "indicators": {"quote": [{"volume": [1000], "high": [price * 1.01], "low": [price * 0.99]}]},
+        }]}})
+
+
+class FakeCoinGecko:
+    def __init__(self):
+        self._walk = _Walk()
+
+    async def markets(self, request: web.Request) -> web.StreamResponse:
+        ids = [coin for coin in request.query.get("ids", "").split(",") if coin]
+        per_page = int(request.query.get("per_page", 100))
+        page = int(request.query.get("page", 1))
+        coins = [{
+            "id": coin,
+            "current_price": self._walk.next(coin),
+            "total_volume": random.uniform(1e6, 1e9),
+            "price_change_percentage_24h": random.uniform(-5, 5),
+            "market_cap": random.uniform(1e9, 1e12),
+            "last_updated": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+        } for coin in ids[(page - 1) * per_page:page * per_page]]
+        # Stream in small chunks so the client's incremental parser is exercised
+        body = json.dumps(coins).encode()
+        resp = web.StreamResponse(headers={"Content-Type": "application/json"})
+        await resp.prepare(request)
+        for i in range(0, len(body), 4096):
+            await resp.write(body[i:i + 4096])
+        await resp.write_eof()
+        return resp
+
+
+class FakeInflux:
+    """Accept line-protocol writes and record point-timestamp → ack latency.
+
+    Only ``price`` lines count towards latency: ``candles`` points are
+    stamped at the start of their bar, not when the tick arrived.
+    """
+
+    def __init__(self):
+        self.points = 0
+        self.writes = 0
+        self.latencies_ns = array("q")
+
+    async def write(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        now = time.time_ns()
+        for line in body.split(b"\n"):
+            if not line:
+                continue
+            ts = line.rsplit(b" ", 1)[-1]
+            self.points += 1
+            if ts.isdigit() and line.startswith((b"price,", b"price ")):
+                self.latencies_ns.append(now - int(ts))
+        self.writes += 1
+        return web.Response(status=204)
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "pass"})
+
+    async def stats(self, request: web.Request) -> web.Response:
+        latencies = sorted(self.latencies_ns)
+        stats = {"points": self.points, "writes": self.writes, "latency_ms": {}}
+        if latencies:
+            for p in (50, 90, 99, 99.9):
+                idx = min(len(latencies) - 1, int(len(latencies) * p / 100))
+                stats["latency_ms"][f"p{p:g}"] = round(latencies[idx] / 1e6, 3)
+            stats["latency_ms"]["max"] = round(latencies[-1] / 1e6, 3)
+        return web.json_response(stats)
+
+    async def reset(self, request: web.Request) -> web.Response:
+        self.points = self.writes = 0
+        self.latencies_ns = array("q")
+        return web.Response(status=204)
+
+
+def build_app(rate: float, replay: str | None) -> web.Application:
+    binance, yahoo, coingecko, influx = FakeBinance(rate, replay), FakeYahoo(), FakeCoinGecko(), FakeInflux()
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_get("/binance/stream", binance.handle)
+    app.router.add_get("/yahoo/cookie", yahoo.cookie)
+    app.router.add_get("/yahoo/v1/test/getcrumb", yahoo.crumb)
+    app.router.add_get("/yahoo/v7/finance/quote", yahoo.quote)
+    app.router.add_get("/yahoo/v8/finance/chart/{ticker}", yahoo.chart)
+    app.router.add_get("/coingecko/coins/markets", coingecko.markets)
+    app.router.add_post("/influx/api/v2/write", influx.write)
+    app.router.add_get("/influx/health", influx.health)
+    app.router.add_get("/influx/bench/stats", influx.stats)
+    app.router.add_post("/influx/bench/reset", influx.reset)
+    return app
+
+
+def serve(port: int, rate: float, replay: str | None = None):
+    """Process entry point: serve every fake on ``port`` until killed."""
+    web.run_app(build_app(rate, replay), host="127.0.0.1", port=port, print=None)
@@ -0,0 +1,174 @@
+"""Offline throughput benchmark for the market feeder.
+
+Starts the fakes from ``bench.fakes`` in a child process, points the feeder
+at them through its settings, runs the real pipeline (sources → filters →
+writer) for a fixed duration and reports:
+
+- points/s acknowledged by the fake InfluxDB
+- point-timestamp → write-ack latency percentiles
+- feeder CPU time per point, worker processes included
+- feeder peak RSS, and that of its largest worker process
+
+Worker processes (DECODE_WORKERS) are only accounted once they have exited,
+so their CPU time covers their whole life, warmup and shutdown included,
+and CPU per point is an upper bound when they are enabled.
+
+Usage (from collectors/market-feeder):
+
+    python -m bench.run --rate 5000 --duration 30
+    python -m bench.run --replay ticks.jsonl --rate 20000 --json result.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import socket
+import sys
+import time
+import urllib.request
+
+# First pairs streamed; --pairs beyond these are synthetic
+BASE_PAIRS = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "BNBUSDT", "XRPUSDT"]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"fake servers did not start at {url}")
+
+
+def _pairs(count: int) -> list[str]:
+    extra = [f"SYN{i:04d}USDT" for i in range(max(0, count - len(BASE_PAIRS)))]
+    return (BASE_PAIRS + extra)[:count]
+
+
+def _parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=2000, help="Binance ticker messages per second")
+    parser.add_argument("--duration", type=float, default=20, help="seconds to measure")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds to run before measuring")
+    parser.add_argument("--pairs", type=int, default=len(BASE_PAIRS), help="Binance pairs to subscribe")
+    parser.add_argument("--replay", help="JSONL file of recorded Binance ticker events to loop")
+    parser.add_argument("--rest-interval", type=int, default=1, help="Yahoo/CoinGecko polling interval")
+    parser.add_argument("--json", dest="json_out", help="also write the report to this file")
+    parser.add_argument(
+        "--set", action="append", default=[], metavar="KEY=VALUE",
+        help="extra feeder setting, e.g. --set BINANCE_CONFLATION_MS=0",
+    )
+    return parser.parse_args(argv)
+
+
+def _children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _reap_workers(server: multiprocessing.Process):
+    """Wait for the feeder's worker processes, so RUSAGE_CHILDREN counts them."""
+    for child in multiprocessing.active_children():
+        if child.pid != server.pid:
+            child.join(timeout=10)
+
+
+def _fetch(request: urllib.request.Request | str) -> bytes:
+    return urllib.request.urlopen(request).read()
+
+
+async def _measure(args: argparse.Namespace, base: str, server: multiprocessing.Process) -> dict:
+    # Imported late: settings are read from the environment at import time
+    from main import run_feeder
+
+    children_start = _children_cpu()
+    stop_event = asyncio.Event()
+    feeder = asyncio.create_task(run_feeder(stop_event))
+    await asyncio.sleep(args.warmup)
+
+    # Off the loop: the feeder under test runs on it
+    await asyncio.to_thread(_fetch, urllib.request.Request(f"{base}/influx/bench/reset", method="POST"))
+    cpu_start, wall_start = time.process_time(), time.monotonic()
+    await asyncio.sleep(args.duration)
+    cpu, wall = time.process_time() - cpu_start, time.monotonic() - wall_start
+    stats = json.loads(await asyncio.to_thread(_fetch, f"{base}/influx/bench/stats"))
+
+    stop_event.set()
+    await feeder
+    await asyncio.to_thread(_reap_workers, server)
+    workers_cpu = _children_cpu() - children_start
+
+    points = stats["points"]
+    return {
+        "offered_rate": args.rate,
+        "duration_s": round(wall, 2),
+        "points": points,
+        "writes": stats["writes"],
+        "points_per_s": round(points / wall, 1),
+        "latency_ms": stats["latency_ms"],
+        "cpu_s": round(cpu, 3),
+        "workers_cpu_s": round(workers_cpu, 3),
+        "cpu_us_per_point": round((cpu + workers_cpu) / points * 1e6, 2) if points else None,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "workers_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def main(argv: list[str] | None = None):
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+
+    from bench import fakes
+    server = multiprocessing.Process(
+        target=fakes.serve, args=(port, args.rate, args.replay), daemon=True
+    )
+    server.start()
+    try:
+        _wait_ready(f"{base}/influx/health")
+        os.environ.update({
+            "INFLUXDB_URL": f"{base}/influx",
+            "INFLUXDB_TOKEN": "bench",
+            "BINANCE_API_KEY": "bench",
+            "BINANCE_WS_URL": f"ws://127.0.0.1:{port}/binance/stream",
+            "BINANCE_SYMBOLS": ",".join(_pairs(args.pairs)),
+            "YAHOO_API_URL": f"{base}/yahoo",
+            "YAHOO_COOKIE_URL": f"{base}/yahoo/cookie",
+            "COINGECKO_API_URL": f"{base}/coingecko",
+            "COLLECTION_INTERVAL_REST": str(args.rest_interval),
+            "COINGECKO_INTERVAL": str(args.rest_interval),
+            "CLOSED_MARKET_INTERVAL": str(args.rest_interval),
+            "YAHOO_REQUESTS_PER_MINUTE": "100000",
+            "COINGECKO_REQUESTS_PER_MINUTE": "100000",
+            "SPOOL_ENABLED": "false",
+            "BACKFILL_ENABLED": "false",
+            "HEALTH_PORT": str(_free_port()),
+            "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+        })
+        for item in args.set:
+            key, _, value = item.partition("=")
+            os.environ[key] = value
+
+        report = asyncio.run(_measure(args, base, server))
+    finally:
+        server.terminate()
+        server.join()
+
+    print(json.dumps(report, indent=2))
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,9 +8,109 @@ class Settings(BaseSettings):
     influxdb_org: str = "bloomberg"
     influxdb_bucket: str = "markets"
 
+    # Write pipeline
+    writer_batch_size: int = 5000
+    writer_flush_interval: float = 1.0
+    writer_queue_size: int = 10000
+
+    # Change filter: skip points whose fields moved less than epsilon (relative),
+    # but still write one every heartbeat seconds
+    change_filter_enabled: bool = True
+    change_filter_epsilon: float = 1e-9
+    change_filter_heartbeat: int = 300
+
+    # OHLC candles built from the tick stream (the kiosk's timeframes, plus 1m for the price charts)
+    candles_enabled: bool = True
+    candle_timeframes: str = "1m,5m,15m,1h,4h,1d"
+    candle_flush_interval: float = 10.0
+
+    # Cardinality guard: once a measurement has an estimated cardinality_series_budget
+    # series, or a tag cardinality_tag_budget values, new tag values are written as
+    # "other" with the real value in a <tag>_raw field
+    cardinality_guard_enabled: bool = True
+    cardinality_series_budget: int = 50000
+    cardinality_tag_budget: int = 10000
+
+    # Disk spool for batches that failed to write (replayed once InfluxDB is back)
+    spool_enabled: bool = True
+    spool_dir: str = "/var/lib/market-feeder/spool"
+    spool_segment_bytes: int = 8 * 1024 * 1024
+    spool_max_bytes: int = 256 * 1024 * 1024
+    spool_replay_batch: int = 10
+    spool_replay_interval: float = 1.0
+
+    # Shared symbol registry (mounted from config/symbols.json)
+    symbols_file: str = "/etc/bloomberg/symbols.json"
+
+    # Shard mode: instances split symbol partitions through leases kept in Postgres
+    shard_enabled: bool = False
+    shard_instance_id: str = ""  # defaults to the hostname
+    shard_partitions: int = 64
+    shard_heartbeat_interval: float = 5.0
+    shard_lease_ttl: float = 30.0  # above 2 × heartbeat, so one failed heartbeat keeps the partitions
+    postgres_url: str = ""
+
     # Collection intervals (seconds)
     collection_interval_rest: int = 15
     coingecko_interval: int = 60
+    # Polling interval for instruments whose market is closed (weekends, overnight, holidays)
+    closed_market_interval: int = 900
+    # Random spread applied to every polling delay (0.1 = ±10%)
+    poll_jitter: float = 0.1
+
+    # Per-provider request budgets (token bucket, requests per minute)
+    yahoo_requests_per_minute: int = 60
+    coingecko_requests_per_minute: int = 30  # free plan; raise for pro keys
+    binance_requests_per_minute: int = 600  # REST only (backfill klines)
+
+    # CoinGecko /coins/markets: ids per request (split into pages of up to 250 coins)
+    coingecko_ids_per_request: int = 500
+    coingecko_per_page: int = 250
+
+    # REST resilience: send a second request once one outlasts its endpoint's recent
+    # p95 (never sooner than hedge_min_delay); after breaker_failures failures in a
+    # row, skip the ticker or host for breaker_cooloff seconds
+    hedge_enabled: bool = True
+    hedge_min_delay: float = 0.25
+    breaker_failures: int = 5
+    breaker_cooloff: float = 60.0
+
+    # Binance: keep only the latest ticker per symbol and flush every N ms (0 = write every message)
+    binance_conflation_ms: int = 250
+
+    # Binance pairs to stream (empty = the registry's Binance pairs); BINANCE_SYMBOLS_FILE
+    # (one list of pairs, re-read when it changes) takes over when set
+    binance_symbols: str = ""
+    binance_symbols_file: str = ""
+    binance_symbols_reload_interval: float = 30.0
+    # Binance allows up to 1024 streams per connection; more pairs open more connections
+    binance_streams_per_connection: int = 200
+
+    # Decode Binance messages in N worker processes (0 = on the event loop), in
+    # batches of up to decode_batch_size messages or decode_batch_ms
+    decode_workers: int = 0
+    decode_batch_size: int = 500
+    decode_batch_ms: int = 20
+    decode_queue_batches: int = 64
+
+    # Backfill: fill gaps longer than backfill_min_gap seconds in the last
+    # backfill_lookback_hours with 1-minute bars (Yahoo charts, Binance klines),
+    # after startup, every backfill_interval seconds (0 = never) and on demand.
+    # The gap threshold is never below change_filter_heartbeat plus one poll interval
+    backfill_enabled: bool = True
+    backfill_startup_delay: float = 60.0
+    backfill_interval: float = 0.0
+    backfill_lookback_hours: int = 24
+    backfill_min_gap: int = 420
+    backfill_concurrency: int = 4
+    backfill_checkpoint_file: str = "/var/lib/market-feeder/backfill.json"
+
+    # Upstream endpoints (overridable for the benchmark harness)
+    binance_ws_url: str = "wss://stream.binance.com:9443/stream"
+    binance_api_url: str = "https://api.binance.com"
+    yahoo_api_url: str = "https://query1.finance.yahoo.com"
+    yahoo_cookie_url: str = "https://fc.yahoo.com"
+    coingecko_api_url: str = ""
 
     # API keys (optional)
     binance_api_key: str = ""
@@ -19,9 +119,20 @@ class Settings(BaseSettings):
 
     # Yahoo Finance
     yahoo_finance_enabled: bool = True
+    yahoo_batch_enabled: bool = True
+    yahoo_batch_size: int = 50
+
+    # Shared HTTP connection pool
+    http_pool_size: int = 100
+    http_pool_per_host: int = 10
+    http_dns_ttl: int = 300
+    http_keepalive: float = 60.0
+    http_timeout: float = 30.0
 
     # Health server
     health_port: int = 8080
+    # Bearer token for the /admin endpoints (unset = admin endpoints disabled)
+    admin_token: str = ""
 
     # Logging
     log_level: str = "INFO"
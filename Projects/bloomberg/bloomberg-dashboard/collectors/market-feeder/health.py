@@ -1,14 +1,18 @@
 import time
+from typing import Callable
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.responses import PlainTextResponse
 from prometheus_client import (
     Counter,
     Gauge,
+    Histogram,
     generate_latest,
     CONTENT_TYPE_LATEST,
 )
 
+from config import settings
+
 app = FastAPI(title="Market Feeder Health")
 
 # --- Prometheus metrics ---
@@ -18,8 +22,116 @@ POINTS_WRITTEN = Counter("market_feeder_points_written_total", "Total data point
 ACTIVE_SOURCES = Gauge("market_feeder_active_sources", "Number of active data sources")
 UPTIME = Gauge("market_feeder_uptime_seconds", "Feeder uptime in seconds")
 LAST_WRITE = Gauge("market_feeder_last_write_timestamp", "Last successful write timestamp", ["source"])
+BINANCE_CONFLATED = Counter(
+    "market_feeder_binance_conflated_total",
+    "Binance ticker messages superseded by a newer one before being written",
+)
+POINTS_UNCHANGED = Counter(
+    "market_feeder_points_unchanged_total",
+    "Points dropped by the change filter because no field moved",
+    ["source"],
+)
+HEARTBEATS_WRITTEN = Counter(
+    "market_feeder_heartbeats_written_total",
+    "Unchanged points written anyway to keep the series fresh",
+    ["source"],
+)
+SPOOL_RECORDS = Gauge("market_feeder_spool_records", "Failed write batches waiting in the disk spool")
+SPOOL_BYTES = Gauge("market_feeder_spool_bytes", "Payload bytes waiting in the disk spool")
+SPOOL_EVICTED = Counter("market_feeder_spool_evicted_total", "Spooled batches dropped because the spool was full")
+SPOOL_REPLAYED = Counter("market_feeder_spool_replayed_total", "Spooled batches replayed to InfluxDB")
+HTTP_CONNECTIONS_CREATED = Counter("market_feeder_http_connections_created_total", "New HTTP connections opened by the pool")
+HTTP_CONNECTIONS_REUSED = Counter("market_feeder_http_connections_reused_total", "Requests served on a kept-alive connection")
+HTTP_CONNECT_SECONDS = Histogram(
+    "market_feeder_http_connect_seconds",
+    "Time spent opening a new HTTP connection (DNS, TCP and TLS)",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+HTTP_DNS_LOOKUPS = Counter("market_feeder_http_dns_lookups_total", "DNS resolutions by the HTTP pool", ["result"])
+FETCH_DURATION = Histogram(
+    "market_feeder_fetch_duration_seconds",
+    "Time to fetch and decode one REST response",
+    ["source", "endpoint"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10),
+)
+# Buckets straddle the 2s "price on screen" SLO
+INGEST_LATENCY = Histogram(
+    "market_feeder_ingest_latency_seconds",
+    "Point timestamp (exchange event time for Binance, fetch time for REST) to InfluxDB write ack",
+    ["source"],
+    buckets=(0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10, 30),
+)
+WRITER_BATCH_POINTS = Histogram(
+    "market_feeder_writer_batch_points",
+    "Points per InfluxDB write",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+WRITER_FLUSH_SECONDS = Histogram(
+    "market_feeder_writer_flush_seconds",
+    "Time to encode and write one batch to InfluxDB",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+WRITER_QUEUE_DEPTH = Gauge("market_feeder_writer_queue_depth", "Tick batches waiting for the InfluxDB flusher")
+DECODE_BATCHES = Counter("market_feeder_decode_batches_total", "Raw message batches sent to decode workers")
+DECODE_WORKER_BUSY = Counter(
+    "market_feeder_decode_worker_busy_seconds_total",
+    "Seconds each decode worker spent decoding and encoding",
+    ["worker"],
+)
+DECODE_WORKER_UTILIZATION = Gauge(
+    "market_feeder_decode_worker_utilization",
+    "Fraction of the last few seconds each decode worker was busy",
+    ["worker"],
+)
+SHARD_PARTITIONS_OWNED = Gauge("market_feeder_shard_partitions_owned", "Symbol partitions leased by this instance")
+SHARD_INSTANCES = Gauge("market_feeder_shard_instances", "Live market-feeder instances seen in shard mode")
+SHARD_REBALANCES = Counter("market_feeder_shard_rebalances_total", "Changes to the partitions owned by this instance")
+BINANCE_STREAMS = Gauge("market_feeder_binance_streams", "Binance ticker streams subscribed")
+BINANCE_CONNECTIONS = Gauge("market_feeder_binance_connections", "Binance combined-stream WebSocket connections")
+BINANCE_CONFLATOR_PENDING = Gauge(
+    "market_feeder_binance_conflator_pending",
+    "Binance symbols holding a ticker that has not been flushed yet",
+)
+BACKFILL_GAPS = Counter("market_feeder_backfill_gaps_total", "Gaps found in the stored price series", ["exchange"])
+BACKFILL_POINTS = Counter(
+    "market_feeder_backfill_points_total",
+    "Historical points written to fill gaps",
+    ["exchange"],
+)
+HEDGED_REQUESTS = Counter(
+    "market_feeder_hedged_requests_total",
+    "REST requests that outlasted the endpoint's p95 and were sent a second time",
+    ["endpoint"],
+)
+HEDGE_WINS = Counter("market_feeder_hedge_wins_total", "Hedged requests answered first by the second attempt", ["endpoint"])
+# 0 = closed, 1 = open, 2 = half open
+BREAKER_STATE = Gauge("market_feeder_breaker_state", "Circuit breaker state per host or ticker", ["breaker"])
+BREAKER_TRIPS = Counter("market_feeder_breaker_trips_total", "Times a circuit breaker opened", ["breaker"])
+SERIES_CARDINALITY = Gauge(
+    "market_feeder_series_cardinality",
+    "Estimated distinct tag sets written per measurement (HyperLogLog)",
+    ["measurement"],
+)
+TAG_VALUES = Gauge("market_feeder_tag_values", "Distinct values admitted per tag", ["measurement", "tag"])
+TAGS_FOLDED = Counter(
+    "market_feeder_tags_folded_total",
+    "Tag values written as \"other\" because the cardinality budget was reached",
+    ["measurement", "tag"],
+)
 
 _start_time = time.time()
+_status_providers: dict[str, Callable[[], dict]] = {}
+
+
+def register_status(name: str, provider: Callable[[], dict]):
+    """Add a section to the /health response, filled by calling ``provider``."""
+    _status_providers[name] = provider
+
+
+def require_admin(authorization: str = Header("")):
+    """Dependency guarding the /admin routers with ADMIN_TOKEN."""
+    if authorization != f"Bearer {settings.admin_token}":
+        raise HTTPException(status_code=401, detail="invalid admin token")
 
 
 @app.get("/health")
@@ -29,6 +141,7 @@ def health():
         "status": "healthy",
         "service": "market-feeder",
         "uptime_seconds": round(time.time() - _start_time, 1),
+        **{name: provider() for name, provider in _status_providers.items()},
     }
 
 
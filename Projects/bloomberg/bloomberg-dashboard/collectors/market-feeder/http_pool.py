@@ -0,0 +1,57 @@
+import time
+
+import aiohttp
+
+from config import settings
+from health import HTTP_CONNECTIONS_CREATED, HTTP_CONNECTIONS_REUSED, HTTP_CONNECT_SECONDS, HTTP_DNS_LOOKUPS
+
+# Copied into market-feeder and news-feeder, whose images are built from
+# their own directories: change both copies together (tests/test_shared_modules.py).
+
+
+def _trace_config() -> aiohttp.TraceConfig:
+    """Record connection reuse, connect time and DNS cache hits for the pool."""
+    trace = aiohttp.TraceConfig()
+
+    async def on_create_start(session, ctx, params):
+        ctx.connect_started = time.perf_counter()
+
+    async def on_create_end(session, ctx, params):
+        HTTP_CONNECTIONS_CREATED.inc()
+        HTTP_CONNECT_SECONDS.observe(time.perf_counter() - ctx.connect_started)
+
+    async def on_reuse(session, ctx, params):
+        HTTP_CONNECTIONS_REUSED.inc()
+
+    async def on_dns_hit(session, ctx, params):
+        HTTP_DNS_LOOKUPS.labels(result="cache_hit").inc()
+
+    async def on_dns_miss(session, ctx, params):
+        HTTP_DNS_LOOKUPS.labels(result="cache_miss").inc()
+
+    trace.on_connection_create_start.append(on_create_start)
+    trace.on_connection_create_end.append(on_create_end)
+    trace.on_connection_reuseconn.append(on_reuse)
+    trace.on_dns_cache_hit.append(on_dns_hit)
+    trace.on_dns_cache_miss.append(on_dns_miss)
+    return trace
+
+
+def create_session() -> aiohttp.ClientSession:
+    """Build the long-lived HTTP session shared by every source in this process.
+
+    Connections are kept alive between polls and DNS answers are cached, so
+    a steady polling cycle reuses warm TCP/TLS connections instead of
+    handshaking on every request. Must be called from the running loop.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=settings.http_pool_size,
+        limit_per_host=settings.http_pool_per_host,
+        ttl_dns_cache=settings.http_dns_ttl,
+        keepalive_timeout=settings.http_keepalive,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=settings.http_timeout),
+        trace_configs=[_trace_config()],
+    )
@@ -5,8 +5,16 @@ import sys
 
 import uvicorn
 
+from backfill import backfiller, router as backfill_router
 from config import settings
-from health import app as health_app
+from health import app as health_app, register_status
+from http_pool import create_session
+from processors import change_filter
+from processors.candles import CandleAggregator
+from processors.pipeline import Pipeline
+from processors.quote_cache import quote_cache, router as quotes_router
+from resilience import stats as resilience_stats
+from sharding import coordinator
 from writers.influxdb_writer import InfluxDBWriter
 from sources import coingecko, yahoo_finance, binance_ws
 
@@ -19,18 +27,28 @@ logging.basicConfig(
 logger = logging.getLogger("market-feeder")
 
 
-async def main():
-    stop_event = asyncio.Event()
-
-    def _signal_handler():
-        logger.info("Shutdown signal received")
-        stop_event.set()
-
-    loop = asyncio.get_running_loop()
-    for sig in (signal.SIGTERM, signal.SIGINT):
-        loop.add_signal_handler(sig, _signal_handler)
-
+async def run_feeder(stop_event: asyncio.Event):
+    """Run every source, the pipeline and the health server until ``stop_event`` is set."""
     writer = InfluxDBWriter()
+    writer.start()
+    session = create_session()
+    observers = [quote_cache.update]
+    candles = None
+    if settings.candles_enabled:
+        candles = CandleAggregator(settings.candle_timeframes.split(","), writer.write_points)
+        observers.append(candles.update)
+    pipeline = Pipeline(change_filter.build(writer.write_points), observers)
+    write_fn = pipeline.write_points
+
+    health_app.include_router(quotes_router)
+    register_status("quotes", quote_cache.stats)
+    register_status("binance", binance_ws.stream_manager.stats)
+    register_status("shard", coordinator.stats)
+    register_status("backfill", backfiller.stats)
+    register_status("rest", resilience_stats)
+    if settings.admin_token:
+        health_app.include_router(binance_ws.router)
+        health_app.include_router(backfill_router)
 
     # Health/metrics server
     config = uvicorn.Config(
@@ -41,12 +59,19 @@ async def main():
     )
     server = uvicorn.Server(config)
 
+    # Claim a share of the symbols before the sources first poll
+    await coordinator.start()
+
     tasks = [
         asyncio.create_task(server.serve(), name="health-server"),
-        asyncio.create_task(coingecko.run(writer.write_points, stop_event), name="coingecko"),
-        asyncio.create_task(yahoo_finance.run(writer.write_points, stop_event), name="yahoo-finance"),
-        asyncio.create_task(binance_ws.run(writer.write_points, stop_event), name="binance-ws"),
+        asyncio.create_task(coordinator.run(stop_event), name="shard-coordinator"),
+        asyncio.create_task(coingecko.run(write_fn, stop_event, session), name="coingecko"),
+        asyncio.create_task(yahoo_finance.run(write_fn, stop_event, session), name="yahoo-finance"),
+        asyncio.create_task(binance_ws.run(pipeline, stop_event, session), name="binance-ws"),
+        asyncio.create_task(backfiller.run(writer, session, stop_event), name="backfill"),
     ]
+    if candles:
+        tasks.append(asyncio.create_task(candles.run(stop_event), name="candles"))
 
     logger.info("Market Feeder started — sources: CoinGecko, Yahoo Finance, Binance WS (if key set)")
 
@@ -64,9 +89,27 @@ async def main():
     if pending:
         await asyncio.wait(pending, timeout=5)
 
-    writer.close()
+    await session.close()
+
+    # Flush whatever the sources queued before they stopped
+    await writer.drain()
+    await writer.close()
     logger.info("Market Feeder stopped cleanly")
 
 
+async def main():
+    stop_event = asyncio.Event()
+
+    def _signal_handler():
+        logger.info("Shutdown signal received")
+        stop_event.set()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, _signal_handler)
+
+    await run_feeder(stop_event)
+
+
 if __name__ == "__main__":
     asyncio.run(main())
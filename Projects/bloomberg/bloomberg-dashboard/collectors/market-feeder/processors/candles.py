@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from typing import Callable
+
+from config import settings
+from ticks import Candle, Tick
+
+logger = logging.getLogger("market-feeder.candles")
+
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def timeframe_ns(timeframe: str) -> int:
+    """Width of a timeframe such as ``5m``, ``4h`` or ``1d`` in nanoseconds."""
+    return int(timeframe[:-1]) * _UNIT_SECONDS[timeframe[-1]] * 1_000_000_000
+
+
+class CandleAggregator:
+    """Build rolling OHLC bars per symbol and exchange from the tick stream.
+
+    Bars are aligned on the Unix epoch (so ``1d`` bars start at 00:00 UTC)
+    and bucketed by each tick's own timestamp, never by wall-clock time, so
+    replaying the same ticks in the same order yields identical bars. Ticks
+    older than the current bar of their series are ignored.
+
+    Sources only report a rolling 24h volume, so bars carry no volume of
+    their own: ``volume_24h`` is the last one seen within the bar and
+    ``ticks`` counts the observations.
+    Closed bars, and the current partial bar of every series that changed,
+    are written to the ``candles`` measurement every flush interval; a later
+    write of the same bar overwrites the earlier partial one.
+    """
+
+    def __init__(self, timeframes: list[str], write_fn: Callable):
+        self._frames = [(tf, timeframe_ns(tf)) for tf in timeframes]
+        self._write_fn = write_fn
+        self._bars: dict[tuple[str, str, str], Candle] = {}
+        self._closed: list[Candle] = []
+        self._dirty: set[tuple[str, str, str]] = set()
+
+    def update(self, ticks: list[Tick]):
+        for tick in ticks:
+            price = tick.last
+            if price is None:
+                continue
+            for timeframe, width in self._frames:
+                start = tick.time - tick.time % width
+                key = (tick.symbol, tick.exchange, timeframe)
+                bar = self._bars.get(key)
+                if bar is None or start > bar.time:
+                    if bar is not None:
+                        bar.closed = True
+                        self._closed.append(bar)
+                    self._bars[key] = Candle(tick, timeframe, start)
+                elif start < bar.time:
+                    continue
+                else:
+                    if price > bar.high:
+                        bar.high = price
+                    elif price < bar.low:
+                        bar.low = price
+                    bar.close = price
+                    if tick.volume_24h is not None:
+                        bar.volume_24h = tick.volume_24h
+                    bar.ticks += 1
+                self._dirty.add(key)
+
+    async def flush(self):
+        bars = self._closed
+        self._closed = []
+        bars.extend(self._bars[key] for key in self._dirty)
+        self._dirty = set()
+        if bars:
+            await self._write_fn(bars, source="candles")
+
+    async def run(self, stop_event: asyncio.Event):
+        """Flush every CANDLE_FLUSH_INTERVAL seconds until stopped, then once more."""
+        interval = settings.candle_flush_interval
+        logger.info("Candle aggregator started — timeframes=%s", ",".join(tf for tf, _ in self._frames))
+        while not stop_event.is_set():
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Error flushing candles")
+        logger.info("Candle aggregator stopped")
@@ -0,0 +1,70 @@
+import logging
+import time
+from typing import Callable
+
+from config import settings
+from health import POINTS_UNCHANGED, HEARTBEATS_WRITTEN
+from ticks import Tick
+
+logger = logging.getLogger("market-feeder.change_filter")
+
+
+def _changed(old: tuple, new: tuple, epsilon: float) -> bool:
+    for a, b in zip(old, new):
+        if a is None or b is None:
+            if a is not b:
+                return True
+        elif abs(a - b) > epsilon * max(abs(a), abs(b)):
+            return True
+    return False
+
+
+class ChangeFilter:
+    """Write stage that drops ticks whose fields have not moved.
+
+    Keeps the last written field values per (symbol, exchange). A tick is
+    dropped when every field is within ``epsilon`` (relative) of that, unless
+    ``heartbeat`` seconds have passed since the last write for the series, so
+    panels of a quiet or closed market never go stale.
+    """
+
+    def __init__(self, write_fn: Callable, epsilon: float, heartbeat: float):
+        self._write_fn = write_fn
+        self._epsilon = epsilon
+        self._heartbeat = heartbeat
+        self._last: dict[tuple[str, str], tuple[tuple, float]] = {}
+
+    async def write_points(self, points: list[Tick], source: str = "unknown"):
+        now = time.monotonic()
+        kept = []
+        dropped = heartbeats = 0
+
+        for tick in points:
+            key = (tick.symbol, tick.exchange)
+            values = Tick.field_values(tick)
+            previous = self._last.get(key)
+            if previous is not None and not _changed(previous[0], values, self._epsilon):
+                if now - previous[1] < self._heartbeat:
+                    dropped += 1
+                    continue
+                heartbeats += 1
+            self._last[key] = (values, now)
+            kept.append(tick)
+
+        if dropped:
+            POINTS_UNCHANGED.labels(source=source).inc(dropped)
+        if heartbeats:
+            HEARTBEATS_WRITTEN.labels(source=source).inc(heartbeats)
+        if kept:
+            await self._write_fn(kept, source=source)
+
+
+def build(write_fn: Callable) -> Callable:
+    """Wrap ``write_fn`` in a ChangeFilter unless it is disabled in settings."""
+    if not settings.change_filter_enabled:
+        return write_fn
+    logger.info(
+        "Change filter enabled — epsilon=%g, heartbeat=%ds",
+        settings.change_filter_epsilon, settings.change_filter_heartbeat,
+    )
+    return ChangeFilter(write_fn, settings.change_filter_epsilon, settings.change_filter_heartbeat).write_points
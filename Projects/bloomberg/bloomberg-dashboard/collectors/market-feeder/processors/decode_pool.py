@@ -0,0 +1,199 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable
+
+from config import settings
+from health import DECODE_BATCHES, DECODE_WORKER_BUSY, DECODE_WORKER_UTILIZATION, register_status
+from ticks import Tick
+
+logger = logging.getLogger("market-feeder.decode_pool")
+
+# Seconds between utilization gauge updates
+UTILIZATION_INTERVAL = 5.0
+
+_STREAM_START = len('{"stream":"')
+
+# --- Worker side (runs in the pool processes) ---
+
+_encoder = None
+
+
+def decode_tickers(messages: list[str]) -> tuple[list[tuple], float]:
+    """Decode raw combined-stream ticker messages and encode them as line protocol.
+
+    Returns one row per valid message, in message order, and the seconds
+    spent. Rows are plain tuples (see ``_tick_from_row``), which cross the
+    process boundary several times cheaper than pickled Ticks.
+    """
+    global _encoder
+    from sources.binance_ws import display_symbol, parse_ticker
+    from writers.line_protocol import LineProtocolEncoder
+
+    started = time.perf_counter()
+    if _encoder is None:
+        _encoder = LineProtocolEncoder()
+
+    rows = []
+    buf = bytearray()
+    for raw in messages:
+        try:
+            event = json.loads(raw).get("data") or {}
+            pair = event.get("s", "")
+            tick = parse_ticker(event, display_symbol(pair))
+        except ValueError:
+            continue
+        if tick is None or not _encoder.encode((tick,), buf):
+            buf.clear()
+            continue
+        rows.append((
+            pair, tick.symbol, tick.time,
+            tick.last, tick.bid, tick.ask, tick.volume_24h, tick.change_pct_24h,
+            bytes(buf),
+        ))
+        buf.clear()
+    return rows, time.perf_counter() - started
+
+
+def _tick_from_row(row: tuple) -> tuple[str, Tick]:
+    pair, symbol, ts, last, bid, ask, volume, change, line = row
+    tick = Tick(symbol, "binance", "crypto", ts, last, bid, ask, volume, change)
+    tick.line = line
+    return pair, tick
+
+
+# --- Event-loop side ---
+
+
+def _stream_name(raw: str) -> str:
+    end = raw.find('"', _STREAM_START)
+    return raw[_STREAM_START:end] if end > 0 else ""
+
+
+class DecodePool:
+    """Decode and encode high-rate WebSocket messages in worker processes.
+
+    Each worker is its own single-process executor. A message is routed by
+    a hash of its stream name, so all of a symbol's messages go to the same
+    worker. Batches are consumed per worker in submission order, which keeps
+    the order within each symbol. Raw messages are buffered for up to
+    ``decode_batch_ms`` or ``decode_batch_size`` messages. Each worker has
+    at most ``decode_queue_batches`` batches in flight. Past that, ``submit``
+    waits, which pushes back on the WebSocket reader.
+    """
+
+    def __init__(self, workers: int, on_decoded: Callable[[list[tuple[str, Tick]]], Awaitable[None]]):
+        self._workers = workers
+        self._on_decoded = on_decoded
+        self._batch_size = max(1, settings.decode_batch_size)
+        self._batch_interval = settings.decode_batch_ms / 1000
+        self._executors: list[ProcessPoolExecutor] = []
+        self._queues: list[asyncio.Queue] = []
+        self._pending: list[list[str]] = [[] for _ in range(workers)]
+        self._pending_count = 0
+        self._route: dict[str, int] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._busy = [0.0] * workers
+        self._utilization = [0.0] * workers
+
+    def start(self):
+        """Start the worker processes and their consumers. Must be called from the running loop."""
+        context = multiprocessing.get_context("spawn")
+        for i in range(self._workers):
+            self._executors.append(ProcessPoolExecutor(max_workers=1, mp_context=context))
+            queue: asyncio.Queue = asyncio.Queue(maxsize=settings.decode_queue_batches)
+            self._queues.append(queue)
+            self._tasks.append(asyncio.create_task(self._consume(i, queue), name=f"decode-consumer-{i}"))
+        self._tasks.append(asyncio.create_task(self._flush_loop(), name="decode-flusher"))
+        self._tasks.append(asyncio.create_task(self._report_loop(), name="decode-utilization"))
+        register_status("decode_pool", self.stats)
+        logger.info(
+            "Decode pool started — %d workers, batch=%d messages/%.0fms",
+            self._workers, self._batch_size, self._batch_interval * 1000,
+        )
+
+    async def submit(self, raw: str):
+        """Queue one raw message for decoding."""
+        stream = _stream_name(raw)
+        worker = self._route.get(stream)
+        if worker is None:
+            worker = zlib.crc32(stream.encode()) % self._workers
+            self._route[stream] = worker
+        self._pending[worker].append(raw)
+        self._pending_count += 1
+        if self._pending_count >= self._batch_size:
+            await self.flush()
+
+    async def flush(self):
+        """Send every buffered message to its worker."""
+        loop = asyncio.get_running_loop()
+        for worker, messages in enumerate(self._pending):
+            if not messages:
+                continue
+            self._pending[worker] = []
+            future = loop.run_in_executor(self._executors[worker], decode_tickers, messages)
+            await self._queues[worker].put(future)
+            DECODE_BATCHES.inc()
+        # Messages submitted while a put was waiting stay buffered
+        self._pending_count = sum(len(messages) for messages in self._pending)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self._batch_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Error submitting decode batch")
+
+    async def _consume(self, worker: int, queue: asyncio.Queue):
+        label = DECODE_WORKER_BUSY.labels(worker=str(worker))
+        while True:
+            future = await queue.get()
+            try:
+                rows, busy = await future
+                self._busy[worker] += busy
+                label.inc(busy)
+                if rows:
+                    await self._on_decoded([_tick_from_row(row) for row in rows])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Decode worker %d failed a batch", worker)
+            finally:
+                queue.task_done()
+
+    async def _report_loop(self):
+        last = time.monotonic()
+        last_busy = list(self._busy)
+        while True:
+            await asyncio.sleep(UTILIZATION_INTERVAL)
+            now = time.monotonic()
+            for worker, busy in enumerate(self._busy):
+                self._utilization[worker] = (busy - last_busy[worker]) / (now - last)
+                DECODE_WORKER_UTILIZATION.labels(worker=str(worker)).set(self._utilization[worker])
+            last, last_busy = now, list(self._busy)
+
+    async def close(self):
+        """Decode what is still buffered, then stop the workers."""
+        try:
+            await self.flush()
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in self._queues)), timeout=5)
+        except asyncio.TimeoutError:
+            logger.warning("Decode pool close timed out — in-flight batches dropped")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+        logger.info("Decode pool stopped")
+
+    def stats(self) -> dict:
+        return {
+            "workers": self._workers,
+            "in_flight": [q.qsize() for q in self._queues],
+            "utilization": [round(u, 3) for u in self._utilization],
+        }
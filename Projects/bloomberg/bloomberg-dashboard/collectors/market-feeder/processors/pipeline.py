@@ -0,0 +1,33 @@
+from typing import Callable
+
+from ticks import Tick
+
+
+class Pipeline:
+    """Entry point the sources write to.
+
+    Every batch is first shown to the in-memory observers (quote cache, ...),
+    which must be cheap and synchronous, and then handed to the write stage.
+    A source that thins its ticks before writing (Binance conflation) shows
+    every tick with ``observe`` and writes the survivors with ``write_observed``.
+    """
+
+    def __init__(self, write_fn: Callable, observers: list[Callable[[list[Tick]], None]]):
+        self._write_fn = write_fn
+        self._observers = observers
+
+    def observe(self, points: list[Tick]):
+        for observe in self._observers:
+            observe(points)
+
+    async def write_points(self, points: list[Tick], source: str = "unknown"):
+        if not points:
+            return
+        self.observe(points)
+        await self._write_fn(points, source=source)
+
+    async def write_observed(self, points: list[Tick], source: str = "unknown"):
+        """Write points the observers have already seen through ``observe``."""
+        if not points:
+            return
+        await self._write_fn(points, source=source)
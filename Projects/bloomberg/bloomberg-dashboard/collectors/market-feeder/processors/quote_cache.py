@@ -0,0 +1,117 @@
+import asyncio
+import json
+import logging
+import time
+
+from fastapi import APIRouter, Request, Response, WebSocket, WebSocketDisconnect
+
+from ticks import Tick
+
+logger = logging.getLogger("market-feeder.quotes")
+
+# Pending messages per WebSocket client before it is resynced with a snapshot
+SUBSCRIBER_QUEUE_SIZE = 64
+
+
+def _quote(tick: Tick) -> dict:
+    quote = {"symbol": tick.symbol, "exchange": tick.exchange, "asset_type": tick.asset_type, "time": tick.time}
+    for name, value in zip(Tick.FIELDS, Tick.field_values(tick)):
+        if value is not None:
+            quote[name] = value
+    return quote
+
+
+class QuoteCache:
+    """Latest tick per (symbol, exchange), kept in memory for the health app.
+
+    Every update bumps a version; the JSON snapshot is rendered at most once
+    per version and its ETag is derived from it. WebSocket subscribers get
+    each update as a small delta message. A subscriber that falls behind by
+    more than ``SUBSCRIBER_QUEUE_SIZE`` messages is sent a full snapshot
+    instead of the backlog.
+    """
+
+    def __init__(self):
+        self._quotes: dict[tuple[str, str], Tick] = {}
+        self._version = 0
+        self._epoch = int(time.time())
+        self._snapshot: tuple[int, str, bytes] | None = None
+        self._subscribers: set[asyncio.Queue] = set()
+
+    def __len__(self) -> int:
+        return len(self._quotes)
+
+    def update(self, ticks: list[Tick]):
+        for tick in ticks:
+            self._quotes[(tick.symbol, tick.exchange)] = tick
+        self._version += 1
+
+        if self._subscribers:
+            message = json.dumps({
+                "type": "update",
+                "version": self._version,
+                "quotes": [_quote(t) for t in ticks],
+            })
+            for queue in self._subscribers:
+                try:
+                    queue.put_nowait(message)
+                except asyncio.QueueFull:
+                    # Replace the backlog with a resync marker
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(None)
+
+    def snapshot(self) -> tuple[str, bytes]:
+        """Return (etag, JSON body) for the current contents."""
+        if self._snapshot is None or self._snapshot[0] != self._version:
+            body = json.dumps({
+                "type": "snapshot",
+                "version": self._version,
+                "quotes": [_quote(t) for t in self._quotes.values()],
+            }).encode()
+            self._snapshot = (self._version, f'"{self._epoch}-{self._version}"', body)
+        return self._snapshot[1], self._snapshot[2]
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def stats(self) -> dict:
+        return {"quotes": len(self._quotes), "version": self._version, "subscribers": len(self._subscribers)}
+
+
+quote_cache = QuoteCache()
+router = APIRouter()
+
+
+@router.get("/quotes")
+async def quotes(request: Request):
+    etag, body = quote_cache.snapshot()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.websocket("/quotes/ws")
+async def quotes_ws(ws: WebSocket):
+    await ws.accept()
+    queue = quote_cache.subscribe()
+    try:
+        await ws.send_text(quote_cache.snapshot()[1].decode())
+        while True:
+            message = await queue.get()
+            if message is None:
+                await ws.send_text(quote_cache.snapshot()[1].decode())
+            else:
+                await ws.send_text(message)
+    except WebSocketDisconnect:
+        pass
+    except Exception:
+        logger.debug("Quote stream client dropped", exc_info=True)
+    finally:
+        quote_cache.unsubscribe(queue)
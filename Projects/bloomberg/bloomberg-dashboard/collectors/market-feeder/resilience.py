@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+import aiohttp
+
+from config import settings
+from health import BREAKER_STATE, BREAKER_TRIPS, HEDGE_WINS, HEDGED_REQUESTS
+
+logger = logging.getLogger("market-feeder.resilience")
+
+T = TypeVar("T")
+
+# Latencies kept per endpoint, and how many are needed before hedging starts
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 20
+
+
+class CircuitOpen(Exception):
+    """Raised instead of sending a request while one of its breakers is open."""
+
+
+def host_failure(exc: BaseException) -> bool:
+    """Errors that say the host, rather than one ticker, is unhealthy."""
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status >= 500 or exc.status == 429
+    return isinstance(exc, (aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+
+class LatencyTracker:
+    """Recent latencies of one endpoint, with a cached p95."""
+
+    def __init__(self):
+        self._samples: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._p95: float | None = None
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+        self._p95 = None
+
+    def p95(self) -> float | None:
+        if len(self._samples) < MIN_SAMPLES:
+            return None
+        if self._p95 is None:
+            ordered = sorted(self._samples)
+            self._p95 = ordered[int(len(ordered) * 0.95) - 1]
+        return self._p95
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one host or ticker.
+
+    After ``breaker_failures`` failures in a row the breaker opens and
+    requests are refused for ``breaker_cooloff`` seconds. It then goes half
+    open: the next request is a probe, and other requests are refused while
+    it is in flight. If the probe succeeds, the breaker closes. If it fails,
+    the breaker opens again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 0, 1, 2
+    _STATE_NAMES = ("closed", "open", "half_open")
+
+    def __init__(self, name: str, is_failure: Callable[[BaseException], bool] | None = None):
+        self.name = name
+        self._is_failure = is_failure
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._gauge = BREAKER_STATE.labels(breaker=name)
+        self._gauge.set(self.CLOSED)
+
+    @property
+    def state(self) -> str:
+        return self._STATE_NAMES[self._state]
+
+    def allow(self) -> bool:
+        """Whether a request may go out now. While half open, this claims the single probe."""
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= settings.breaker_cooloff:
+            self._set(self.HALF_OPEN)
+        if self._state == self.OPEN:
+            return False
+        if self._state == self.HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def release(self):
+        """Give back a probe claimed by ``allow`` that ended without a result (refused elsewhere, cancelled)."""
+        self._probing = False
+
+    def record_success(self):
+        self._failures = 0
+        self._probing = False
+        if self._state != self.CLOSED:
+            logger.info("Breaker %s closed", self.name)
+            self._set(self.CLOSED)
+
+    def record_failure(self, exc: BaseException):
+        self._probing = False
+        if self._is_failure is not None and not self._is_failure(exc):
+            return
+        self._failures += 1
+        if self._state == self.HALF_OPEN:
+            logger.warning("Breaker %s probe failed — skipping for %.0fs more", self.name, settings.breaker_cooloff)
+        elif self._state == self.CLOSED and self._failures >= settings.breaker_failures:
+            logger.warning(
+                "Breaker %s opened after %d failures — skipping for %.0fs (%s)",
+                self.name, self._failures, settings.breaker_cooloff, exc,
+            )
+        else:
+            return
+        self._opened_at = time.monotonic()
+        self._set(self.OPEN)
+        BREAKER_TRIPS.labels(breaker=self.name).inc()
+
+    def _set(self, state: int):
+        self._state = state
+        self._gauge.set(state)
+
+
+_trackers: dict[str, LatencyTracker] = {}
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def breaker(name: str, is_failure: Callable[[BaseException], bool] | None = None) -> CircuitBreaker:
+    """Shared breaker called ``name``. ``is_failure`` filters which errors count; it applies on first use."""
+    instance = _breakers.get(name)
+    if instance is None:
+        instance = _breakers[name] = CircuitBreaker(name, is_failure)
+    return instance
+
+
+async def hedged(endpoint: str, request: Callable[[], Awaitable[T]]) -> T:
+    """Await ``request()``, starting a second attempt if the first outlasts the endpoint's p95.
+
+    The first attempt to succeed wins and the other is cancelled. Hedging
+    starts once the endpoint has MIN_SAMPLES latencies, and never before
+    ``hedge_min_delay``.
+    """
+    tracker = _trackers.get(endpoint)
+    if tracker is None:
+        tracker = _trackers[endpoint] = LatencyTracker()
+    p95 = tracker.p95()
+
+    started = time.perf_counter()
+    first = asyncio.ensure_future(request())
+    if not settings.hedge_enabled or p95 is None:
+        result = await first
+        tracker.observe(time.perf_counter() - started)
+        return result
+
+    done, _ = await asyncio.wait({first}, timeout=max(p95, settings.hedge_min_delay))
+    if done:
+        result = first.result()
+        tracker.observe(time.perf_counter() - started)
+        return result
+
+    HEDGED_REQUESTS.labels(endpoint=endpoint).inc()
+    hedge_started = time.perf_counter()
+    second = asyncio.ensure_future(request())
+    pending = {first, second}
+    error: BaseException | None = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for attempt in done:
+                if attempt.exception() is None:
+                    if attempt is second:
+                        HEDGE_WINS.labels(endpoint=endpoint).inc()
+                        tracker.observe(time.perf_counter() - hedge_started)
+                    else:
+                        tracker.observe(time.perf_counter() - started)
+                    return attempt.result()
+                error = attempt.exception()
+        raise error
+    finally:
+        for attempt in pending:
+            attempt.cancel()
+
+
+async def call(endpoint: str, breakers: list[CircuitBreaker], request: Callable[[], Awaitable[T]]) -> T:
+    """Hedged ``request()`` guarded by ``breakers``: refused while any is open, outcome recorded on all."""
+    for i, gate in enumerate(breakers):
+        if not gate.allow():
+            for admitted in breakers[:i]:
+                if admitted.state == "half_open":
+                    admitted.release()
+            raise CircuitOpen(gate.name)
+    # Half-open breakers that let this request through are waiting on it as their probe
+    probes = [gate for gate in breakers if gate.state == "half_open"]
+    try:
+        result = await hedged(endpoint, request)
+    except Exception as e:
+        for gate in breakers:
+            gate.record_failure(e)
+        raise
+    except BaseException:
+        # Cancelled: no outcome to record, but the probe must be freed
+        for gate in probes:
+            gate.release()
+        raise
+    for gate in breakers:
+        gate.record_success()
+    return result
+
+
+def stats() -> dict:
+    return {
+        "p95_ms": {
+            endpoint: round(p95 * 1000, 1)
+            for endpoint, tracker in _trackers.items()
+            if (p95 := tracker.p95()) is not None
+        },
+        "breakers": {name: gate.state for name, gate in _breakers.items() if gate.state != "closed"},
+    }
@@ -0,0 +1,193 @@
+import asyncio
+import random
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+from config import settings
+
+NEW_YORK = ZoneInfo("America/New_York")
+
+# Sessions in New York local time, as minutes since midnight
+_EQUITY_OPEN, _EQUITY_CLOSE = 9 * 60 + 30, 16 * 60
+_FX_ROLL = 17 * 60  # forex week opens Sunday 17:00, closes Friday 17:00
+_GLOBEX_OPEN, _GLOBEX_CLOSE = 18 * 60, 17 * 60  # daily halt 17:00–18:00
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    first = date(year, month, 1)
+    offset = (weekday - first.weekday()) % 7
+    return first + timedelta(days=offset + 7 * (n - 1))
+
+
+def _last_weekday(year: int, month: int, weekday: int) -> date:
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year: int) -> date:
+    # Anonymous Gregorian algorithm
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return date(year, month, day)
+
+
+def _observed(day: date) -> date:
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=8)
+def us_market_holidays(year: int) -> frozenset[date]:
+    """NYSE full-day holidays for ``year``."""
+    holidays = {
+        _observed(date(year, 1, 1)),
+        _nth_weekday(year, 1, 0, 3),  # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),  # Presidents' Day
+        _easter(year) - timedelta(days=2),  # Good Friday
+        _last_weekday(year, 5, 0),  # Memorial Day
+        _observed(date(year, 6, 19)),
+        _observed(date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),  # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        _observed(date(year, 12, 25)),
+    }
+    return frozenset(holidays)
+
+
+def is_market_open(asset_type: str, now: datetime | None = None) -> bool:
+    """Whether the market for ``asset_type`` is in session at ``now`` (default: current time)."""
+    if asset_type == "crypto":
+        return True
+
+    local = (now or datetime.now(NEW_YORK)).astimezone(NEW_YORK)
+    weekday = local.weekday()
+    minute = local.hour * 60 + local.minute
+
+    if asset_type in ("stock", "index"):
+        if weekday >= 5 or local.date() in us_market_holidays(local.year):
+            return False
+        return _EQUITY_OPEN <= minute < _EQUITY_CLOSE
+
+    if asset_type == "forex":
+        if weekday == 5:
+            return False
+        if weekday == 6:
+            return minute >= _FX_ROLL
+        if weekday == 4:
+            return minute < _FX_ROLL
+        return True
+
+    if asset_type == "commodity":
+        if weekday == 5:
+            return False
+        if weekday == 6:
+            return minute >= _GLOBEX_OPEN
+        if weekday == 4:
+            return minute < _GLOBEX_CLOSE
+        return not (_GLOBEX_CLOSE <= minute < _GLOBEX_OPEN)
+
+    # Unknown asset classes are polled as if always open
+    return True
+
+
+def jittered(seconds: float) -> float:
+    """Spread ``seconds`` by ±POLL_JITTER so sources do not poll in lockstep."""
+    spread = settings.poll_jitter
+    return max(0.0, seconds * (1 + random.uniform(-spread, spread)))
+
+
+class AdaptiveScheduler:
+    """Decide which instruments a REST source should poll on each cycle.
+
+    Instruments whose market is in session are polled every ``open_interval``;
+    the others only every ``closed_interval``, so closed markets still get an
+    occasional refresh without burning requests on unchanged prices.
+    """
+
+    def __init__(self, asset_types: dict[str, str], open_interval: float, closed_interval: float):
+        self._asset_types = asset_types
+        self._open_interval = open_interval
+        self._closed_interval = closed_interval
+        self._last_poll: dict[str, float] = {}
+
+    def _intervals(self) -> dict[str, float]:
+        now = datetime.now(NEW_YORK)
+        return {
+            asset_type: self._open_interval if is_market_open(asset_type, now) else self._closed_interval
+            for asset_type in set(self._asset_types.values())
+        }
+
+    def due(self) -> list[str]:
+        """Instruments to poll now; marks them as polled."""
+        intervals = self._intervals()
+        now = time.monotonic()
+        due = [
+            key for key, asset_type in self._asset_types.items()
+            if now - self._last_poll.get(key, float("-inf")) >= intervals[asset_type]
+        ]
+        for key in due:
+            self._last_poll[key] = now
+        return due
+
+    def next_delay(self) -> float:
+        """Seconds until the next instrument is due, with jitter."""
+        intervals = self._intervals()
+        now = time.monotonic()
+        delay = min(
+            (self._last_poll.get(key, float("-inf")) + intervals[asset_type] - now
+             for key, asset_type in self._asset_types.items()),
+            default=self._open_interval,
+        )
+        return jittered(max(delay, 1.0))
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, bursts up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until ``tokens`` are available, then take them."""
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self._rate)
+                self._refill()
+            self._tokens -= tokens
+
+
+_budgets: dict[str, TokenBucket] = {}
+
+
+def provider_budget(provider: str) -> TokenBucket:
+    """Shared request budget for ``provider``, sized from ``<provider>_requests_per_minute``."""
+    bucket = _budgets.get(provider)
+    if bucket is None:
+        per_minute = getattr(settings, f"{provider}_requests_per_minute")
+        # Allow a burst of up to 15 seconds' worth of requests
+        bucket = TokenBucket(per_minute / 60, max(1.0, per_minute / 4))
+        _budgets[provider] = bucket
+    return bucket
@@ -0,0 +1,255 @@
+import asyncio
+import bisect
+import hashlib
+import logging
+import socket
+import time
+import zlib
+from typing import Awaitable, Callable
+
+import asyncpg
+
+from config import settings
+from health import SHARD_INSTANCES, SHARD_PARTITIONS_OWNED, SHARD_REBALANCES
+
+logger = logging.getLogger("market-feeder.sharding")
+
+SERVICE = "market-feeder"
+# Points per instance on the hash ring; more points spread partitions more evenly
+VIRTUAL_NODES = 64
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS feeder_instances (
+    service VARCHAR(50) NOT NULL,
+    instance_id VARCHAR(100) NOT NULL,
+    started_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    heartbeat_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (service, instance_id)
+);
+CREATE TABLE IF NOT EXISTS feeder_partition_leases (
+    service VARCHAR(50) NOT NULL,
+    partition INTEGER NOT NULL,
+    owner VARCHAR(100) NOT NULL,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (service, partition)
+);
+"""
+
+_HEARTBEAT = """
+INSERT INTO feeder_instances (service, instance_id, heartbeat_at)
+VALUES ($1, $2, NOW())
+ON CONFLICT (service, instance_id) DO UPDATE SET heartbeat_at = NOW()
+"""
+
+_LIVE_INSTANCES = """
+SELECT instance_id FROM feeder_instances
+WHERE service = $1 AND heartbeat_at > NOW() - make_interval(secs => $2)
+"""
+
+# Take or renew a lease only if it is ours already or has expired
+_ACQUIRE = """
+INSERT INTO feeder_partition_leases AS lease (service, partition, owner, expires_at)
+SELECT $1, p, $2, NOW() + make_interval(secs => $3) FROM unnest($4::int[]) AS p
+ON CONFLICT (service, partition) DO UPDATE
+    SET owner = EXCLUDED.owner, expires_at = EXCLUDED.expires_at
+    WHERE lease.owner = EXCLUDED.owner OR lease.expires_at < NOW()
+RETURNING partition
+"""
+
+_RELEASE = """
+DELETE FROM feeder_partition_leases
+WHERE service = $1 AND owner = $2 AND partition = ANY($3::int[])
+"""
+
+_DEREGISTER = "DELETE FROM feeder_instances WHERE service = $1 AND instance_id = $2"
+
+
+def _ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def assign_partitions(instances: list[str], partitions: int) -> dict[int, str]:
+    """Map every partition to an instance on a consistent hash ring.
+
+    Deterministic for a given set of instances, so every instance computes
+    the same assignment, and adding or removing one instance only moves the
+    partitions next to its ring points.
+    """
+    ring = sorted(
+        (_ring_hash(f"{instance}#{vnode}"), instance)
+        for instance in instances
+        for vnode in range(VIRTUAL_NODES)
+    )
+    if not ring:
+        return {}
+    points = [point for point, _ in ring]
+    assignment = {}
+    for partition in range(partitions):
+        i = bisect.bisect(points, _ring_hash(f"partition-{partition}")) % len(ring)
+        assignment[partition] = ring[i][1]
+    return assignment
+
+
+class ShardCoordinator:
+    """Split the symbol universe between market-feeder instances.
+
+    Symbols hash into ``shard_partitions`` fixed partitions. Instances
+    heartbeat into Postgres and place the partitions on a consistent hash ring
+    of the live instances. Each instance then claims its partitions through
+    expiring leases. A partition moves only once its previous owner released
+    it or its lease expired. If Postgres is unreachable, an instance keeps
+    the partitions it holds only while their leases are valid. It drops them
+    all at the last failed heartbeat before the leases expire, so it has
+    stopped polling them before a peer can take them over. Keep
+    ``shard_lease_ttl`` well above twice the heartbeat interval, or a single
+    failed heartbeat is enough to drop them.
+
+    With sharding disabled, the instance owns every symbol.
+    """
+
+    def __init__(self):
+        self.instance_id = settings.shard_instance_id or socket.gethostname()
+        self._enabled = settings.shard_enabled
+        self._partitions = max(1, settings.shard_partitions)
+        self._owned: frozenset[int] = frozenset(range(self._partitions)) if not self._enabled else frozenset()
+        self._instances: list[str] = []
+        self._partition_cache: dict[str, int] = {}
+        self._listeners: list[Callable[[], Awaitable[None]]] = []
+        self._pool = None
+        self._last_sync = 0.0
+        # Monotonic time at which our leases run out if they are not renewed
+        self._lease_expiry = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def partition(self, symbol: str) -> int:
+        partition = self._partition_cache.get(symbol)
+        if partition is None:
+            partition = zlib.crc32(symbol.encode()) % self._partitions
+            self._partition_cache[symbol] = partition
+        return partition
+
+    def owns(self, symbol: str) -> bool:
+        """Whether this instance should collect ``symbol`` (a canonical registry symbol)."""
+        return not self._enabled or self.partition(symbol) in self._owned
+
+    def add_listener(self, listener: Callable[[], Awaitable[None]]):
+        """Await ``listener()`` whenever the owned partitions change."""
+        self._listeners.append(listener)
+
+    async def start(self):
+        """Connect to Postgres and claim an initial share. No-op when sharding is disabled."""
+        if not self._enabled:
+            return
+        logger.info(
+            "Shard mode — instance %s, %d partitions, lease %.0fs",
+            self.instance_id, self._partitions, settings.shard_lease_ttl,
+        )
+        await self._sync()
+
+    async def run(self, stop_event: asyncio.Event):
+        """Heartbeat and rebalance every ``shard_heartbeat_interval`` until stopped."""
+        if not self._enabled:
+            return
+        try:
+            while not stop_event.is_set():
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=settings.shard_heartbeat_interval)
+                    break
+                except asyncio.TimeoutError:
+                    pass
+                await self._sync()
+        finally:
+            await self._leave()
+
+    async def _sync(self):
+        # Leases are granted relative to Postgres' NOW(), which is no earlier than this
+        attempted = time.monotonic()
+        before = self._owned
+        try:
+            # Bounded, so a hung connection cannot hold off the expiry check below
+            owned = await asyncio.wait_for(self._rebalance(), timeout=settings.shard_heartbeat_interval)
+        except Exception:
+            # Stop before the leases lapse: the next heartbeat waits one interval and
+            # may take another to fail, which could be after they have expired
+            deadline = time.monotonic() + 2 * settings.shard_heartbeat_interval
+            if self._owned and deadline >= self._lease_expiry:
+                logger.exception("Shard heartbeat failed — leases about to expire, dropping %d partitions", len(self._owned))
+                await self._set_owned(frozenset())
+            else:
+                logger.exception("Shard heartbeat failed — keeping %d partitions", len(self._owned))
+            return
+        self._last_sync = time.time()
+        self._lease_expiry = attempted + settings.shard_lease_ttl
+        if owned != before:
+            logger.info(
+                "Shard rebalanced — %d live instances, owning %d/%d partitions (+%d −%d)",
+                len(self._instances), len(owned), self._partitions,
+                len(owned - before), len(before - owned),
+            )
+        if owned != self._owned:
+            await self._set_owned(owned)
+
+    async def _set_owned(self, owned: frozenset[int]):
+        self._owned = owned
+        SHARD_REBALANCES.inc()
+        SHARD_PARTITIONS_OWNED.set(len(owned))
+        for listener in self._listeners:
+            try:
+                await listener()
+            except Exception:
+                logger.exception("Shard listener failed")
+
+    async def _rebalance(self) -> frozenset[int]:
+        if self._pool is None:
+            self._pool = await asyncpg.create_pool(settings.postgres_url, min_size=1, max_size=2)
+            async with self._pool.acquire() as conn:
+                await conn.execute(_SCHEMA)
+        ttl = settings.shard_lease_ttl
+        async with self._pool.acquire() as conn:
+            await conn.execute(_HEARTBEAT, SERVICE, self.instance_id)
+            rows = await conn.fetch(_LIVE_INSTANCES, SERVICE, ttl)
+            self._instances = sorted(row["instance_id"] for row in rows)
+            SHARD_INSTANCES.set(len(self._instances))
+
+            assignment = assign_partitions(self._instances, self._partitions)
+            wanted = [p for p, owner in assignment.items() if owner == self.instance_id]
+            released = [p for p in self._owned if assignment.get(p) != self.instance_id]
+            if released:
+                # Sources stop polling a partition before a peer can lease it
+                await self._set_owned(self._owned.difference(released))
+                await conn.execute(_RELEASE, SERVICE, self.instance_id, released)
+            rows = await conn.fetch(_ACQUIRE, SERVICE, self.instance_id, ttl, wanted)
+        return frozenset(row["partition"] for row in rows)
+
+    async def _leave(self):
+        """Hand partitions back immediately so peers take over without waiting for expiry."""
+        if self._pool is None:
+            return
+        released = list(self._owned)
+        await self._set_owned(frozenset())
+        try:
+            async with self._pool.acquire() as conn:
+                await conn.execute(_RELEASE, SERVICE, self.instance_id, released)
+                await conn.execute(_DEREGISTER, SERVICE, self.instance_id)
+            logger.info("Shard %s released %d partitions", self.instance_id, len(released))
+        except Exception:
+            logger.exception("Could not release shard leases — peers will take over after expiry")
+        finally:
+            await self._pool.close()
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self._enabled,
+            "instance": self.instance_id,
+            "instances": self._instances,
+            "partitions": self._partitions,
+            "owned": len(self._owned),
+            "last_sync": round(self._last_sync, 1),
+        }
+
+
+coordinator = ShardCoordinator()
@@ -1,116 +1,529 @@
 import asyncio
 import json
 import logging
+import os
 import time
-from typing import Callable
+from typing import Callable, Iterable
 
 import aiohttp
+from fastapi import APIRouter, Body, Depends
 
 from config import settings
-from health import ACTIVE_SOURCES
+from health import (
+    ACTIVE_SOURCES,
+    BINANCE_CONFLATED,
+    BINANCE_CONFLATOR_PENDING,
+    BINANCE_CONNECTIONS,
+    BINANCE_STREAMS,
+    FETCH_DURATION,
+    require_admin,
+)
+from processors.decode_pool import DecodePool
+from processors.pipeline import Pipeline
+from scheduler import provider_budget
+from sharding import coordinator
+from symbols import registry
+from ticks import Tick
 
 logger = logging.getLogger("market-feeder.binance_ws")
 
-STREAMS = [
-    "btcusdt@ticker",
-    "ethusdt@ticker",
-    "solusdt@ticker",
-    "bnbusdt@ticker",
-    "xrpusdt@ticker",
-]
+# Quote assets stripped from a pair missing from the registry to get its
+# dashboard symbol (BTCUSDT -> BTC)
+QUOTE_ASSETS = ("USDT", "FDUSD", "USDC", "BUSD")
 
-WS_URL = "wss://stream.binance.com:9443/ws"
+MAX_RECONNECT_DELAY = 60
+# Start of every combined-stream data message (control responses differ)
+STREAM_PREFIX = '{"stream":"'
 
-SYMBOL_MAP = {
-    "BTCUSDT": "BTC",
-    "ETHUSDT": "ETH",
-    "SOLUSDT": "SOL",
-    "BNBUSDT": "BNB",
-    "XRPUSDT": "XRP",
-}
+# Binance accepts at most 5 control messages per second per connection
+CONTROL_MESSAGE_INTERVAL = 0.25
+# Streams per SUBSCRIBE/UNSUBSCRIBE message
+CONTROL_MESSAGE_STREAMS = 100
 
-MAX_RECONNECT_DELAY = 60
+# Most 1-minute klines one REST request returns
+KLINES_LIMIT = 1000
+KLINES_TIMEOUT = aiohttp.ClientTimeout(total=10)
 
 
-async def run(write_fn: Callable, stop_event: asyncio.Event):
-    """Connect to Binance WebSocket for real-time ticker data. Only runs if BINANCE_API_KEY is set."""
-    if not settings.binance_api_key:
-        logger.info("BINANCE_API_KEY not set — Binance WS source disabled")
-        return
+def display_symbol(pair: str) -> str:
+    instrument = registry.resolve("binance", pair)
+    if instrument is not None:
+        return instrument.symbol
+    for quote in QUOTE_ASSETS:
+        if pair.endswith(quote) and len(pair) > len(quote):
+            return pair[:-len(quote)]
+    return pair
 
-    logger.info("Binance WS source starting for %d streams", len(STREAMS))
-    ACTIVE_SOURCES.inc()
-    reconnect_delay = 1
 
-    try:
+def _stream(pair: str) -> str:
+    return f"{pair.lower()}@ticker"
+
+
+def parse_symbols(text: str) -> list[str]:
+    """Split a comma/whitespace separated list of pairs, normalised to upper case."""
+    return [pair.upper() for pair in text.replace(",", " ").split()]
+
+
+class Conflator:
+    """Per-symbol latest-value slots, flushed to the writer on a fixed tick.
+
+    A ticker that arrives before the previous one for the same symbol was
+    flushed replaces it, so each flush writes at most one point per symbol.
+    """
+
+    def __init__(self, write_fn: Callable, interval: float):
+        self._write_fn = write_fn
+        self._interval = interval
+        self._slots: dict[str, Tick] = {}
+
+    def offer(self, tick: Tick):
+        if tick.symbol in self._slots:
+            BINANCE_CONFLATED.inc()
+        self._slots[tick.symbol] = tick
+        BINANCE_CONFLATOR_PENDING.set(len(self._slots))
+
+    async def flush(self):
+        if not self._slots:
+            return
+        ticks = list(self._slots.values())
+        self._slots = {}
+        BINANCE_CONFLATOR_PENDING.set(0)
+        await self._write_fn(ticks, source="binance_ws")
+
+    async def run(self, stop_event: asyncio.Event):
+        """Flush the slots every interval until stopped."""
         while not stop_event.is_set():
             try:
-                combined_url = f"{WS_URL}/{'/'.join(STREAMS)}"
-                async with aiohttp.ClientSession() as session:
-                    async with session.ws_connect(combined_url) as ws:
-                        logger.info("Binance WS connected")
-                        reconnect_delay = 1
-
-                        async for msg in ws:
-                            if stop_event.is_set():
-                                break
-
-                            if msg.type == aiohttp.WSMsgType.TEXT:
-                                try:
-                                    data = json.loads(msg.data)
-                                    point = _parse_ticker(data)
-                                    if point:
-                                        await write_fn([point], source="binance_ws")
-                                except Exception:
-                                    logger.exception("Error parsing Binance message")
-
-                            elif msg.type in (aiohttp.WSMsgType.ERROR, aiohttp.WSMsgType.CLOSED):
-                                logger.warning("Binance WS closed/error: %s", msg.type)
-                                break
+                await asyncio.wait_for(stop_event.wait(), timeout=self._interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Error flushing conflated Binance tickers")
+
+
+class _Connection:
+    """One combined-stream WebSocket carrying a subset of the subscribed streams.
+
+    Streams are added and removed with SUBSCRIBE/UNSUBSCRIBE messages on the
+    live socket; after a reconnect the whole set is subscribed again.
+    """
+
+    def __init__(
+        self,
+        index: int,
+        session: aiohttp.ClientSession,
+        on_event: Callable,
+        stop_event: asyncio.Event,
+        decode_pool: DecodePool | None = None,
+    ):
+        self.index = index
+        self.streams: set[str] = set()
+        self._session = session
+        self._on_event = on_event
+        self._decode_pool = decode_pool
+        self._stop_event = stop_event
+        self._closing = asyncio.Event()
+        self._ws: aiohttp.ClientWebSocketResponse | None = None
+        self._send_lock = asyncio.Lock()
+        self._last_send = 0.0
+        self._next_id = 0
+        self.task: asyncio.Task | None = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run(), name=f"binance-ws-{self.index}")
+
+    async def close(self):
+        self._closing.set()
+        if self._ws is not None:
+            await self._ws.close()
+        elif self.task is not None:
+            # Connecting or backing off — nothing to flush
+            self.task.cancel()
+        if self.task is not None:
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    async def subscribe(self, streams: set[str]):
+        self.streams |= streams
+        await self._control("SUBSCRIBE", streams)
+
+    async def unsubscribe(self, streams: set[str]):
+        self.streams -= streams
+        await self._control("UNSUBSCRIBE", streams)
+
+    async def _control(self, method: str, streams: set[str]):
+        ws = self._ws
+        if ws is None or ws.closed or not streams:
+            # Not connected: the full set is subscribed on (re)connect
+            return
+        params = sorted(streams)
+        async with self._send_lock:
+            for i in range(0, len(params), CONTROL_MESSAGE_STREAMS):
+                wait = self._last_send + CONTROL_MESSAGE_INTERVAL - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._next_id += 1
+                await ws.send_str(json.dumps({
+                    "method": method,
+                    "params": params[i:i + CONTROL_MESSAGE_STREAMS],
+                    "id": self._next_id,
+                }))
+                self._last_send = time.monotonic()
+
+    def _stopped(self) -> bool:
+        return self._stop_event.is_set() or self._closing.is_set()
+
+    async def _run(self):
+        reconnect_delay = 1
+        while not self._stopped():
+            try:
+                async with self._session.ws_connect(settings.binance_ws_url) as ws:
+                    self._ws = ws
+                    logger.info("Binance WS #%d connected — %d streams", self.index, len(self.streams))
+                    reconnect_delay = 1
+                    await self._control("SUBSCRIBE", self.streams)
+
+                    async for msg in ws:
+                        if self._stopped():
+                            break
+
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            if self._decode_pool is not None and msg.data.startswith(STREAM_PREFIX):
+                                await self._decode_pool.submit(msg.data)
+                                continue
+                            try:
+                                data = json.loads(msg.data)
+                                event = data.get("data")
+                                if event is not None:
+                                    await self._on_event(event)
+                                elif "code" in data:
+                                    logger.warning("Binance WS #%d rejected request %s: %s", self.index, data.get("id"), data.get("msg"))
+                            except Exception:
+                                logger.exception("Error parsing Binance message")
+
+                        elif msg.type in (aiohttp.WSMsgType.ERROR, aiohttp.WSMsgType.CLOSED):
+                            logger.warning("Binance WS #%d closed/error: %s", self.index, msg.type)
+                            break
 
             except asyncio.CancelledError:
                 break
             except Exception:
-                logger.exception("Binance WS connection error")
+                logger.exception("Binance WS #%d connection error", self.index)
+            finally:
+                self._ws = None
 
-            if stop_event.is_set():
+            if self._stopped():
                 break
 
-            logger.info("Reconnecting Binance WS in %ds...", reconnect_delay)
+            logger.info("Reconnecting Binance WS #%d in %ds...", self.index, reconnect_delay)
             try:
-                await asyncio.wait_for(stop_event.wait(), timeout=reconnect_delay)
+                await asyncio.wait_for(self._closing.wait(), timeout=reconnect_delay)
                 break
             except asyncio.TimeoutError:
                 pass
             reconnect_delay = min(reconnect_delay * 2, MAX_RECONNECT_DELAY)
+
+
+class StreamManager:
+    """The set of Binance pairs being streamed, spread over as many connections as needed.
+
+    Each connection carries at most ``binance_streams_per_connection``
+    streams. Changing the set sends SUBSCRIBE/UNSUBSCRIBE on the affected
+    connections only; a new connection is opened when the existing ones are
+    full and an emptied one is closed. In shard mode only the pairs whose
+    symbol this instance owns are streamed. Until the source is running,
+    changes only update the desired set.
+    """
+
+    def __init__(self):
+        self._wanted: set[str] = set()  # configured pairs
+        self._pairs: dict[str, str] = {}  # streamed pairs (owned by this shard) -> dashboard symbol
+        self._connections: list[_Connection] = []
+        self._next_index = 0
+        self._lock = asyncio.Lock()
+        self._session: aiohttp.ClientSession | None = None
+        self._on_event: Callable | None = None
+        self._stop_event: asyncio.Event | None = None
+        self._decode_pool: DecodePool | None = None
+
+    @property
+    def pairs(self) -> list[str]:
+        return sorted(self._wanted)
+
+    def symbol(self, pair: str) -> str | None:
+        return self._pairs.get(pair)
+
+    def streamed(self) -> dict[str, str]:
+        """Pairs streamed by this shard, mapped to their dashboard symbol."""
+        return dict(self._pairs)
+
+    async def start(
+        self,
+        session: aiohttp.ClientSession,
+        on_event: Callable,
+        stop_event: asyncio.Event,
+        decode_pool: DecodePool | None = None,
+    ):
+        self._session, self._on_event, self._stop_event = session, on_event, stop_event
+        self._decode_pool = decode_pool
+        async with self._lock:
+            await self._assign({_stream(pair) for pair in self._pairs})
+
+    async def stop(self):
+        async with self._lock:
+            await asyncio.gather(*(conn.close() for conn in self._connections))
+            self._connections = []
+            self._session = None
+            self._update_metrics()
+
+    async def set_pairs(self, pairs: Iterable[str]) -> dict:
+        """Replace the configured pairs. Returns the pairs added and removed."""
+        wanted = {pair.upper() for pair in pairs}
+        added, removed = wanted - self._wanted, self._wanted - wanted
+        self._wanted = wanted
+        await self.refresh()
+        if added or removed:
+            logger.info("Binance pairs updated — +%d −%d, %d total", len(added), len(removed), len(wanted))
+        return {"added": sorted(added), "removed": sorted(removed)}
+
+    async def add(self, pairs: Iterable[str]) -> dict:
+        return await self.set_pairs(self._wanted | {pair.upper() for pair in pairs})
+
+    async def remove(self, pairs: Iterable[str]) -> dict:
+        return await self.set_pairs(self._wanted - {pair.upper() for pair in pairs})
+
+    async def refresh(self):
+        """Stream the configured pairs this shard owns, and only those."""
+        async with self._lock:
+            streamed = {}
+            for pair in self._wanted:
+                symbol = self._pairs.get(pair) or display_symbol(pair)
+                if coordinator.owns(symbol):
+                    streamed[pair] = symbol
+            added = streamed.keys() - self._pairs.keys()
+            removed = self._pairs.keys() - streamed.keys()
+            self._pairs = streamed
+
+            if self._session is not None:
+                await self._release({_stream(pair) for pair in removed})
+                await self._assign({_stream(pair) for pair in added})
+            self._update_metrics()
+
+    async def _assign(self, streams: set[str]):
+        limit = max(1, settings.binance_streams_per_connection)
+        pending = sorted(streams)
+        for conn in self._connections:
+            room = limit - len(conn.streams)
+            if room > 0 and pending:
+                await conn.subscribe(set(pending[:room]))
+                pending = pending[room:]
+        while pending:
+            conn = _Connection(self._next_index, self._session, self._on_event, self._stop_event, self._decode_pool)
+            self._next_index += 1
+            conn.streams = set(pending[:limit])
+            pending = pending[limit:]
+            conn.start()
+            self._connections.append(conn)
+
+    async def _release(self, streams: set[str]):
+        for conn in list(self._connections):
+            owned = conn.streams & streams
+            if not owned:
+                continue
+            if owned == conn.streams:
+                self._connections.remove(conn)
+                await conn.close()
+            else:
+                await conn.unsubscribe(owned)
+
+    def _update_metrics(self):
+        BINANCE_STREAMS.set(len(self._pairs))
+        BINANCE_CONNECTIONS.set(len(self._connections))
+
+    def stats(self) -> dict:
+        return {
+            "pairs": len(self._wanted),
+            "streamed": len(self._pairs),
+            "connections": [len(conn.streams) for conn in self._connections],
+        }
+
+
+stream_manager = StreamManager()
+
+
+async def _watch_symbols_file(path: str, stop_event: asyncio.Event):
+    """Re-apply BINANCE_SYMBOLS_FILE whenever its modification time changes."""
+    mtime = None
+    while not stop_event.is_set():
+        try:
+            current = os.stat(path).st_mtime
+            if current != mtime:
+                with open(path) as f:
+                    pairs = parse_symbols(f.read())
+                mtime = current
+                if pairs:
+                    await stream_manager.set_pairs(pairs)
+                else:
+                    logger.warning("Symbols file %s is empty — keeping current pairs", path)
+        except FileNotFoundError:
+            pass
+        except Exception:
+            logger.exception("Error reloading Binance symbols from %s", path)
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=settings.binance_symbols_reload_interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run(pipeline: Pipeline, stop_event: asyncio.Event, session: aiohttp.ClientSession):
+    """Stream Binance tickers for the registry's pairs (or BINANCE_SYMBOLS). Only runs if BINANCE_API_KEY is set.
+
+    With conflation on, the pipeline's observers (candles, quote cache) still
+    see every ticker as it arrives; only the writes are conflated.
+    """
+    if not settings.binance_api_key:
+        logger.info("BINANCE_API_KEY not set — Binance WS source disabled")
+        return
+
+    conflator = None
+    flusher = None
+    if settings.binance_conflation_ms > 0:
+        conflator = Conflator(pipeline.write_observed, settings.binance_conflation_ms / 1000)
+        flusher = asyncio.create_task(conflator.run(stop_event), name="binance-conflator")
+
+    async def on_event(data: dict):
+        point = _parse_ticker(data)
+        if point is None:
+            return
+        if conflator:
+            pipeline.observe([point])
+            conflator.offer(point)
+        else:
+            await pipeline.write_points([point], source="binance_ws")
+
+    async def on_decoded(decoded: list[tuple[str, Tick]]):
+        # Drop pairs unsubscribed while their messages were in flight
+        points = [tick for pair, tick in decoded if stream_manager.symbol(pair)]
+        if not points:
+            return
+        if conflator:
+            pipeline.observe(points)
+            for point in points:
+                conflator.offer(point)
+        else:
+            await pipeline.write_points(points, source="binance_ws")
+
+    decode_pool = None
+    if settings.decode_workers > 0:
+        decode_pool = DecodePool(settings.decode_workers, on_decoded)
+        decode_pool.start()
+
+    if not stream_manager.pairs:
+        pairs = parse_symbols(settings.binance_symbols) or registry.provider_symbols("binance")
+        await stream_manager.set_pairs(pairs)
+    watcher = None
+    if settings.binance_symbols_file:
+        watcher = asyncio.create_task(
+            _watch_symbols_file(settings.binance_symbols_file, stop_event), name="binance-symbols"
+        )
+
+    logger.info(
+        "Binance WS source starting for %d pairs (conflation=%dms, %d streams/connection)",
+        len(stream_manager.pairs), settings.binance_conflation_ms, settings.binance_streams_per_connection,
+    )
+    ACTIVE_SOURCES.inc()
+    coordinator.add_listener(stream_manager.refresh)
+
+    try:
+        await stream_manager.start(session, on_event, stop_event, decode_pool)
+        await stop_event.wait()
     finally:
+        if watcher:
+            watcher.cancel()
+            await asyncio.gather(watcher, return_exceptions=True)
+        await stream_manager.stop()
+        if decode_pool:
+            await decode_pool.close()
+        if flusher:
+            flusher.cancel()
+            await asyncio.gather(flusher, return_exceptions=True)
+            await conflator.flush()
         ACTIVE_SOURCES.dec()
         logger.info("Binance WS source stopped")
 
 
-def _parse_ticker(data: dict) -> dict | None:
-    """Parse a 24hr ticker event into an InfluxDB point dict."""
-    symbol_raw = data.get("s", "")
-    symbol = SYMBOL_MAP.get(symbol_raw)
+def _parse_ticker(data: dict) -> Tick | None:
+    """Parse a 24hr ticker event for a streamed pair into a Tick."""
+    symbol = stream_manager.symbol(data.get("s", ""))
     if not symbol:
         return None
+    return parse_ticker(data, symbol)
+
 
+def parse_ticker(data: dict, symbol: str) -> Tick | None:
+    """Build the Tick for a 24hr ticker event, or None if it is malformed."""
     try:
-        return {
-            "measurement": "price",
-            "tags": {
-                "symbol": symbol,
-                "exchange": "binance",
-                "asset_type": "crypto",
-            },
-            "fields": {
-                "last": float(data.get("c", 0)),
-                "bid": float(data.get("b", 0)),
-                "ask": float(data.get("a", 0)),
-                "volume_24h": float(data.get("v", 0)),
-                "change_pct_24h": float(data.get("P", 0)),
-            },
-            "time": time.time_ns(),
-        }
+        # Stamp with the exchange event time (ms) so ingest latency covers the whole path
+        event_ms = data.get("E")
+        ts = int(event_ms) * 1_000_000 if event_ms else time.time_ns()
+        return Tick(
+            symbol,
+            "binance",
+            "crypto",
+            ts,
+            last=float(data.get("c", 0)),
+            bid=float(data.get("b", 0)),
+            ask=float(data.get("a", 0)),
+            volume_24h=float(data.get("v", 0)),
+            change_pct_24h=float(data.get("P", 0)),
+        )
     except (ValueError, TypeError):
         return None
+
+
+async def fetch_klines(session: aiohttp.ClientSession, pair: str, start_ns: int, end_ns: int) -> list[Tick]:
+    """1-minute closes for ``pair`` between two times, up to KLINES_LIMIT bars (backfill).
+
+    Each close is stamped at its bar's end, so re-fetching a range yields
+    the same timestamps.
+    """
+    params = {
+        "symbol": pair,
+        "interval": "1m",
+        "startTime": str(start_ns // 1_000_000),
+        "endTime": str(end_ns // 1_000_000),
+        "limit": str(KLINES_LIMIT),
+    }
+    await provider_budget("binance").acquire()
+    with FETCH_DURATION.labels(source="binance", endpoint="klines").time():
+        async with session.get(f"{settings.binance_api_url}/api/v3/klines", params=params, timeout=KLINES_TIMEOUT) as resp:
+            resp.raise_for_status()
+            rows = await resp.json()
+
+    symbol = display_symbol(pair)
+    # Kline close time is the last millisecond of the bar
+    return [Tick(symbol, "binance", "crypto", (int(row[6]) + 1) * 1_000_000, last=float(row[4])) for row in rows]
+
+
+router = APIRouter(prefix="/admin/binance", dependencies=[Depends(require_admin)])
+
+
+@router.get("/symbols")
+async def get_symbols():
+    return {"pairs": stream_manager.pairs, **stream_manager.stats()}
+
+
+@router.put("/symbols")
+async def put_symbols(pairs: list[str] = Body(...)):
+    return await stream_manager.set_pairs(pairs)
+
+
+@router.post("/symbols")
+async def post_symbols(pairs: list[str] = Body(...)):
+    return await stream_manager.add(pairs)
+
+
+@router.delete("/symbols/{pair}")
+async def delete_symbol(pair: str):
+    return await stream_manager.remove([pair])
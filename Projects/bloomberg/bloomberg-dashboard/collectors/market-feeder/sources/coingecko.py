@@ -1,74 +1,171 @@
 import asyncio
+import codecs
+import json
 import logging
 import time
-from typing import Callable
+from typing import AsyncIterator, Callable
 
-from pycoingecko import CoinGeckoAPI
+import aiohttp
 
 from config import settings
-from health import ACTIVE_SOURCES
+from health import ACTIVE_SOURCES, FETCH_DURATION
+from resilience import breaker, host_failure
+from scheduler import jittered, provider_budget
+from sharding import coordinator
+from symbols import registry
+from ticks import Tick
 
 logger = logging.getLogger("market-feeder.coingecko")
 
-COIN_IDS = ["bitcoin", "ethereum", "solana", "binancecoin", "ripple"]
-COIN_SYMBOLS = {"bitcoin": "BTC", "ethereum": "ETH", "solana": "SOL", "binancecoin": "BNB", "ripple": "XRP"}
+FREE_API_URL = "https://api.coingecko.com/api/v3"
+PRO_API_URL = "https://pro-api.coingecko.com/api/v3"
+# /coins/markets returns at most 250 coins per page
+MAX_PER_PAGE = 250
+TIMEOUT = aiohttp.ClientTimeout(total=30)
+READ_CHUNK = 64 * 1024
 
+_decoder = json.JSONDecoder()
 
-async def run(write_fn: Callable, stop_event: asyncio.Event):
-    """Poll CoinGecko every COINGECKO_INTERVAL seconds. Single batch call for all coins."""
-    cg = CoinGeckoAPI()
+
+def _api() -> tuple[str, dict]:
+    """Base URL and auth headers: the pro API when a key is set, the public one otherwise."""
     if settings.coingecko_api_key:
-        cg = CoinGeckoAPI(api_key=settings.coingecko_api_key)
+        base, headers = PRO_API_URL, {"x-cg-pro-api-key": settings.coingecko_api_key}
+    else:
+        base, headers = FREE_API_URL, {}
+    return (settings.coingecko_api_url or base).rstrip("/"), headers
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"rate limited, retrying in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
 
+async def run(write_fn: Callable, stop_event: asyncio.Event, session: aiohttp.ClientSession):
+    """Poll CoinGecko /coins/markets every COINGECKO_INTERVAL seconds for every registry coin."""
     interval = settings.coingecko_interval
-    logger.info("CoinGecko source started — polling every %ds for %s", interval, list(COIN_SYMBOLS.values()))
+    logger.info(
+        "CoinGecko source started — polling every %ds for %d coins",
+        interval, len(registry.for_provider("coingecko")),
+    )
     ACTIVE_SOURCES.inc()
+    gate = breaker("coingecko", host_failure)
 
     try:
         while not stop_event.is_set():
+            delay = jittered(interval)
             try:
-                data = await asyncio.to_thread(
-                    cg.get_price,
-                    ids=",".join(COIN_IDS),
-                    vs_currencies="usd",
-                    include_24hr_vol=True,
-                    include_24hr_change=True,
-                    include_market_cap=True,
-                )
-
-                points = []
-                ts = time.time_ns()
-
-                for coin_id, values in data.items():
-                    symbol = COIN_SYMBOLS.get(coin_id, coin_id.upper())
-                    points.append({
-                        "measurement": "price",
-                        "tags": {
-                            "symbol": symbol,
-                            "exchange": "coingecko",
-                            "asset_type": "crypto",
-                        },
-                        "fields": {
-                            "last": float(values.get("usd", 0)),
-                            "volume_24h": float(values.get("usd_24h_vol", 0)),
-                            "change_pct_24h": float(values.get("usd_24h_change", 0)),
-                            "market_cap": float(values.get("usd_market_cap", 0)),
-                        },
-                        "time": ts,
-                    })
-
-                if points:
-                    await write_fn(points, source="coingecko")
-                    logger.debug("Wrote %d crypto prices", len(points))
-
-            except Exception:
+                coin_ids = [
+                    instrument.providers["coingecko"]
+                    for instrument in registry.for_provider("coingecko")
+                    if coordinator.owns(instrument.symbol)
+                ]
+                if coin_ids and gate.allow():
+                    written = await _poll(session, coin_ids, write_fn)
+                    gate.record_success()
+                    logger.debug("Wrote %d crypto prices", written)
+            except RateLimited as e:
+                logger.warning("CoinGecko %s", e)
+                delay = max(delay, e.retry_after)
+            except Exception as e:
+                gate.record_failure(e)
                 logger.exception("CoinGecko fetch error")
 
             try:
-                await asyncio.wait_for(stop_event.wait(), timeout=interval)
+                await asyncio.wait_for(stop_event.wait(), timeout=delay)
                 break
             except asyncio.TimeoutError:
                 pass
     finally:
         ACTIVE_SOURCES.dec()
         logger.info("CoinGecko source stopped")
+
+
+async def _poll(session: aiohttp.ClientSession, coin_ids: list[str], write_fn: Callable) -> int:
+    """Fetch ``coin_ids`` in chunks of COINGECKO_IDS_PER_REQUEST, writing each chunk as it completes."""
+    size = max(1, settings.coingecko_ids_per_request)
+    written = 0
+    for i in range(0, len(coin_ids), size):
+        points = [tick async for tick in _fetch_markets(session, coin_ids[i:i + size])]
+        if points:
+            await write_fn(points, source="coingecko")
+            written += len(points)
+    return written
+
+
+async def _fetch_markets(session: aiohttp.ClientSession, coin_ids: list[str]) -> AsyncIterator[Tick]:
+    """Yield a Tick per coin from /coins/markets, following pages until every id was returned or a page is short."""
+    base, headers = _api()
+    per_page = min(len(coin_ids), settings.coingecko_per_page, MAX_PER_PAGE)
+    params = {
+        "vs_currency": "usd",
+        "ids": ",".join(coin_ids),
+        "per_page": str(per_page),
+        "price_change_percentage": "24h",
+    }
+    page = 1
+    received = 0
+    while True:
+        params["page"] = str(page)
+        count = 0
+        await provider_budget("coingecko").acquire()
+        with FETCH_DURATION.labels(source="coingecko", endpoint="coins_markets").time():
+            async with session.get(f"{base}/coins/markets", params=params, headers=headers, timeout=TIMEOUT) as resp:
+                if resp.status == 429:
+                    raise RateLimited(float(resp.headers.get("Retry-After", 60)))
+                resp.raise_for_status()
+                async for coin in _iter_array(resp):
+                    count += 1
+                    tick = _parse_market(coin)
+                    if tick is not None:
+                        yield tick
+        received += count
+        if count < per_page or received >= len(coin_ids):
+            return
+        page += 1
+
+
+async def _iter_array(resp: aiohttp.ClientResponse) -> AsyncIterator[dict]:
+    """Decode a top-level JSON array one element at a time as the body streams in."""
+    text = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    opened = False
+    async for chunk in resp.content.iter_chunked(READ_CHUNK):
+        buf = buf[pos:] + text.decode(chunk)
+        pos = 0
+        while True:
+            # Skip whitespace, the opening bracket and separators
+            while pos < len(buf) and buf[pos] in " \t\r\n,[":
+                opened = opened or buf[pos] == "["
+                pos += 1
+            if pos >= len(buf) or buf[pos] == "]":
+                break
+            if not opened:
+                raise ValueError("CoinGecko response is not a JSON array")
+            try:
+                item, pos = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break  # element continues in the next chunk
+            yield item
+    if buf[pos:].strip() not in ("", "]"):
+        raise ValueError("Truncated CoinGecko response")
+
+
+def _parse_market(coin: dict) -> Tick | None:
+    instrument = registry.resolve("coingecko", coin.get("id", ""))
+    price = coin.get("current_price")
+    if instrument is None or price is None:
+        return None
+
+    return Tick(
+        instrument.symbol,
+        "coingecko",
+        instrument.asset_type,
+        time.time_ns(),
+        last=float(price),
+        volume_24h=float(coin.get("total_volume") or 0),
+        change_pct_24h=float(coin.get("price_change_percentage_24h") or 0),
+        market_cap=float(coin.get("market_cap") or 0),
+    )
@@ -6,72 +6,114 @@ from typing import Callable
 import aiohttp
 
 from config import settings
-from health import ACTIVE_SOURCES
+from health import ACTIVE_SOURCES, FETCH_DURATION
+from resilience import CircuitOpen, breaker, call, host_failure
+from scheduler import AdaptiveScheduler, provider_budget
+from sharding import coordinator
+from symbols import registry
+from ticks import Tick
 
 logger = logging.getLogger("market-feeder.yahoo")
 
-TICKERS = {
-    "stocks": ["AAPL", "MSFT", "TSLA"],
-    "indices": ["^GSPC", "^IXIC"],
-    "forex": ["EURUSD=X", "GBPUSD=X"],
-    "commodities": ["GC=F", "CL=F"],
-}
-
-ASSET_TYPE_MAP = {
-    "stocks": "stock",
-    "indices": "index",
-    "forex": "forex",
-    "commodities": "commodity",
-}
-
-SYMBOL_CLEAN = {
-    "^GSPC": "SP500",
-    "^IXIC": "NASDAQ",
-    "EURUSD=X": "EURUSD",
-    "GBPUSD=X": "GBPUSD",
-    "GC=F": "GOLD",
-    "CL=F": "CRUDE_OIL",
-}
-
-ALL_TICKERS = []
-for tlist in TICKERS.values():
-    ALL_TICKERS.extend(tlist)
-
-CHART_API = "https://query1.finance.yahoo.com/v8/finance/chart/{ticker}"
+QUOTE_API = f"{settings.yahoo_api_url}/v7/finance/quote"
+CRUMB_API = f"{settings.yahoo_api_url}/v1/test/getcrumb"
+CHART_API = f"{settings.yahoo_api_url}/v8/finance/chart/{{ticker}}"
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
 }
-
-
-def _get_asset_type(ticker: str) -> str:
-    for category, tlist in TICKERS.items():
-        if ticker in tlist:
-            return ASSET_TYPE_MAP[category]
-    return "unknown"
-
-
-async def run(write_fn: Callable, stop_event: asyncio.Event):
-    """Poll Yahoo Finance every COLLECTION_INTERVAL_REST seconds."""
+TIMEOUT = aiohttp.ClientTimeout(total=10)
+# How long batching stays off after the Quote API refused the crumb handshake
+QUOTE_RETRY_AFTER = 3600
+
+
+class QuoteAuth:
+    """Cookie and crumb that the Quote API requires.
+
+    Without them Yahoo answers 401. The cookie is set by a request to
+    fc.yahoo.com, and the crumb is then read from /v1/test/getcrumb with that
+    cookie. Both are reused until a 401, which renews them once. If the
+    handshake fails or the Quote API still refuses, batching is switched off
+    for QUOTE_RETRY_AFTER seconds and every ticker goes through the Chart API.
+    """
+
+    def __init__(self):
+        self.cookie: str | None = None
+        self.crumb: str | None = None
+        self._disabled_until = 0.0
+        self._lock: asyncio.Lock | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return time.monotonic() >= self._disabled_until
+
+    def disable(self, reason: str):
+        if self.enabled:
+            logger.warning(
+                "Yahoo Quote API unavailable (%s) — using the Chart API only for %ds", reason, QUOTE_RETRY_AFTER,
+            )
+        self._disabled_until = time.monotonic() + QUOTE_RETRY_AFTER
+        self.cookie = self.crumb = None
+
+    async def credentials(self, session: aiohttp.ClientSession, stale: str | None = None) -> tuple[str, str]:
+        """(cookie, crumb), renewed if missing or equal to the ``stale`` crumb that was just refused."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.crumb is None or self.crumb == stale:
+                await self._handshake(session)
+            return self.cookie, self.crumb
+
+    async def _handshake(self, session: aiohttp.ClientSession):
+        async with session.get(
+            settings.yahoo_cookie_url, headers=HEADERS, timeout=TIMEOUT, allow_redirects=False
+        ) as resp:
+            cookie = "; ".join(f"{morsel.key}={morsel.value}" for morsel in resp.cookies.values())
+        if not cookie:
+            raise RuntimeError("no cookie from Yahoo")
+        async with session.get(CRUMB_API, headers={**HEADERS, "Cookie": cookie}, timeout=TIMEOUT) as resp:
+            resp.raise_for_status()
+            crumb = (await resp.text()).strip()
+        if not crumb or "<" in crumb:
+            raise RuntimeError("no crumb from Yahoo")
+        self.cookie, self.crumb = cookie, crumb
+        logger.info("Yahoo Quote API crumb obtained")
+
+
+quote_auth = QuoteAuth()
+
+
+async def run(write_fn: Callable, stop_event: asyncio.Event, session: aiohttp.ClientSession):
+    """Poll Yahoo Finance every COLLECTION_INTERVAL_REST seconds while a ticker's market is open,
+    and every CLOSED_MARKET_INTERVAL seconds while it is closed."""
     if not settings.yahoo_finance_enabled:
         logger.info("Yahoo Finance disabled, skipping")
         return
 
     interval = settings.collection_interval_rest
-    logger.info("Yahoo Finance source started — polling every %ds for %d tickers", interval, len(ALL_TICKERS))
+    symbols = {instrument.providers["yahoo"]: instrument.symbol for instrument in registry.for_provider("yahoo")}
+    scheduler = AdaptiveScheduler(
+        {instrument.providers["yahoo"]: instrument.asset_type for instrument in registry.for_provider("yahoo")},
+        interval,
+        settings.closed_market_interval,
+    )
+    logger.info(
+        "Yahoo Finance source started — polling every %ds for %d tickers",
+        interval, len(registry.for_provider("yahoo")),
+    )
     ACTIVE_SOURCES.inc()
 
     try:
         while not stop_event.is_set():
             try:
-                points = await _fetch_all()
-                if points:
-                    await write_fn(points, source="yahoo_finance")
-                    logger.debug("Wrote %d ticker prices", len(points))
+                tickers = [t for t in scheduler.due() if coordinator.owns(symbols[t])]
+                if tickers:
+                    written = await _fetch_all(session, tickers, write_fn)
+                    logger.debug("Wrote %d ticker prices", written)
             except Exception:
                 logger.exception("Yahoo Finance fetch error")
 
             try:
-                await asyncio.wait_for(stop_event.wait(), timeout=interval)
+                await asyncio.wait_for(stop_event.wait(), timeout=scheduler.next_delay())
                 break
             except asyncio.TimeoutError:
                 pass
@@ -80,48 +122,140 @@ async def run(write_fn: Callable, stop_event: asyncio.Event):
         logger.info("Yahoo Finance source stopped")
 
 
-async def _fetch_all() -> list[dict]:
-    """Fetch all tickers via Yahoo Chart API."""
-    points = []
-    ts = time.time_ns()
+async def _fetch_all(session: aiohttp.ClientSession, tickers: list[str], write_fn: Callable) -> int:
+    """Fetch tickers, batched via the Quote API with the Chart API as per-ticker fallback.
 
-    timeout = aiohttp.ClientTimeout(total=10)
-    async with aiohttp.ClientSession(headers=HEADERS, timeout=timeout) as session:
-        tasks = [_fetch_ticker(session, ticker) for ticker in ALL_TICKERS]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-    for ticker_str, result in zip(ALL_TICKERS, results):
-        if isinstance(result, Exception):
-            logger.warning("Failed to fetch %s: %s", ticker_str, result)
+    Results are written as each request completes, so one slow ticker does
+    not hold back the others. Returns the number of points written.
+    """
+    ts = time.time_ns()
+    written = 0
+
+    missing = tickers
+    if settings.yahoo_batch_enabled and quote_auth.enabled:
+        size = max(1, settings.yahoo_batch_size)
+        chunks = [tickers[i:i + size] for i in range(0, len(tickers), size)]
+        found = set()
+        for request in asyncio.as_completed([_fetch_quotes(session, chunk, ts) for chunk in chunks]):
+            try:
+                result = await request
+            except CircuitOpen as e:
+                logger.debug("Skipping quote batch — breaker %s open", e)
+                continue
+            except Exception as e:
+                logger.warning("Failed to fetch quote batch: %s", e)
+                continue
+            if result:
+                await write_fn(list(result.values()), source="yahoo_finance")
+                written += len(result)
+                found.update(result)
+        missing = [t for t in tickers if t not in found]
+        if missing:
+            logger.debug("Quote batch missed %d tickers, falling back to chart API", len(missing))
+
+    for request in asyncio.as_completed([_fetch_ticker(session, ticker, ts) for ticker in missing]):
+        tick = await request
+        if tick is not None:
+            await write_fn([tick], source="yahoo_finance")
+            written += 1
+
+    return written
+
+
+async def _get_json(
+    session: aiohttp.ClientSession, endpoint: str, url: str, params: dict, headers: dict | None = None
+) -> dict:
+    await provider_budget("yahoo").acquire()
+    with FETCH_DURATION.labels(source="yahoo_finance", endpoint=endpoint).time():
+        async with session.get(url, params=params, headers=headers or HEADERS, timeout=TIMEOUT) as resp:
+            resp.raise_for_status()
+            return await resp.json()
+
+
+async def _fetch_quotes(session: aiohttp.ClientSession, tickers: list[str], ts: int) -> dict[str, Tick]:
+    """Fetch several tickers in one Quote API request. Returns ticks keyed by ticker."""
+    refused = None
+    for _ in range(2):
+        try:
+            cookie, crumb = await quote_auth.credentials(session, stale=refused)
+        except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError) as e:
+            quote_auth.disable(f"crumb handshake failed: {e}")
+            raise
+        params = {"symbols": ",".join(tickers), "crumb": crumb}
+        headers = {**HEADERS, "Cookie": cookie}
+        try:
+            data = await call(
+                "yahoo_quote",
+                [breaker("yahoo", host_failure)],
+                lambda: _get_json(session, "quote", QUOTE_API, params, headers),
+            )
+            break
+        except aiohttp.ClientResponseError as e:
+            if e.status != 401:
+                raise
+            refused = crumb
+    else:
+        quote_auth.disable("401 with a fresh crumb")
+        raise RuntimeError("Quote API refused the crumb")
+
+    wanted = set(tickers)
+    ticks = {}
+    for quote in (data.get("quoteResponse") or {}).get("result") or []:
+        ticker = quote.get("symbol")
+        last = quote.get("regularMarketPrice")
+        if ticker not in wanted or not last:
             continue
-        if result is None:
+        instrument = registry.resolve("yahoo", ticker)
+        if instrument is None:
             continue
 
-        symbol = SYMBOL_CLEAN.get(ticker_str, ticker_str)
-        asset_type = _get_asset_type(ticker_str)
-
-        result["tags"] = {
-            "symbol": symbol,
-            "exchange": "yahoo",
-            "asset_type": asset_type,
-        }
-        result["time"] = ts
-        points.append(result)
-
-    return points
-
-
-async def _fetch_ticker(session: aiohttp.ClientSession, ticker: str) -> dict | None:
-    """Fetch a single ticker from Yahoo Chart API."""
+        tick = Tick(
+            instrument.symbol,
+            "yahoo",
+            instrument.asset_type,
+            ts,
+            last=float(last),
+            change_pct_24h=round(float(quote.get("regularMarketChangePercent") or 0.0), 4),
+        )
+        volume = quote.get("regularMarketVolume")
+        if volume and volume > 0:
+            tick.volume_24h = float(volume)
+        if quote.get("bid"):
+            tick.bid = float(quote["bid"])
+        if quote.get("ask"):
+            tick.ask = float(quote["ask"])
+        ticks[ticker] = tick
+
+    return ticks
+
+
+async def _fetch_ticker(session: aiohttp.ClientSession, ticker: str, ts: int) -> Tick | None:
+    """Fetch a single ticker from Yahoo Chart API. Failures are logged here, with the ticker, and return None."""
     url = CHART_API.format(ticker=ticker)
     params = {"interval": "1d", "range": "2d"}
+    try:
+        data = await call(
+            "yahoo_chart",
+            [breaker("yahoo", host_failure), breaker(f"yahoo:{ticker}")],
+            lambda: _get_json(session, "chart", url, params),
+        )
+    except CircuitOpen as e:
+        logger.debug("Skipping %s — breaker %s open", ticker, e)
+        return None
+    except aiohttp.ClientResponseError as e:
+        logger.warning("Failed to fetch %s: HTTP %d", ticker, e.status)
+        return None
+    except Exception as e:
+        logger.warning("Failed to fetch %s: %r", ticker, e)
+        return None
+    try:
+        return _parse_chart(ticker, data, ts)
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError) as e:
+        logger.warning("Malformed chart response for %s: %r", ticker, e)
+        return None
 
-    async with session.get(url, params=params) as resp:
-        if resp.status != 200:
-            logger.warning("Yahoo returned %d for %s", resp.status, ticker)
-            return None
-        data = await resp.json()
 
+def _parse_chart(ticker: str, data: dict, ts: int) -> Tick | None:
     chart = data.get("chart", {}).get("result", [])
     if not chart:
         return None
@@ -136,24 +270,65 @@ async def _fetch_ticker(session: aiohttp.ClientSession, ticker: str) -> dict | N
     if not last or last == 0:
         return None
 
+    instrument = registry.resolve("yahoo", ticker)
+    if instrument is None:
+        return None
+
     change_pct = ((last - prev_close) / prev_close * 100) if prev_close else 0.0
 
-    fields = {
-        "last": float(last),
-        "change_pct_24h": round(change_pct, 4),
-    }
+    tick = Tick(
+        instrument.symbol,
+        "yahoo",
+        instrument.asset_type,
+        ts,
+        last=float(last),
+        change_pct_24h=round(change_pct, 4),
+    )
 
     volume_list = indicators.get("volume", [])
     if volume_list:
         vol = volume_list[-1]
         if vol and vol > 0:
-            fields["volume_24h"] = float(vol)
+            tick.volume_24h = float(vol)
 
     high_list = indicators.get("high", [])
     low_list = indicators.get("low", [])
     if high_list and high_list[-1]:
-        fields["ask"] = float(high_list[-1])
+        tick.ask = float(high_list[-1])
     if low_list and low_list[-1]:
-        fields["bid"] = float(low_list[-1])
+        tick.bid = float(low_list[-1])
+
+    return tick
+
+
+async def fetch_history(session: aiohttp.ClientSession, ticker: str, start_ns: int, end_ns: int) -> list[Tick]:
+    """1-minute closes for ``ticker`` between two times from the Chart API (backfill).
 
-    return {"measurement": "price", "fields": fields}
+    Each close is stamped at its bar's end, so re-fetching a range yields
+    the same timestamps.
+    """
+    instrument = registry.resolve("yahoo", ticker)
+    if instrument is None:
+        return []
+    params = {
+        "interval": "1m",
+        "period1": str(start_ns // 1_000_000_000),
+        "period2": str(-(-end_ns // 1_000_000_000)),
+    }
+
+    await provider_budget("yahoo").acquire()
+    with FETCH_DURATION.labels(source="yahoo_finance", endpoint="chart_history").time():
+        async with session.get(CHART_API.format(ticker=ticker), params=params, headers=HEADERS, timeout=TIMEOUT) as resp:
+            resp.raise_for_status()
+            data = await resp.json()
+
+    chart = (data.get("chart") or {}).get("result") or []
+    if not chart:
+        return []
+    timestamps = chart[0].get("timestamp") or []
+    closes = (chart[0].get("indicators", {}).get("quote") or [{}])[0].get("close") or []
+    return [
+        Tick(instrument.symbol, "yahoo", instrument.asset_type, (int(t) + 60) * 1_000_000_000, last=float(close))
+        for t, close in zip(timestamps, closes)
+        if close is not None
+    ]
@@ -0,0 +1,86 @@
+"""Escaping, prefix caching and cardinality folding in the line-protocol encoder."""
+from operator import attrgetter
+
+from ticks import Tick
+from writers.cardinality import FOLDED, CardinalityGuard
+from writers.line_protocol import LineProtocolEncoder
+
+
+class Event:
+    """Record with a measurement, tags and fields that all need escaping."""
+
+    MEASUREMENT = "my events,v2"
+    TAGS = ("feed name", "kind")
+    FIELDS = ("title", "flag", "count", "score")
+    tag_values = attrgetter(*TAGS)
+    line = None
+
+    def __init__(self, feed: str, kind: str, title=None, flag=None, count=None, score=None, time=1):
+        setattr(self, "feed name", feed)
+        self.kind = kind
+        self.title = title
+        self.flag = flag
+        self.count = count
+        self.score = score
+        self.time = time
+
+
+def _encode(records, encoder=None) -> bytes:
+    buf = bytearray()
+    (encoder or LineProtocolEncoder()).encode(records, buf)
+    return bytes(buf)
+
+
+def test_tick_line():
+    tick = Tick("BTC", "binance", "crypto", 1700000000000000000, last=67234.5, volume_24h=1e9)
+    assert _encode([tick]) == (
+        b"price,asset_type=crypto,exchange=binance,symbol=BTC last=67234.5,volume_24h=1000000000.0 1700000000000000000\n"
+    )
+
+
+def test_measurement_tags_and_strings_are_escaped():
+    event = Event("a,b=c d", "x", title='say "hi" \\o/', flag=True, count=3, time=5)
+    assert _encode([event]) == (
+        b'my\\ events\\,v2,feed\\ name=a\\,b\\=c\\ d,kind=x title="say \\"hi\\" \\\\o/",flag=true,count=3i 5\n'
+    )
+
+
+def test_missing_and_non_finite_fields_are_left_out():
+    assert _encode([Event("f", "k", score=float("nan"), count=0)]) == b"my\\ events\\,v2,feed\\ name=f,kind=k count=0i 1\n"
+    # Nothing left to write: a line without fields would be rejected
+    assert _encode([Event("f", "k", score=float("inf"))]) == b""
+
+
+def test_empty_tags_are_left_out():
+    assert _encode([Event("", "k", count=1)]) == b"my\\ events\\,v2,kind=k count=1i 1\n"
+
+
+def test_prefix_is_built_once_per_tag_set():
+    encoder = LineProtocolEncoder()
+    ticks = [Tick("ETH", "binance", "crypto", t, last=float(t)) for t in (1, 2)]
+    ticks.append(Tick("SOL", "binance", "crypto", 3, last=3.0))
+    lines = _encode(ticks, encoder).splitlines()
+    assert len(encoder._prefixes) == 2
+    assert lines[0].split(b" ")[0] == lines[1].split(b" ")[0] != lines[2].split(b" ")[0]
+
+
+def test_pre_encoded_line_is_copied():
+    tick = Tick("BTC", "binance", "crypto", 1, last=1.0)
+    tick.line = b"price,asset_type=crypto,exchange=binance,symbol=BTC last=1.0 1\n"
+    assert _encode([tick]) == tick.line
+
+
+def test_folded_tags_keep_their_value_and_distinct_times():
+    guard = CardinalityGuard(series_budget=1000, tag_budget=1)
+    encoder = LineProtocolEncoder(guard)
+    first = Tick("BTC", "binance", "crypto", 1000, last=1.0)
+    late = [Tick(symbol, "binance", "crypto", 1000, last=2.0) for symbol in ("ETH", "SOL")]
+    # Pre-encoded lines over budget are re-encoded too
+    late[1].line = b"price,asset_type=crypto,exchange=binance,symbol=SOL last=2.0 1000\n"
+
+    lines = _encode([first, *late], encoder).splitlines()
+    assert lines[0] == b"price,asset_type=crypto,exchange=binance,symbol=BTC last=1.0 1000"
+    assert lines[1] == b'price,asset_type=crypto,exchange=binance,symbol=%s symbol_raw="ETH",last=2.0 1000' % FOLDED.encode()
+    assert lines[2] == b'price,asset_type=crypto,exchange=binance,symbol=%s symbol_raw="SOL",last=2.0 1001' % FOLDED.encode()
+    # Folded tag sets are not cached
+    assert len(encoder._prefixes) == 1
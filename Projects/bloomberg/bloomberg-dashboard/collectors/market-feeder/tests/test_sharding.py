@@ -0,0 +1,212 @@
+"""Lease and takeover checks for ``sharding`` against an in-memory Postgres stand-in."""
+import asyncio
+import time
+
+import pytest
+
+import sharding
+from config import settings
+from sharding import ShardCoordinator
+
+PARTITIONS = 16
+HEARTBEAT = 0.05
+LEASE_TTL = 0.3
+
+
+class FakePostgres:
+    """The two shard tables, answering exactly the statements ``sharding`` sends.
+
+    ``NOW()`` is the monotonic clock, as it would be on a single Postgres
+    host as seen from its clients.
+    """
+
+    def __init__(self):
+        self.heartbeats: dict[str, float] = {}
+        self.leases: dict[int, tuple[str, float]] = {}
+        # (owner, partitions) of every _RELEASE, in order
+        self.releases: list[tuple[str, set[int]]] = []
+
+    def run(self, query: str, args: tuple) -> list[dict]:
+        now = time.monotonic()
+        if query == sharding._SCHEMA:
+            return []
+        if query == sharding._HEARTBEAT:
+            self.heartbeats[args[1]] = now
+            return []
+        if query == sharding._LIVE_INSTANCES:
+            return [{"instance_id": i} for i, at in self.heartbeats.items() if at > now - args[1]]
+        if query == sharding._ACQUIRE:
+            _, owner, ttl, partitions = args
+            rows = []
+            for p in partitions:
+                lease = self.leases.get(p)
+                if lease is None or lease[0] == owner or lease[1] < now:
+                    self.leases[p] = (owner, now + ttl)
+                    rows.append({"partition": p})
+            return rows
+        if query == sharding._RELEASE:
+            _, owner, partitions = args
+            self.releases.append((owner, set(partitions)))
+            for p in partitions:
+                if self.leases.get(p, ("", 0))[0] == owner:
+                    del self.leases[p]
+            return []
+        if query == sharding._DEREGISTER:
+            self.heartbeats.pop(args[1], None)
+            return []
+        raise AssertionError(f"unexpected query {query!r}")
+
+
+class FakePool:
+    """One instance's connection pool; ``reachable = False`` simulates losing Postgres."""
+
+    def __init__(self, db: FakePostgres):
+        self._db = db
+        self.reachable = True
+
+    def acquire(self):
+        return self
+
+    async def __aenter__(self):
+        if not self.reachable:
+            raise ConnectionRefusedError("postgres unreachable")
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query: str, *args):
+        self._db.run(query, args)
+
+    async def fetch(self, query: str, *args):
+        return self._db.run(query, args)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(settings, "shard_enabled", True)
+    monkeypatch.setattr(settings, "shard_partitions", PARTITIONS)
+    monkeypatch.setattr(settings, "shard_heartbeat_interval", HEARTBEAT)
+    monkeypatch.setattr(settings, "shard_lease_ttl", LEASE_TTL)
+    return FakePostgres()
+
+
+def _coordinator(db: FakePostgres, instance: str) -> ShardCoordinator:
+    coordinator = ShardCoordinator()
+    coordinator.instance_id = instance
+    coordinator._pool = FakePool(db)
+    return coordinator
+
+
+def _owned(coordinator: ShardCoordinator) -> set[int]:
+    return {p for p in range(PARTITIONS) if p in coordinator._owned}
+
+
+def _assert_exclusive(*coordinators: ShardCoordinator):
+    seen: set[int] = set()
+    for coordinator in coordinators:
+        owned = _owned(coordinator)
+        assert not owned & seen, "a partition is owned by two instances"
+        seen |= owned
+
+
+def test_instances_split_every_partition(db):
+    async def scenario():
+        a, b = _coordinator(db, "a"), _coordinator(db, "b")
+        await a._sync()
+        assert _owned(a) == set(range(PARTITIONS))
+        await b._sync()
+        # b's share is still leased to a until a lets it go
+        _assert_exclusive(a, b)
+        await a._sync()
+        await b._sync()
+        _assert_exclusive(a, b)
+        assert _owned(a) | _owned(b) == set(range(PARTITIONS))
+        assert _owned(a) and _owned(b)
+
+    asyncio.run(scenario())
+
+
+def test_sources_stop_before_partitions_are_released(db):
+    async def scenario():
+        a, b = _coordinator(db, "a"), _coordinator(db, "b")
+        events = []
+
+        async def on_change():
+            events.append(("listener", _owned(a), len(db.releases)))
+
+        a.add_listener(on_change)
+        await a._sync()
+        await b._sync()
+        await a._sync()
+        assert db.releases, "a hands b's share back"
+
+        released = db.releases[0][1]
+        # The listener saw the reduced set while the leases were still a's
+        stopped = [owned for _, owned, releases in events if releases == 0 and not owned & released]
+        assert stopped, "sources were told to stop only after the release"
+        await a._leave()
+        assert events[-1][1] == set() and events[-1][2] == 1
+
+    asyncio.run(scenario())
+
+
+def test_outage_drops_partitions_before_a_peer_takes_them(db):
+    async def scenario():
+        a, b = _coordinator(db, "a"), _coordinator(db, "b")
+        changes = []
+
+        async def on_change():
+            changes.append(len(a._owned))
+
+        a.add_listener(on_change)
+        for _ in range(2):
+            await a._sync()
+            await b._sync()
+        held = _owned(a)
+        assert held
+
+        a._pool.reachable = False
+        await asyncio.sleep(HEARTBEAT)
+        await a._sync()
+        assert _owned(a) == held, "a fresh lease survives a failed heartbeat"
+
+        # Keep heartbeating on both sides until the leases run out
+        deadline = time.monotonic() + 2 * LEASE_TTL
+        while time.monotonic() < deadline:
+            await asyncio.sleep(HEARTBEAT)
+            await a._sync()
+            await b._sync()
+            _assert_exclusive(a, b)
+            for p in _owned(b) & held:
+                assert db.leases[p][0] == "b"
+        assert not _owned(a)
+        assert changes[-1] == 0
+        assert _owned(b) == set(range(PARTITIONS))
+
+        # Back online: a regains a share only once b has handed it over
+        a._pool.reachable = True
+        for _ in range(3):
+            await a._sync()
+            _assert_exclusive(a, b)
+            await b._sync()
+            _assert_exclusive(a, b)
+        assert _owned(a) and _owned(a) | _owned(b) == set(range(PARTITIONS))
+
+    asyncio.run(scenario())
+
+
+def test_clean_leave_hands_partitions_over(db):
+    async def scenario():
+        a, b = _coordinator(db, "a"), _coordinator(db, "b")
+        for _ in range(2):
+            await a._sync()
+            await b._sync()
+        await a._leave()
+        await b._sync()
+        assert _owned(b) == set(range(PARTITIONS))
+
+    asyncio.run(scenario())
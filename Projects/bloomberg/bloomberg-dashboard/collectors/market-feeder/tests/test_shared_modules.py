@@ -0,0 +1,28 @@
+"""Modules copied into both collectors must not drift apart.
+
+Each collector image is built from its own directory, so shared code is
+copied rather than imported. The copies may differ only in their logger name.
+"""
+import re
+from pathlib import Path
+
+import pytest
+
+COLLECTORS = Path(__file__).resolve().parents[2]
+SHARED = [
+    "writers/spool.py",
+    "writers/cardinality.py",
+    "http_pool.py",
+    "symbols.py",
+]
+
+_LOGGER = re.compile(r'getLogger\("(market|news)-feeder\.')
+
+
+def _normalized(service: str, module: str) -> str:
+    return _LOGGER.sub('getLogger("<service>.', (COLLECTORS / service / module).read_text())
+
+
+@pytest.mark.parametrize("module", SHARED)
+def test_copies_match(module):
+    assert _normalized("market-feeder", module) == _normalized("news-feeder", module)
@@ -0,0 +1,104 @@
+"""Recovery and eviction checks for the on-disk write spool."""
+import os
+import struct
+
+from writers.spool import SegmentSpool, _FRAME, _HEADER
+
+SEGMENT = 256
+
+
+def _drain(spool: SegmentSpool) -> list[bytes]:
+    payloads = []
+    while (payload := spool.peek()) is not None:
+        payloads.append(payload)
+        spool.pop()
+    return payloads
+
+
+def _segment_files(directory) -> list[str]:
+    return sorted(name for name in os.listdir(directory) if name.endswith(".seg"))
+
+
+def test_replay_resumes_after_restart(tmp_path):
+    spool = SegmentSpool(str(tmp_path), SEGMENT, 10 * SEGMENT)
+    for i in range(10):
+        spool.append(f"batch {i}".encode())
+    assert spool.peek() == b"batch 0"
+    spool.pop()
+    spool.close()
+
+    spool = SegmentSpool(str(tmp_path), SEGMENT, 10 * SEGMENT)
+    assert len(spool) == 9
+    assert _drain(spool) == [f"batch {i}".encode() for i in range(1, 10)]
+    assert spool.peek() is None
+
+
+def test_corrupt_record_truncates_the_segment(tmp_path):
+    spool = SegmentSpool(str(tmp_path), SEGMENT, 10 * SEGMENT)
+    for payload in (b"first", b"second", b"third"):
+        spool.append(payload)
+    spool.close()
+
+    # Flip a byte of the last payload so its crc no longer matches
+    path = tmp_path / _segment_files(tmp_path)[0]
+    data = bytearray(path.read_bytes())
+    write_off, _ = _HEADER.unpack_from(data, 0)
+    data[write_off - 1] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    spool = SegmentSpool(str(tmp_path), SEGMENT, 10 * SEGMENT)
+    assert len(spool) == 2
+    spool.append(b"after")
+    assert _drain(spool) == [b"first", b"second", b"after"]
+
+
+def test_torn_frame_is_dropped(tmp_path):
+    spool = SegmentSpool(str(tmp_path), SEGMENT, 10 * SEGMENT)
+    spool.append(b"whole")
+    spool.close()
+
+    # A crash after the header moved but before the frame was complete
+    path = tmp_path / _segment_files(tmp_path)[0]
+    data = bytearray(path.read_bytes())
+    write_off, read_off = _HEADER.unpack_from(data, 0)
+    _FRAME.pack_into(data, write_off, 100, 0)
+    _HEADER.pack_into(data, 0, write_off + _FRAME.size + 10, read_off)
+    path.write_bytes(bytes(data))
+
+    spool = SegmentSpool(str(tmp_path), SEGMENT, 10 * SEGMENT)
+    assert _drain(spool) == [b"whole"]
+    assert struct.unpack_from("<Q", path.read_bytes(), 0)[0] == _HEADER.size
+
+
+def test_oldest_segment_is_evicted_when_full(tmp_path):
+    spool = SegmentSpool(str(tmp_path), SEGMENT, 3 * SEGMENT)
+    payloads = [bytes([i]) * 100 for i in range(12)]
+    for payload in payloads:
+        spool.append(payload)
+
+    # Two 100-byte records fit in a segment, and three segments in the cap
+    assert spool.disk_bytes <= 3 * SEGMENT
+    assert len(_segment_files(tmp_path)) == 3
+    assert _drain(spool) == payloads[-6:]
+
+
+def test_oversized_payload_gets_its_own_segment(tmp_path):
+    spool = SegmentSpool(str(tmp_path), SEGMENT, 10 * SEGMENT)
+    spool.append(b"small")
+    spool.append(b"x" * (2 * SEGMENT))
+    assert len(_segment_files(tmp_path)) == 2
+    assert _drain(spool) == [b"small", b"x" * (2 * SEGMENT)]
+
+
+def test_replayed_segments_are_removed(tmp_path):
+    spool = SegmentSpool(str(tmp_path), SEGMENT, 10 * SEGMENT)
+    for i in range(6):
+        spool.append(bytes([i]) * 100)
+    assert len(_segment_files(tmp_path)) == 3
+    _drain(spool)
+    # Only the tail segment is kept, rewound for reuse
+    assert len(_segment_files(tmp_path)) == 1
+    spool.close()
+
+    spool = SegmentSpool(str(tmp_path), SEGMENT, 10 * SEGMENT)
+    assert len(spool) == 0 and spool.peek() is None
@@ -0,0 +1,85 @@
+from operator import attrgetter
+
+
+class Tick:
+    """One price observation, shared by every market source.
+
+    Slotted so that a tick costs a fixed handful of pointers instead of the
+    three nested dicts the sources used to build. Fields a source does not
+    provide stay ``None`` and are left out of the encoded line. ``line``
+    holds the tick already encoded as line protocol when a decode worker
+    produced it.
+    """
+
+    __slots__ = (
+        "symbol", "exchange", "asset_type", "time",
+        "last", "bid", "ask", "volume_24h", "change_pct_24h", "market_cap", "line",
+    )
+
+    MEASUREMENT = "price"
+    # Tag keys in lexical order, as InfluxDB stores them
+    TAGS = ("asset_type", "exchange", "symbol")
+    FIELDS = ("last", "bid", "ask", "volume_24h", "change_pct_24h", "market_cap")
+    tag_values = attrgetter(*TAGS)
+    field_values = attrgetter(*FIELDS)
+
+    def __init__(
+        self,
+        symbol: str,
+        exchange: str,
+        asset_type: str,
+        time: int,
+        last: float,
+        bid: float | None = None,
+        ask: float | None = None,
+        volume_24h: float | None = None,
+        change_pct_24h: float | None = None,
+        market_cap: float | None = None,
+    ):
+        self.symbol = symbol
+        self.exchange = exchange
+        self.asset_type = asset_type
+        self.time = time
+        self.last = last
+        self.bid = bid
+        self.ask = ask
+        self.volume_24h = volume_24h
+        self.change_pct_24h = change_pct_24h
+        self.market_cap = market_cap
+        self.line: bytes | None = None
+
+    def __repr__(self) -> str:
+        return f"Tick({self.exchange}:{self.symbol} last={self.last} t={self.time})"
+
+
+class Candle:
+    """One OHLC bar for a (symbol, exchange, timeframe), stamped at the bar's start."""
+
+    __slots__ = (
+        "symbol", "exchange", "asset_type", "timeframe", "time",
+        "open", "high", "low", "close", "volume_24h", "ticks", "closed",
+    )
+
+    MEASUREMENT = "candles"
+    line = None  # always encoded by the writer
+    TAGS = ("asset_type", "exchange", "symbol", "timeframe")
+    FIELDS = ("open", "high", "low", "close", "volume_24h", "ticks", "closed")
+    tag_values = attrgetter(*TAGS)
+    field_values = attrgetter(*FIELDS)
+
+    def __init__(self, tick: Tick, timeframe: str, start: int):
+        self.symbol = tick.symbol
+        self.exchange = tick.exchange
+        self.asset_type = tick.asset_type
+        self.timeframe = timeframe
+        self.time = start
+        self.open = self.high = self.low = self.close = tick.last
+        self.volume_24h = tick.volume_24h
+        self.ticks = 1
+        self.closed = False
+
+    def __repr__(self) -> str:
+        return (
+            f"Candle({self.exchange}:{self.symbol} {self.timeframe} t={self.time} "
+            f"o={self.open} h={self.high} l={self.low} c={self.close})"
+        )
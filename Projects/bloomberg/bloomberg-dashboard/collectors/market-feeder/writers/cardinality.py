@@ -0,0 +1,132 @@
+import hashlib
+import logging
+import math
+from collections import OrderedDict
+
+from health import SERIES_CARDINALITY, TAG_VALUES, TAGS_FOLDED
+
+logger = logging.getLogger("market-feeder.cardinality")
+
+# Copied into market-feeder and news-feeder, whose images are built from
+# their own directories: change both copies together (tests/test_shared_modules.py).
+
+# Tag value written in place of a value that would exceed the budget
+FOLDED = "other"
+# HyperLogLog precision: 2^12 registers, about 1.6% standard error
+_PRECISION = 12
+_REGISTERS = 1 << _PRECISION
+_ALPHA = 0.7213 / (1 + 1.079 / _REGISTERS)
+# Recent folded timestamps remembered to keep folded points apart
+_FOLDED_TIMES = 10000
+
+
+class HyperLogLog:
+    """Distinct-count sketch in 4 KiB, whatever the number of items.
+
+    The harmonic sum behind the estimate is kept up to date on every add,
+    so ``estimate`` is constant time.
+    """
+
+    __slots__ = ("_registers", "_sum", "_zeros")
+
+    def __init__(self):
+        self._registers = bytearray(_REGISTERS)
+        self._sum = float(_REGISTERS)
+        self._zeros = _REGISTERS
+
+    def add(self, item: bytes):
+        x = int.from_bytes(hashlib.blake2b(item, digest_size=8).digest(), "big")
+        index = x >> (64 - _PRECISION)
+        rest = x & ((1 << (64 - _PRECISION)) - 1)
+        rank = (64 - _PRECISION) - rest.bit_length() + 1
+        old = self._registers[index]
+        if rank > old:
+            self._registers[index] = rank
+            self._sum += 2.0 ** -rank - 2.0 ** -old
+            if old == 0:
+                self._zeros -= 1
+
+    def estimate(self) -> int:
+        raw = _ALPHA * _REGISTERS * _REGISTERS / self._sum
+        if raw <= 2.5 * _REGISTERS and self._zeros:
+            # Linear counting is more accurate while many registers are empty
+            return round(_REGISTERS * math.log(_REGISTERS / self._zeros))
+        return round(raw)
+
+
+class _Measurement:
+    __slots__ = ("series", "values")
+
+    def __init__(self, keys: tuple[str, ...]):
+        self.series = HyperLogLog()
+        self.values: dict[str, set] = {key: set() for key in keys}
+
+
+class CardinalityGuard:
+    """Keep the number of series per measurement within a budget.
+
+    Each distinct tag set is counted in a HyperLogLog sketch per
+    measurement, and each tag key keeps the set of values it has admitted.
+    A new value is admitted while the tag has fewer than ``tag_budget``
+    values and the measurement's estimated series count is below
+    ``series_budget``. Past either limit, the tag is written as ``other``
+    and its real value is kept in a ``<tag>_raw`` string field, so the data
+    is preserved without creating a new series.
+
+    Folded points of a measurement all share the ``other`` series, so two
+    of them with the same timestamp would overwrite each other. Callers
+    stamp them with ``folded_time`` instead of their own timestamp.
+
+    Callers cache the tag sets that were admitted unchanged, so ``admit``
+    runs once per new series rather than once per point.
+    """
+
+    def __init__(self, series_budget: int, tag_budget: int):
+        self._series_budget = series_budget
+        self._tag_budget = tag_budget
+        self._measurements: dict[str, _Measurement] = {}
+        self._warned: set[tuple[str, str]] = set()
+        # (measurement, timestamp) -> folded points already written at that timestamp
+        self._folded_times: OrderedDict[tuple[str, int], int] = OrderedDict()
+
+    def admit(self, measurement: str, keys: tuple[str, ...], values: tuple) -> tuple[tuple, dict[str, str]]:
+        """Tag values to write for a tag set, and the raw values of the tags that were folded."""
+        state = self._measurements.get(measurement)
+        if state is None:
+            state = self._measurements[measurement] = _Measurement(keys)
+
+        written = list(values)
+        folded = {}
+        for i, (key, value) in enumerate(zip(keys, values)):
+            if value is None or value == "" or value == FOLDED:
+                continue
+            admitted = state.values.setdefault(key, set())
+            if value in admitted:
+                continue
+            if len(admitted) < self._tag_budget and state.series.estimate() < self._series_budget:
+                admitted.add(value)
+                TAG_VALUES.labels(measurement=measurement, tag=key).set(len(admitted))
+                continue
+            if (measurement, key) not in self._warned:
+                self._warned.add((measurement, key))
+                logger.warning(
+                    "%s.%s over its cardinality budget — new values (first %r) are written as %s",
+                    measurement, key, value, FOLDED,
+                )
+            written[i] = FOLDED
+            folded[f"{key}_raw"] = str(value)
+            TAGS_FOLDED.labels(measurement=measurement, tag=key).inc()
+
+        written = tuple(written)
+        state.series.add("\x1f".join(map(str, written)).encode())
+        SERIES_CARDINALITY.labels(measurement=measurement).set(state.series.estimate())
+        return written, folded
+
+    def folded_time(self, measurement: str, time: int) -> int:
+        """Timestamp for a folded point: ``time``, plus a few nanoseconds if folded points already use it."""
+        key = (measurement, time)
+        offset = self._folded_times.pop(key, 0)
+        self._folded_times[key] = offset + 1
+        if len(self._folded_times) > _FOLDED_TIMES:
+            self._folded_times.popitem(last=False)
+        return time + offset
@@ -1,59 +1,240 @@
+import asyncio
 import logging
 import time
 
-from influxdb_client import InfluxDBClient, Point, WritePrecision
-from influxdb_client.client.write_api import SYNCHRONOUS
+from influxdb_client import WritePrecision
+from influxdb_client.client.influxdb_client_async import InfluxDBClientAsync
 
 from config import settings
-from health import WRITES_TOTAL, WRITE_ERRORS, POINTS_WRITTEN, LAST_WRITE
+from health import (
+    WRITES_TOTAL,
+    WRITE_ERRORS,
+    POINTS_WRITTEN,
+    LAST_WRITE,
+    SPOOL_REPLAYED,
+    INGEST_LATENCY,
+    WRITER_BATCH_POINTS,
+    WRITER_FLUSH_SECONDS,
+    WRITER_QUEUE_DEPTH,
+    register_status,
+)
+from ticks import Tick
+from writers.cardinality import CardinalityGuard
+from writers.line_protocol import LineProtocolEncoder
+from writers.spool import SegmentSpool
 
 logger = logging.getLogger("market-feeder.writer")
 
+# Queue sentinel telling the flusher to write what it holds and exit
+_DRAIN = object()
+
 
 class InfluxDBWriter:
+    """Batched, non-blocking InfluxDB writer.
+
+    Sources enqueue tick batches with ``write_points``; a background flusher
+    coalesces them into a single write once ``writer_batch_size`` points are
+    pending or the oldest pending point is ``writer_flush_interval`` seconds old.
+    Each batch is encoded into one line-protocol buffer. The queue is bounded,
+    so a slow InfluxDB pushes back on the sources. Buffers that fail to write
+    go to the disk spool and are replayed, oldest first, after later writes
+    succeed.
+    """
+
     def __init__(self):
-        self._client = InfluxDBClient(
+        self._client = InfluxDBClientAsync(
             url=settings.influxdb_url,
             token=settings.influxdb_token,
             org=settings.influxdb_org,
         )
-        self._write_api = self._client.write_api(write_options=SYNCHRONOUS)
+        self._write_api = self._client.write_api()
         self._bucket = settings.influxdb_bucket
         self._org = settings.influxdb_org
-        logger.info("InfluxDB writer initialized — bucket=%s", self._bucket)
+        guard = None
+        if settings.cardinality_guard_enabled:
+            guard = CardinalityGuard(settings.cardinality_series_budget, settings.cardinality_tag_budget)
+        self._encoder = LineProtocolEncoder(guard)
+
+        self._batch_size = settings.writer_batch_size
+        self._flush_interval = settings.writer_flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=settings.writer_queue_size)
+        self._flusher: asyncio.Task | None = None
+        WRITER_QUEUE_DEPTH.set_function(self._queue.qsize)
+
+        self._spool: SegmentSpool | None = None
+        self._last_replay = 0.0
+        if settings.spool_enabled:
+            try:
+                self._spool = SegmentSpool(
+                    settings.spool_dir, settings.spool_segment_bytes, settings.spool_max_bytes
+                )
+                register_status("spool", self._spool.stats)
+            except OSError:
+                logger.exception("Cannot open spool at %s — failed writes will be dropped", settings.spool_dir)
+
+        logger.info(
+            "InfluxDB writer initialized — bucket=%s, batch=%d points, flush=%.2fs",
+            self._bucket, self._batch_size, self._flush_interval,
+        )
+
+    def start(self):
+        """Start the background flusher. Must be called from the running loop."""
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop(), name="influx-flusher")
+
+    @property
+    def backlog(self) -> int:
+        """Tick batches queued and not yet picked up by the flusher."""
+        return self._queue.qsize()
 
-    async def write_points(self, points: list[dict], source: str = "unknown"):
-        """Write a batch of point dicts to InfluxDB."""
+    def query_api(self):
+        """Async Flux query API on the writer's client."""
+        return self._client.query_api()
+
+    async def write_points(self, points: list[Tick], source: str = "unknown"):
+        """Enqueue a batch of ticks. Blocks only while the queue is full."""
         if not points:
             return
+        await self._queue.put((source, points))
+
+    async def drain(self, timeout: float = 10):
+        """Flush everything still queued and stop the flusher."""
+        if self._flusher is None:
+            return
+
+        async def stop():
+            # The put waits for room in a full queue, so it counts against the timeout too
+            await self._queue.put(_DRAIN)
+            await self._flusher
 
         try:
-            influx_points = []
-            for p in points:
-                point = Point(p["measurement"])
-                for k, v in p.get("tags", {}).items():
-                    point = point.tag(k, v)
-                for k, v in p.get("fields", {}).items():
-                    point = point.field(k, v)
-                if "time" in p:
-                    point = point.time(p["time"], WritePrecision.NS)
-                influx_points.append(point)
-
-            self._write_api.write(bucket=self._bucket, org=self._org, record=influx_points)
+            await asyncio.wait_for(stop(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Writer drain timed out — %d batches dropped", self._queue.qsize())
+        self._flusher = None
 
-            WRITES_TOTAL.labels(source=source).inc()
-            POINTS_WRITTEN.labels(source=source).inc(len(influx_points))
-            LAST_WRITE.labels(source=source).set(time.time())
+    async def _flush_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is _DRAIN:
+                return
+
+            batch: dict[str, list[Tick]] = {}
+            pending = 0
+            draining = False
+            deadline = loop.time() + self._flush_interval
+
+            while True:
+                source, points = item
+                batch.setdefault(source, []).extend(points)
+                pending += len(points)
+                if pending >= self._batch_size:
+                    break
+                # Take whatever is already queued without waiting
+                if not self._queue.empty():
+                    item = self._queue.get_nowait()
+                else:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _DRAIN:
+                    draining = True
+                    break
+
+            await self._flush(batch, pending)
+            if draining:
+                # Sentinel was consumed mid-batch; finish whatever is left
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not _DRAIN:
+                        await self._flush({item[0]: item[1]}, len(item[1]))
+                return
 
+    async def _flush(self, batch: dict[str, list[Tick]], pending: int):
+        """Flush one batch. Never raises: a dead flusher would leave the sources blocked on a full queue."""
+        try:
+            await self._flush_batch(batch, pending)
+        except Exception:
+            logger.exception("Writer flush failed (sources=%s, points=%d)", ",".join(batch), pending)
+
+    async def _flush_batch(self, batch: dict[str, list[Tick]], pending: int):
+        started = time.perf_counter()
+        buf = bytearray()
+        for points in batch.values():
+            self._encoder.encode(points, buf)
+        if not buf:
+            return
+
+        payload = bytes(buf)
+        try:
+            await self._write(payload)
         except Exception:
-            WRITE_ERRORS.labels(source=source).inc()
-            logger.exception("InfluxDB write error (source=%s, points=%d)", source, len(points))
-            raise
+            for source in batch:
+                WRITE_ERRORS.labels(source=source).inc()
+            logger.exception("InfluxDB write error (sources=%s, points=%d)", ",".join(batch), pending)
+            if self._spool is not None:
+                try:
+                    self._spool.append(payload)
+                except OSError:
+                    logger.exception("Spool append failed — batch dropped")
+            return
+
+        WRITER_FLUSH_SECONDS.observe(time.perf_counter() - started)
+        WRITER_BATCH_POINTS.observe(pending)
+        now_ns = time.time_ns()
+        now = now_ns / 1e9
+        for source, points in batch.items():
+            WRITES_TOTAL.labels(source=source).inc()
+            POINTS_WRITTEN.labels(source=source).inc(len(points))
+            LAST_WRITE.labels(source=source).set(now)
+            # Candles are stamped with their bar start and backfilled ticks with
+            # historical times, neither of which measures ingest latency
+            if type(points[0]) is Tick and source != "backfill":
+                latency = INGEST_LATENCY.labels(source=source)
+                for tick in points:
+                    latency.observe((now_ns - tick.time) / 1e9)
+
+        await self._replay_spool()
+
+    async def _write(self, payload: bytes):
+        await self._write_api.write(
+            bucket=self._bucket,
+            org=self._org,
+            record=payload,
+            write_precision=WritePrecision.NS,
+        )
+
+    async def _replay_spool(self):
+        """Replay up to ``spool_replay_batch`` spooled buffers, at most once per interval."""
+        if self._spool is None or not self._spool.records:
+            return
+        now = time.monotonic()
+        if now - self._last_replay < settings.spool_replay_interval:
+            return
+        self._last_replay = now
+
+        for _ in range(settings.spool_replay_batch):
+            payload = self._spool.peek()
+            if payload is None:
+                return
+            try:
+                await self._write(payload)
+            except Exception:
+                logger.warning("Spool replay failed — %d batches still pending", len(self._spool))
+                return
+            self._spool.pop()
+            SPOOL_REPLAYED.inc()
 
-    def close(self):
+    async def close(self):
+        if self._spool is not None:
+            self._spool.close()
         try:
-            self._write_api.close()
-            self._client.close()
+            await self._client.close()
             logger.info("InfluxDB writer closed")
         except Exception:
             logger.exception("Error closing InfluxDB writer")
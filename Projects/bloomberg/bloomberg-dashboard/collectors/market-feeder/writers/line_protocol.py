@@ -0,0 +1,109 @@
+import math
+
+# Characters InfluxDB line protocol requires escaping, per element type
+_MEASUREMENT_ESCAPES = str.maketrans({",": r"\,", " ": r"\ "})
+_KEY_ESCAPES = str.maketrans({",": r"\,", "=": r"\=", " ": r"\ "})
+_STRING_ESCAPES = str.maketrans({'"': r"\"", "\\": r"\\"})
+
+
+def _escape_key(value: str) -> str:
+    return str(value).translate(_KEY_ESCAPES)
+
+
+def _format_value(value) -> bytes | None:
+    if isinstance(value, bool):
+        return b"true" if value else b"false"
+    if isinstance(value, int):
+        return b"%di" % value
+    if isinstance(value, float):
+        return b"%r" % value if math.isfinite(value) else None
+    return b'"%s"' % str(value).translate(_STRING_ESCAPES).encode()
+
+
+class LineProtocolEncoder:
+    """Encode record objects (see ``ticks.Tick``) straight into line protocol.
+
+    A record class declares ``MEASUREMENT``, ``TAGS``, ``FIELDS`` and a
+    ``tag_values`` getter. The escaped ``measurement,tag=value,...`` prefix is
+    built once per distinct tag set and reused for every later record, so the
+    per-record cost is only the field values and the timestamp. Records
+    whose ``line`` is already set are copied as is, once their tag set is
+    known to be within budget.
+
+    With a ``guard`` (see ``writers.cardinality``), each new tag set is
+    checked against the cardinality budget. Folded tag sets get an
+    ``other`` tag value, and the real value is written as a leading
+    ``<tag>_raw`` field inside the prefix. They are not cached, so the
+    cache stays bounded too, and their lines are stamped with the guard's
+    ``folded_time`` so they do not overwrite each other.
+    """
+
+    def __init__(self, guard=None):
+        self._guard = guard
+        self._prefixes: dict[tuple, bytes] = {}
+        self._field_keys: dict[type, tuple[tuple[str, bytes, bytes], ...]] = {}
+
+    def _prefix(self, cls: type, tags: tuple) -> bytes:
+        written, folded = (tags, None) if self._guard is None else self._guard.admit(cls.MEASUREMENT, cls.TAGS, tags)
+        parts = [cls.MEASUREMENT.translate(_MEASUREMENT_ESCAPES)]
+        for key, value in zip(cls.TAGS, written):
+            if value is None or value == "":
+                continue
+            parts.append(f"{_escape_key(key)}={_escape_key(value)}")
+        prefix = (",".join(parts) + " ").encode()
+        if folded:
+            # Record fields follow with "key=", so the raw fields end with a comma
+            prefix += b"".join(_escape_key(key).encode() + b"=" + _format_value(value) + b"," for key, value in folded.items())
+            return prefix
+        self._prefixes[(cls, tags)] = prefix
+        return prefix
+
+    def _fields(self, cls: type) -> tuple[tuple[str, bytes, bytes], ...]:
+        # (attribute, "key=" for the first field, ",key=" for the rest)
+        fields = tuple(
+            (name, f"{_escape_key(name)}=".encode(), f",{_escape_key(name)}=".encode())
+            for name in cls.FIELDS
+        )
+        self._field_keys[cls] = fields
+        return fields
+
+    def encode(self, records, buf: bytearray) -> int:
+        """Append one line per record to ``buf``. Returns the number of lines written."""
+        prefixes = self._prefixes
+        written = 0
+        for rec in records:
+            cls = type(rec)
+            tags = cls.tag_values(rec)
+            prefix = prefixes.get((cls, tags))
+            folded = False
+            if prefix is None:
+                prefix = self._prefix(cls, tags)
+                folded = (cls, tags) not in prefixes
+            if rec.line is not None and not folded:
+                # Encoded ahead of time by a decode worker
+                buf += rec.line
+                written += 1
+                continue
+            fields = self._field_keys.get(cls) or self._fields(cls)
+
+            start = len(buf)
+            buf += prefix
+            first = True
+            for name, key, sep_key in fields:
+                value = getattr(rec, name)
+                if value is None:
+                    continue
+                encoded = _format_value(value)
+                if encoded is None:
+                    continue
+                buf += key if first else sep_key
+                buf += encoded
+                first = False
+
+            if first:
+                # A line without fields is rejected by InfluxDB
+                del buf[start:]
+                continue
+            buf += b" %d\n" % (self._guard.folded_time(cls.MEASUREMENT, rec.time) if folded else rec.time)
+            written += 1
+        return written
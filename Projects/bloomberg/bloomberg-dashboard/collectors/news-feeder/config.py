@@ -8,21 +8,70 @@ class Settings(BaseSettings):
     influxdb_org: str = "bloomberg"
     influxdb_bucket: str = "news"
 
+    # Near-duplicate headlines across sources: a SimHash of the normalized title within
+    # near_dup_distance bits of a story from the last near_dup_window seconds.
+    # "cluster" writes it with that story's story_id and sentiment, "drop" skips it, "off"
+    near_dup_mode: str = "cluster"
+    near_dup_distance: int = 3
+    near_dup_window: float = 6 * 3600
+
+    # Cardinality guard: once a measurement has an estimated cardinality_series_budget
+    # series, or a tag cardinality_tag_budget values, new tag values are written as
+    # "other" with the real value in a <tag>_raw field
+    cardinality_guard_enabled: bool = True
+    cardinality_series_budget: int = 5000
+    cardinality_tag_budget: int = 300
+
+    # Disk spool for batches that failed to write (replayed once InfluxDB is back)
+    spool_enabled: bool = True
+    spool_dir: str = "/var/lib/news-feeder/spool"
+    spool_segment_bytes: int = 1024 * 1024
+    spool_max_bytes: int = 32 * 1024 * 1024
+    spool_replay_batch: int = 10
+    spool_replay_interval: float = 1.0
+
+    # Shared symbol registry (mounted from config/symbols.json), source of the tagging aliases
+    symbols_file: str = "/etc/bloomberg/symbols.json"
+
     # Polling interval (seconds)
     polling_interval: int = 120
 
+    # Polling state: RSS ETag/Last-Modified and NewsAPI watermarks, kept across restarts.
+    # NewsAPI reads up to newsapi_max_pages pages of newsapi_page_size articles per query
+    poll_state_file: str = "/var/lib/news-feeder/poll_state.json"
+    newsapi_page_size: int = 100
+    newsapi_max_pages: int = 5
+
     # API keys (optional)
     newsapi_key: str = ""
     cryptopanic_token: str = ""
 
-    # Sentiment
+    # Sentiment: VADER runs in sentiment_workers processes, sentiment_batch_size headlines
+    # per task; the scores of the last sentiment_cache_size distinct headlines are memoized
     sentiment_enabled: bool = True
+    sentiment_workers: int = 1
+    sentiment_batch_size: int = 64
+    sentiment_cache_size: int = 50000
+
+    # Shared HTTP connection pool
+    http_pool_size: int = 100
+    http_pool_per_host: int = 10
+    http_dns_ttl: int = 300
+    http_keepalive: float = 60.0
+    http_timeout: float = 30.0
 
     # Health server
     health_port: int = 8080
 
-    # Dedup
+    # Dedup: the last dedup_max_urls URL digests, in a memory-mapped ring file that
+    # survives restarts. The optional Bloom filter keeps recognising URLs that left
+    # the ring (dedup_bloom_capacity per generation, dedup_bloom_error false positives)
     dedup_max_urls: int = 10000
+    dedup_file: str = "/var/lib/news-feeder/dedup.ring"
+    dedup_bloom_enabled: bool = False
+    dedup_bloom_capacity: int = 2_000_000
+    dedup_bloom_error: float = 0.001
+    dedup_bloom_file: str = "/var/lib/news-feeder/dedup.bloom"
 
     # Logging
     log_level: str = "INFO"
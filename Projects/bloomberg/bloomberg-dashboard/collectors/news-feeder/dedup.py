@@ -0,0 +1,212 @@
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+
+from health import DEDUP_ENTRIES, DEDUP_BLOOM_HITS
+
+logger = logging.getLogger("news-feeder.dedup")
+
+DIGEST_SIZE = 8
+
+# Ring file header: magic, capacity, next slot to write, entries stored
+_RING_HEADER = struct.Struct("<8sQQQ")
+_RING_MAGIC = b"NFDEDUP1"
+# Bloom file header: magic, bits per generation, hash count, current generation, items in it
+_BLOOM_HEADER = struct.Struct("<8sQQQQ")
+_BLOOM_MAGIC = b"NFBLOOM1"
+
+
+def url_digest(url: str) -> bytes:
+    """Fixed-width digest identifying an article URL."""
+    return hashlib.blake2b(url.encode(), digest_size=DIGEST_SIZE).digest()
+
+
+def _map(path: str, size: int) -> mmap.mmap:
+    """Map ``path`` (created or grown to ``size`` bytes), or anonymous memory if it cannot be opened."""
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a+b") as f:
+            if os.fstat(f.fileno()).st_size != size:
+                f.truncate(size)
+            return mmap.mmap(f.fileno(), size)
+    except OSError:
+        logger.exception("Cannot map %s — dedup state will not survive a restart", path)
+        return mmap.mmap(-1, size)
+
+
+def _read_ring(path: str, capacity: int) -> list[bytes]:
+    """Digests of a ring file written with a capacity other than ``capacity``, oldest first."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return []
+    if len(data) < _RING_HEADER.size:
+        return []
+    magic, stored, head, count = _RING_HEADER.unpack_from(data, 0)
+    if magic != _RING_MAGIC or stored == capacity or _RING_HEADER.size + stored * DIGEST_SIZE > len(data):
+        return []
+    slots = range(head, head + count) if count == stored else range(count)
+    return [
+        data[_RING_HEADER.size + (slot % stored) * DIGEST_SIZE:][:DIGEST_SIZE]
+        for slot in slots
+    ]
+
+
+class BloomFilter:
+    """Two-generation Bloom filter over URL digests, in a memory-mapped file.
+
+    Each generation is sized for ``capacity`` digests at ``error`` false
+    positives. When the current generation is full, the older one is
+    cleared and becomes current, so membership covers between one and two
+    generations of history in constant space.
+    """
+
+    def __init__(self, path: str, capacity: int, error: float):
+        bits = math.ceil(-capacity * math.log(error) / math.log(2) ** 2)
+        self._bytes = (bits + 7) // 8
+        self._bits = self._bytes * 8
+        self._hashes = max(1, round(self._bits / capacity * math.log(2)))
+        self._capacity = capacity
+        self._mm = _map(path, _BLOOM_HEADER.size + 2 * self._bytes)
+
+        magic, bits, hashes, self._current, self._count = _BLOOM_HEADER.unpack_from(self._mm, 0)
+        if magic != _BLOOM_MAGIC or bits != self._bits or hashes != self._hashes:
+            if magic == _BLOOM_MAGIC:
+                logger.warning("Bloom filter %s resized — starting empty", path)
+            self._mm[:] = bytes(len(self._mm))
+            self._current = self._count = 0
+            self._sync_header()
+
+    def _sync_header(self):
+        _BLOOM_HEADER.pack_into(self._mm, 0, _BLOOM_MAGIC, self._bits, self._hashes, self._current, self._count)
+
+    def _positions(self, digest: bytes):
+        # Double hashing over the two halves of the digest
+        h1 = int.from_bytes(digest[:4], "little")
+        h2 = int.from_bytes(digest[4:], "little") | 1
+        bits = self._bits
+        for i in range(self._hashes):
+            yield (h1 + i * h2) % bits
+
+    def _offset(self, generation: int) -> int:
+        return _BLOOM_HEADER.size + generation * self._bytes
+
+    def __contains__(self, digest: bytes) -> bool:
+        mm = self._mm
+        for generation in (self._current, 1 - self._current):
+            base = self._offset(generation)
+            if all(mm[base + (bit >> 3)] & (1 << (bit & 7)) for bit in self._positions(digest)):
+                return True
+        return False
+
+    def add(self, digest: bytes):
+        if self._count >= self._capacity:
+            self._current = 1 - self._current
+            start = self._offset(self._current)
+            self._mm[start:start + self._bytes] = bytes(self._bytes)
+            self._count = 0
+        mm, base = self._mm, self._offset(self._current)
+        for bit in self._positions(digest):
+            mm[base + (bit >> 3)] |= 1 << (bit & 7)
+        self._count += 1
+        self._sync_header()
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self._mm)
+
+    def close(self):
+        self._mm.flush()
+        self._mm.close()
+
+
+class DedupStore:
+    """Recently seen article URLs, as digests in a persistent ring buffer.
+
+    The last ``capacity`` digests live in a memory-mapped ring file,
+    mirrored by an in-memory set for lookups. Adding a digest overwrites
+    the oldest slot once the ring is full, so eviction is O(1). A restart
+    re-reads the ring instead of treating the current feeds as new. With a
+    Bloom filter, evicted digests are still recognised, at the filter's
+    false-positive rate.
+    """
+
+    def __init__(self, path: str, capacity: int, bloom: BloomFilter | None = None):
+        self._capacity = max(1, capacity)
+        self._bloom = bloom
+        previous = _read_ring(path, self._capacity)
+        self._mm = _map(path, _RING_HEADER.size + self._capacity * DIGEST_SIZE)
+        self._digests: set[bytes] = set()
+
+        magic, capacity, head, count = _RING_HEADER.unpack_from(self._mm, 0)
+        if magic == _RING_MAGIC and capacity == self._capacity:
+            self._head, self._count = head, count
+            for slot in range(count):
+                self._digests.add(self._slot(slot))
+        else:
+            # New file, or written with another capacity: keep the newest digests
+            self._mm[:] = bytes(len(self._mm))
+            self._head = self._count = 0
+            for digest in previous[-self._capacity:]:
+                self._append(digest)
+            self._sync_header()
+            if previous:
+                logger.info("Dedup ring resized to %d — kept %d URLs", self._capacity, self._count)
+        DEDUP_ENTRIES.set(self._count)
+        if self._count:
+            logger.info("Dedup store loaded — %d URLs", self._count)
+
+    def _slot(self, slot: int) -> bytes:
+        start = _RING_HEADER.size + slot * DIGEST_SIZE
+        return self._mm[start:start + DIGEST_SIZE]
+
+    def _sync_header(self):
+        _RING_HEADER.pack_into(self._mm, 0, _RING_MAGIC, self._capacity, self._head, self._count)
+
+    def _append(self, digest: bytes):
+        start = _RING_HEADER.size + self._head * DIGEST_SIZE
+        if self._count == self._capacity:
+            evicted = self._mm[start:start + DIGEST_SIZE]
+            self._digests.discard(evicted)
+            if self._bloom is not None:
+                self._bloom.add(evicted)
+        else:
+            self._count += 1
+        self._mm[start:start + DIGEST_SIZE] = digest
+        self._digests.add(digest)
+        self._head = (self._head + 1) % self._capacity
+
+    def __contains__(self, digest: bytes) -> bool:
+        if digest in self._digests:
+            return True
+        if self._bloom is not None and digest in self._bloom:
+            DEDUP_BLOOM_HITS.inc()
+            return True
+        return False
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, digest: bytes):
+        if digest in self._digests:
+            return
+        self._append(digest)
+        self._sync_header()
+        DEDUP_ENTRIES.set(self._count)
+
+    def stats(self) -> dict:
+        return {
+            "urls": self._count,
+            "capacity": self._capacity,
+            "bloom_bytes": self._bloom.size_bytes if self._bloom is not None else 0,
+        }
+
+    def close(self):
+        self._mm.flush()
+        self._mm.close()
+        if self._bloom is not None:
+            self._bloom.close()
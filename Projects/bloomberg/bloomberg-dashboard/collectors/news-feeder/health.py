@@ -1,10 +1,12 @@
 import time
+from typing import Callable
 
 from fastapi import FastAPI
 from fastapi.responses import PlainTextResponse
 from prometheus_client import (
     Counter,
     Gauge,
+    Histogram,
     generate_latest,
     CONTENT_TYPE_LATEST,
 )
@@ -19,8 +21,59 @@ ARTICLES_DEDUPED = Counter("news_feeder_articles_deduped_total", "Total articles
 ACTIVE_SOURCES = Gauge("news_feeder_active_sources", "Number of active news sources")
 UPTIME = Gauge("news_feeder_uptime_seconds", "Feeder uptime in seconds")
 LAST_WRITE = Gauge("news_feeder_last_write_timestamp", "Last successful write timestamp", ["source"])
+SPOOL_RECORDS = Gauge("news_feeder_spool_records", "Failed write batches waiting in the disk spool")
+SPOOL_BYTES = Gauge("news_feeder_spool_bytes", "Payload bytes waiting in the disk spool")
+SPOOL_EVICTED = Counter("news_feeder_spool_evicted_total", "Spooled batches dropped because the spool was full")
+SPOOL_REPLAYED = Counter("news_feeder_spool_replayed_total", "Spooled batches replayed to InfluxDB")
+HTTP_CONNECTIONS_CREATED = Counter("news_feeder_http_connections_created_total", "New HTTP connections opened by the pool")
+HTTP_CONNECTIONS_REUSED = Counter("news_feeder_http_connections_reused_total", "Requests served on a kept-alive connection")
+HTTP_CONNECT_SECONDS = Histogram(
+    "news_feeder_http_connect_seconds",
+    "Time spent opening a new HTTP connection (DNS, TCP and TLS)",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+HTTP_DNS_LOOKUPS = Counter("news_feeder_http_dns_lookups_total", "DNS resolutions by the HTTP pool", ["result"])
+SERIES_CARDINALITY = Gauge(
+    "news_feeder_series_cardinality",
+    "Estimated distinct tag sets written per measurement (HyperLogLog)",
+    ["measurement"],
+)
+TAG_VALUES = Gauge("news_feeder_tag_values", "Distinct values admitted per tag", ["measurement", "tag"])
+TAGS_FOLDED = Counter(
+    "news_feeder_tags_folded_total",
+    "Tag values written as \"other\" because the cardinality budget was reached",
+    ["measurement", "tag"],
+)
+NEAR_DUPLICATES = Counter(
+    "news_feeder_near_duplicates_total",
+    "Articles whose headline is a near-duplicate of a recent story",
+    ["source"],
+)
+SENTIMENT_BATCH_SECONDS = Histogram(
+    "news_feeder_sentiment_batch_seconds",
+    "Time to score the headlines of one batch, memo lookups included",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+SENTIMENT_CACHE = Counter("news_feeder_sentiment_cache_total", "Sentiment memo lookups", ["result"])
+SENTIMENT_CACHE_ENTRIES = Gauge("news_feeder_sentiment_cache_entries", "Headlines held in the sentiment memo")
+FEED_POLLS = Counter(
+    "news_feeder_feed_polls_total",
+    "Feed polls by outcome (not_modified is a 304 on a conditional request)",
+    ["feed", "result"],
+)
+DEDUP_ENTRIES = Gauge("news_feeder_dedup_urls", "Article URLs held in the dedup ring")
+DEDUP_BLOOM_HITS = Counter(
+    "news_feeder_dedup_bloom_hits_total",
+    "URLs recognised by the Bloom filter after leaving the dedup ring",
+)
 
 _start_time = time.time()
+_status_providers: dict[str, Callable[[], dict]] = {}
+
+
+def register_status(name: str, provider: Callable[[], dict]):
+    """Add a section to the /health response, filled by calling ``provider``."""
+    _status_providers[name] = provider
 
 
 @app.get("/health")
@@ -30,6 +83,7 @@ def health():
         "status": "healthy",
         "service": "news-feeder",
         "uptime_seconds": round(time.time() - _start_time, 1),
+        **{name: provider() for name, provider in _status_providers.items()},
     }
 
 
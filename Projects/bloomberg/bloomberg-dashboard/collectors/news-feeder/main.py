@@ -6,7 +6,10 @@ import sys
 import uvicorn
 
 from config import settings
-from health import app as health_app, ARTICLES_DEDUPED
+from dedup import BloomFilter, DedupStore
+from health import app as health_app, register_status
+from http_pool import create_session
+from poll_state import poll_state
 from writers.influxdb_writer import InfluxDBWriter
 from sources import cryptopanic, newsapi
 
@@ -19,28 +22,6 @@ logging.basicConfig(
 logger = logging.getLogger("news-feeder")
 
 
-class DeduplicatedURLSet:
-    """Set with approximate LRU eviction to limit memory usage."""
-
-    def __init__(self, max_size: int = 10000):
-        self._max_size = max_size
-        self._urls: set[str] = set()
-        self._order: list[str] = []
-
-    def __contains__(self, url_hash: str) -> bool:
-        return url_hash in self._urls
-
-    def add(self, url_hash: str):
-        if url_hash in self._urls:
-            return
-        self._urls.add(url_hash)
-        self._order.append(url_hash)
-        # Evict oldest entries when over limit
-        while len(self._urls) > self._max_size:
-            oldest = self._order.pop(0)
-            self._urls.discard(oldest)
-
-
 async def main():
     stop_event = asyncio.Event()
 
@@ -53,7 +34,13 @@ async def main():
         loop.add_signal_handler(sig, _signal_handler)
 
     writer = InfluxDBWriter()
-    seen_urls = DeduplicatedURLSet(max_size=settings.dedup_max_urls)
+    bloom = None
+    if settings.dedup_bloom_enabled:
+        bloom = BloomFilter(settings.dedup_bloom_file, settings.dedup_bloom_capacity, settings.dedup_bloom_error)
+    seen_urls = DedupStore(settings.dedup_file, settings.dedup_max_urls, bloom)
+    register_status("dedup", seen_urls.stats)
+    register_status("poll_state", poll_state.stats)
+    session = create_session()
 
     # Health/metrics server
     config = uvicorn.Config(
@@ -66,8 +53,8 @@ async def main():
 
     tasks = [
         asyncio.create_task(server.serve(), name="health-server"),
-        asyncio.create_task(cryptopanic.run(writer.write_articles, stop_event, seen_urls), name="cryptopanic"),
-        asyncio.create_task(newsapi.run(writer.write_articles, stop_event, seen_urls), name="newsapi"),
+        asyncio.create_task(cryptopanic.run(writer.write_articles, stop_event, seen_urls, session), name="cryptopanic"),
+        asyncio.create_task(newsapi.run(writer.write_articles, stop_event, seen_urls, session), name="newsapi"),
     ]
 
     logger.info("News Feeder started — sources: CryptoPanic%s", ", NewsAPI" if settings.newsapi_key else "")
@@ -83,6 +70,8 @@ async def main():
     if pending:
         await asyncio.wait(pending, timeout=5)
 
+    await session.close()
+    seen_urls.close()
     writer.close()
     logger.info("News Feeder stopped cleanly")
 
@@ -0,0 +1,106 @@
+import hashlib
+import re
+from collections import deque
+
+_BITS = 64
+# "Title - Outlet" / "Title | Outlet" suffixes added by aggregators
+_OUTLET_SUFFIX = re.compile(r"\s+[-|–—]\s+[^-|–—]{1,40}$")
+_WORD = re.compile(r"[a-z0-9$%.]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with"
+    " after amid over says said new".split()
+)
+
+
+def strip_outlet(title: str) -> str:
+    """Headline without the outlet name appended by aggregators."""
+    return _OUTLET_SUFFIX.sub("", title)
+
+
+def normalize_title(title: str) -> list[str]:
+    """Lower-cased content words of a headline, without the outlet suffix."""
+    title = strip_outlet(title).lower().replace(",", "")
+    return [word.strip(".") for word in _WORD.findall(title) if word.strip(".") not in _STOPWORDS]
+
+
+def simhash(words: list[str]) -> int:
+    """64-bit SimHash of a set of words; similar headlines differ in few bits."""
+    counts = [0] * _BITS
+    for word in set(words):
+        h = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "big")
+        for bit in range(_BITS):
+            counts[bit] += 1 if h >> bit & 1 else -1
+    signature = 0
+    for bit, count in enumerate(counts):
+        if count > 0:
+            signature |= 1 << bit
+    return signature
+
+
+class Story:
+    """First article seen for a headline, shared by its near-duplicates."""
+
+    __slots__ = ("story_id", "signature", "seen_at", "score", "label")
+
+    def __init__(self, story_id: str, signature: int, seen_at: float):
+        self.story_id = story_id
+        self.signature = signature
+        self.seen_at = seen_at
+        self.score: float | None = None
+        self.label: str | None = None
+
+
+class NearDuplicateIndex:
+    """Recent headline signatures, bucketed so a lookup only compares a handful.
+
+    The 64 signature bits are split into ``distance + 1`` bands. Two
+    signatures within ``distance`` bits of each other must agree on at least
+    one whole band, so only stories sharing a band value are compared
+    (locality-sensitive hashing). Stories older than ``window`` seconds
+    drop out in insertion order.
+    """
+
+    def __init__(self, distance: int, window: float):
+        self._distance = distance
+        bands = min(distance + 1, _BITS)
+        widths = [_BITS // bands + (1 if i < _BITS % bands else 0) for i in range(bands)]
+        self._bands: list[tuple[int, int]] = []
+        offset = 0
+        for width in widths:
+            self._bands.append((offset, (1 << width) - 1))
+            offset += width
+        self._window = window
+        self._buckets: list[dict[int, deque[Story]]] = [{} for _ in self._bands]
+        self._recent: deque[Story] = deque()
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+    def _keys(self, signature: int) -> list[int]:
+        return [signature >> offset & mask for offset, mask in self._bands]
+
+    def _expire(self, now: float):
+        cutoff = now - self._window
+        while self._recent and self._recent[0].seen_at < cutoff:
+            story = self._recent.popleft()
+            for buckets, key in zip(self._buckets, self._keys(story.signature)):
+                bucket = buckets[key]
+                bucket.popleft()
+                if not bucket:
+                    del buckets[key]
+
+    def match(self, signature: int, now: float) -> Story | None:
+        """The closest recent story within ``distance`` bits, if any."""
+        self._expire(now)
+        best, best_distance = None, self._distance + 1
+        for buckets, key in zip(self._buckets, self._keys(signature)):
+            for story in buckets.get(key, ()):
+                distance = (story.signature ^ signature).bit_count()
+                if distance < best_distance:
+                    best, best_distance = story, distance
+        return best
+
+    def add(self, story: Story):
+        self._recent.append(story)
+        for buckets, key in zip(self._buckets, self._keys(story.signature)):
+            buckets.setdefault(key, deque()).append(story)
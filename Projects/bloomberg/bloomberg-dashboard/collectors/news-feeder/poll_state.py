@@ -0,0 +1,49 @@
+import json
+import logging
+import os
+
+from config import settings
+
+logger = logging.getLogger("news-feeder.poll_state")
+
+
+class PollState:
+    """Per-feed polling state (validators, watermarks) kept in a small JSON file.
+
+    Sources read their entry before a poll and store it back after, so a
+    restart resumes with conditional requests instead of full downloads.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        try:
+            with open(path) as f:
+                self._state: dict[str, dict] = {key: dict(value) for key, value in json.load(f).items()}
+            logger.info("Poll state loaded — %d feeds", len(self._state))
+        except FileNotFoundError:
+            self._state = {}
+        except (OSError, ValueError, AttributeError, TypeError):
+            logger.exception("Unreadable poll state %s — starting over", path)
+            self._state = {}
+
+    def get(self, key: str) -> dict:
+        return dict(self._state.get(key, {}))
+
+    def set(self, key: str, value: dict):
+        if self._state.get(key) == value:
+            return
+        self._state[key] = dict(value)
+        tmp = f"{self._path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(self._state, f)
+            os.replace(tmp, self._path)
+        except OSError as e:
+            logger.warning("Cannot save poll state %s: %s", self._path, e)
+
+    def stats(self) -> dict:
+        return {key: dict(value) for key, value in self._state.items()}
+
+
+poll_state = PollState(settings.poll_state_file)
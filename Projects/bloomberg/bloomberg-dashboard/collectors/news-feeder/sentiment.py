@@ -0,0 +1,133 @@
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from health import SENTIMENT_BATCH_SECONDS, SENTIMENT_CACHE, SENTIMENT_CACHE_ENTRIES
+from near_dup import strip_outlet
+
+logger = logging.getLogger("news-feeder.sentiment")
+
+_SPACES = re.compile(r"\s+")
+
+# Set in each worker process by _init_worker
+_analyzer = None
+
+
+def _init_worker():
+    global _analyzer
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+    _analyzer = SentimentIntensityAnalyzer()
+
+
+def _score_batch(texts: list[str]) -> list[float]:
+    """Compound score of each text (runs in a worker process)."""
+    return [_analyzer.polarity_scores(text)["compound"] for text in texts]
+
+
+def normalize(title: str) -> str:
+    """Text that is scored for a headline: outlet suffix removed, whitespace collapsed.
+
+    Case is kept, since VADER reads capitals as emphasis.
+    """
+    return _SPACES.sub(" ", strip_outlet(title)).strip()
+
+
+def label(compound: float) -> str:
+    if compound >= 0.05:
+        return "positive"
+    if compound <= -0.05:
+        return "negative"
+    return "neutral"
+
+
+class SentimentScorer:
+    """VADER scores computed in a process pool, memoized per normalized headline.
+
+    Headlines missing from the LRU memo are split into batches of
+    ``batch_size`` and scored by ``workers`` processes, so a large poll
+    never runs the analyzer on the event loop. Syndicated headlines that
+    differ only by their outlet suffix share a memo entry.
+    """
+
+    def __init__(self, workers: int, batch_size: int, cache_size: int):
+        self._workers = max(1, workers)
+        self._batch_size = max(1, batch_size)
+        self._cache_size = cache_size
+        self._cache: OrderedDict[bytes, tuple[float, str]] = OrderedDict()
+        self._hits = self._misses = 0
+        self._pool = self._new_pool()
+        logger.info("VADER sentiment analyzer enabled — %d worker(s)", self._workers)
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # forkserver: workers do not inherit the locks of the feeder's threads
+        return ProcessPoolExecutor(
+            max_workers=self._workers,
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=_init_worker,
+        )
+
+    async def _run(self, texts: list[str]) -> list[float]:
+        loop = asyncio.get_running_loop()
+        batches = [texts[i:i + self._batch_size] for i in range(0, len(texts), self._batch_size)]
+        results = await asyncio.gather(*(loop.run_in_executor(self._pool, _score_batch, batch) for batch in batches))
+        return [score for batch in results for score in batch]
+
+    async def score(self, titles: list[str]) -> list[tuple[float, str]]:
+        """(compound_score, label) of each title, in order."""
+        started = time.perf_counter()
+        results: list[tuple[float, str] | None] = []
+        pending: dict[bytes, str] = {}
+        keys = []
+        for title in titles:
+            text = normalize(title)
+            key = hashlib.blake2b(text.encode(), digest_size=8).digest()
+            keys.append(key)
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+            elif key not in pending:
+                pending[key] = text
+            results.append(cached)
+        self._misses += len(pending)
+        self._hits += len(titles) - len(pending)
+
+        if pending:
+            texts = list(pending.values())
+            try:
+                compounds = await self._run(texts)
+            except BrokenProcessPool:
+                logger.warning("Sentiment worker died — restarting the pool")
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._new_pool()
+                compounds = await self._run(texts)
+            scored = {key: (round(compound, 4), label(compound)) for key, compound in zip(pending, compounds)}
+            for i, key in enumerate(keys):
+                if results[i] is None:
+                    results[i] = scored[key]
+            self._cache.update(scored)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+        SENTIMENT_CACHE.labels(result="hit").inc(len(titles) - len(pending))
+        SENTIMENT_CACHE.labels(result="miss").inc(len(pending))
+        SENTIMENT_CACHE_ENTRIES.set(len(self._cache))
+        SENTIMENT_BATCH_SECONDS.observe(time.perf_counter() - started)
+        return results
+
+    def stats(self) -> dict:
+        lookups = self._hits + self._misses
+        return {
+            "workers": self._workers,
+            "cached": len(self._cache),
+            "hit_rate": round(self._hits / lookups, 3) if lookups else None,
+        }
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
@@ -1,14 +1,17 @@
 import asyncio
-import hashlib
 import logging
 import time
 from typing import Callable
+from xml.etree import ElementTree
 
 import aiohttp
 import feedparser
 
 from config import settings
-from health import ACTIVE_SOURCES
+from dedup import DedupStore, url_digest
+from health import ACTIVE_SOURCES, FEED_POLLS
+from poll_state import poll_state
+from tagging import tagger
 
 logger = logging.getLogger("news-feeder.cryptopanic")
 
@@ -18,29 +21,17 @@ RSS_URL = "https://cryptopanic.com/news/rss/"
 # API endpoint (requires token)
 API_URL = "https://cryptopanic.com/api/v1/posts/"
 
-# Known crypto symbols to tag related_asset
-CRYPTO_KEYWORDS = {
-    "bitcoin": "BTC", "btc": "BTC",
-    "ethereum": "ETH", "eth": "ETH",
-    "solana": "SOL", "sol": "SOL",
-    "bnb": "BNB", "binance": "BNB",
-    "xrp": "XRP", "ripple": "XRP",
-}
+TIMEOUT = aiohttp.ClientTimeout(total=15)
 
+# Poll state key of the RSS feed, and the download chunk fed to the parser
+RSS_STATE = "cryptopanic_rss"
+RSS_CHUNK = 16 * 1024
 
-def _detect_asset(title: str) -> str:
-    title_lower = title.lower()
-    for keyword, symbol in CRYPTO_KEYWORDS.items():
-        if keyword in title_lower:
-            return symbol
-    return "CRYPTO"
+# related_asset of an article that mentions no registered asset
+DEFAULT_ASSET = "CRYPTO"
 
 
-def _url_hash(url: str) -> str:
-    return hashlib.md5(url.encode()).hexdigest()
-
-
-async def run(write_fn: Callable, stop_event: asyncio.Event, seen_urls: set):
+async def run(write_fn: Callable, stop_event: asyncio.Event, seen_urls: DedupStore, session: aiohttp.ClientSession):
     """Poll CryptoPanic every POLLING_INTERVAL seconds."""
     interval = settings.polling_interval
     use_api = bool(settings.cryptopanic_token)
@@ -52,9 +43,9 @@ async def run(write_fn: Callable, stop_event: asyncio.Event, seen_urls: set):
         while not stop_event.is_set():
             try:
                 if use_api:
-                    articles = await _fetch_api(seen_urls)
+                    articles = await _fetch_api(session, seen_urls)
                 else:
-                    articles = await _fetch_rss(seen_urls)
+                    articles = await _fetch_rss(session, seen_urls)
 
                 if articles:
                     await write_fn(articles, source="cryptopanic")
@@ -73,36 +64,115 @@ async def run(write_fn: Callable, stop_event: asyncio.Event, seen_urls: set):
         logger.info("CryptoPanic source stopped")
 
 
-async def _fetch_rss(seen_urls: set) -> list[dict]:
-    """Fetch from public RSS feed (no token needed)."""
-    feed = await asyncio.to_thread(feedparser.parse, RSS_URL)
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _entry(elem: ElementTree.Element) -> tuple[str, str, str]:
+    """(link, title, published) of an RSS <item> or Atom <entry>."""
+    link = title = published = ""
+    for child in elem:
+        name = _local(child.tag)
+        if name == "link" and not link:
+            link = (child.text or child.get("href") or "").strip()
+        elif name == "title":
+            title = (child.text or "").strip()
+        elif name in ("pubDate", "published", "updated") and not published:
+            published = (child.text or "").strip()
+    return link, title, published
+
+
+def _drain(parser: ElementTree.XMLPullParser, seen_urls: DedupStore, entries: list[tuple[str, str, str]]) -> bool:
+    """Move the entries parsed so far into ``entries``; True once an already-seen entry is reached."""
+    for _, elem in parser.read_events():
+        if _local(elem.tag) not in ("item", "entry"):
+            continue
+        entry = _entry(elem)
+        elem.clear()
+        if url_digest(entry[0]) in seen_urls:
+            return True
+        entries.append(entry)
+    return False
+
+
+async def _fetch_rss(session: aiohttp.ClientSession, seen_urls: DedupStore) -> list[dict]:
+    """Fetch the new entries of the public RSS feed (no token needed).
+
+    The request carries the feed's last ETag/Last-Modified, so an unchanged
+    feed costs a 304. Otherwise the feed is parsed while it downloads, and
+    the download stops at the first entry already seen: entries are newest
+    first, so the rest are known too.
+    """
+    state = poll_state.get(RSS_STATE)
+    headers = {}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+
+    entries: list[tuple[str, str, str]] = []
+    async with session.get(RSS_URL, headers=headers, timeout=TIMEOUT) as resp:
+        if resp.status == 304:
+            FEED_POLLS.labels(feed=RSS_STATE, result="not_modified").inc()
+            return []
+        if resp.status != 200:
+            logger.warning("CryptoPanic RSS returned %d", resp.status)
+            return []
+
+        parser = ElementTree.XMLPullParser(events=("end",))
+        chunks = []
+        try:
+            async for chunk in resp.content.iter_chunked(RSS_CHUNK):
+                chunks.append(chunk)
+                parser.feed(chunk)
+                if _drain(parser, seen_urls, entries):
+                    break
+        except ElementTree.ParseError as e:
+            # feedparser copes with feeds that are not well-formed XML
+            logger.warning("CryptoPanic RSS is not well-formed (%s) — parsing it with feedparser", e)
+            chunks.append(await resp.read())
+            feed = await asyncio.to_thread(feedparser.parse, b"".join(chunks))
+            entries = []
+            for entry in feed.entries:
+                link = entry.get("link", "")
+                if url_digest(link) in seen_urls:
+                    break
+                entries.append((link, entry.get("title", "").strip(), entry.get("published", "")))
+
+        poll_state.set(RSS_STATE, {
+            key: value for key, value in (
+                ("etag", resp.headers.get("ETag")), ("last_modified", resp.headers.get("Last-Modified")),
+            ) if value
+        })
+
+    FEED_POLLS.labels(feed=RSS_STATE, result="new_entries" if entries else "no_new_entries").inc()
     articles = []
     ts = time.time_ns()
 
-    for entry in feed.entries:
-        url = entry.get("link", "")
-        url_h = _url_hash(url)
+    for url, title, published in entries:
+        url_h = url_digest(url)
         if url_h in seen_urls:
             continue
         seen_urls.add(url_h)
 
-        title = entry.get("title", "").strip()
         if not title:
             continue
 
+        assets = tagger.tag(title) or [DEFAULT_ASSET]
         articles.append({
             "title": title,
             "url": url,
             "source": "cryptopanic",
-            "related_asset": _detect_asset(title),
-            "published": entry.get("published", ""),
+            "related_asset": assets[0],
+            "related_assets": assets,
+            "published": published,
             "time": ts,
         })
 
     return articles
 
 
-async def _fetch_api(seen_urls: set) -> list[dict]:
+async def _fetch_api(session: aiohttp.ClientSession, seen_urls: DedupStore) -> list[dict]:
     """Fetch from CryptoPanic API (requires token)."""
     params = {
         "auth_token": settings.cryptopanic_token,
@@ -110,19 +180,18 @@ async def _fetch_api(seen_urls: set) -> list[dict]:
         "filter": "important",
     }
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(API_URL, params=params, timeout=aiohttp.ClientTimeout(total=15)) as resp:
-            if resp.status != 200:
-                logger.warning("CryptoPanic API returned %d", resp.status)
-                return []
-            data = await resp.json()
+    async with session.get(API_URL, params=params, timeout=TIMEOUT) as resp:
+        if resp.status != 200:
+            logger.warning("CryptoPanic API returned %d", resp.status)
+            return []
+        data = await resp.json()
 
     articles = []
     ts = time.time_ns()
 
     for post in data.get("results", []):
         url = post.get("url", "")
-        url_h = _url_hash(url)
+        url_h = url_digest(url)
         if url_h in seen_urls:
             continue
         seen_urls.add(url_h)
@@ -131,17 +200,17 @@ async def _fetch_api(seen_urls: set) -> list[dict]:
         if not title:
             continue
 
-        # Extract related asset from currencies
-        related = "CRYPTO"
-        currencies = post.get("currencies", [])
-        if currencies:
-            related = currencies[0].get("code", "CRYPTO")
+        # Currencies tagged by CryptoPanic first, then those the headline names
+        assets = [c["code"] for c in post.get("currencies") or [] if c.get("code")]
+        assets += [symbol for symbol in tagger.tag(title) if symbol not in assets]
+        assets = assets or [DEFAULT_ASSET]
 
         articles.append({
             "title": title,
             "url": url,
             "source": "cryptopanic",
-            "related_asset": related,
+            "related_asset": assets[0],
+            "related_assets": assets,
             "published": post.get("published_at", ""),
             "time": ts,
         })
@@ -1,5 +1,4 @@
 import asyncio
-import hashlib
 import logging
 import time
 from typing import Callable
@@ -7,11 +6,15 @@ from typing import Callable
 import aiohttp
 
 from config import settings
-from health import ACTIVE_SOURCES
+from dedup import DedupStore, url_digest
+from health import ACTIVE_SOURCES, FEED_POLLS
+from poll_state import poll_state
+from tagging import tagger
 
 logger = logging.getLogger("news-feeder.newsapi")
 
 API_URL = "https://newsapi.org/v2/everything"
+TIMEOUT = aiohttp.ClientTimeout(total=15)
 
 QUERIES = [
     ("bitcoin OR ethereum OR crypto", "CRYPTO"),
@@ -19,29 +22,8 @@ QUERIES = [
     ("forex OR dollar OR euro", "FOREX"),
 ]
 
-ASSET_KEYWORDS = {
-    "bitcoin": "BTC", "btc": "BTC",
-    "ethereum": "ETH", "eth": "ETH",
-    "tesla": "TSLA", "apple": "AAPL", "microsoft": "MSFT",
-    "s&p": "SP500", "nasdaq": "NASDAQ",
-    "euro": "EURUSD", "dollar": "USD",
-    "gold": "GOLD", "oil": "CRUDE_OIL",
-}
 
-
-def _detect_asset(title: str, default: str) -> str:
-    title_lower = title.lower()
-    for keyword, symbol in ASSET_KEYWORDS.items():
-        if keyword in title_lower:
-            return symbol
-    return default
-
-
-def _url_hash(url: str) -> str:
-    return hashlib.md5(url.encode()).hexdigest()
-
-
-async def run(write_fn: Callable, stop_event: asyncio.Event, seen_urls: set):
+async def run(write_fn: Callable, stop_event: asyncio.Event, seen_urls: DedupStore, session: aiohttp.ClientSession):
     """Poll NewsAPI every POLLING_INTERVAL seconds. Only runs if NEWSAPI_KEY is set."""
     if not settings.newsapi_key:
         logger.info("NEWSAPI_KEY not set — NewsAPI source disabled")
@@ -56,7 +38,7 @@ async def run(write_fn: Callable, stop_event: asyncio.Event, seen_urls: set):
             try:
                 all_articles = []
                 for query, default_asset in QUERIES:
-                    articles = await _fetch_query(query, default_asset, seen_urls)
+                    articles = await _fetch_query(session, query, default_asset, seen_urls)
                     all_articles.extend(articles)
 
                 if all_articles:
@@ -76,46 +58,89 @@ async def run(write_fn: Callable, stop_event: asyncio.Event, seen_urls: set):
         logger.info("NewsAPI source stopped")
 
 
-async def _fetch_query(query: str, default_asset: str, seen_urls: set) -> list[dict]:
-    """Fetch articles for a single query."""
+async def _fetch_query(
+    session: aiohttp.ClientSession, query: str, default_asset: str, seen_urls: DedupStore
+) -> list[dict]:
+    """Fetch the articles published for a query since its watermark.
+
+    The watermark is the newest publishedAt fetched for the query, kept in
+    the poll state and sent as ``from``. Results are newest first: pages are
+    read until an article older than the watermark, a short page, or
+    NEWSAPI_MAX_PAGES. Articles already seen (by another query or source)
+    are skipped without ending the scan. Without a watermark, only the first page is read.
+    If a page fails, the watermark is left where it was, so the pages not
+    read are fetched again on the next poll.
+    """
+    key = f"newsapi:{query}"
+    watermark = poll_state.get(key).get("published_at")
     headers = {"X-Api-Key": settings.newsapi_key}
     params = {
         "q": query,
         "language": "en",
         "sortBy": "publishedAt",
-        "pageSize": 20,
+        "pageSize": settings.newsapi_page_size,
     }
-
-    async with aiohttp.ClientSession() as session:
-        async with session.get(API_URL, headers=headers, params=params, timeout=aiohttp.ClientTimeout(total=15)) as resp:
-            if resp.status != 200:
-                logger.warning("NewsAPI returned %d for query '%s'", resp.status, query)
-                return []
-            data = await resp.json()
+    if watermark:
+        params["from"] = watermark
+    max_pages = settings.newsapi_max_pages if watermark else 1
 
     articles = []
+    newest = watermark
     ts = time.time_ns()
+    caught_up = False
+    failed = False
 
-    for item in data.get("articles", []):
-        url = item.get("url", "")
-        url_h = _url_hash(url)
-        if url_h in seen_urls:
-            continue
-        seen_urls.add(url_h)
-
-        title = item.get("title", "").strip()
-        if not title or title == "[Removed]":
-            continue
-
-        source_name = (item.get("source") or {}).get("name", "unknown")
-
-        articles.append({
-            "title": title,
-            "url": url,
-            "source": source_name,
-            "related_asset": _detect_asset(title, default_asset),
-            "published": item.get("publishedAt", ""),
-            "time": ts,
-        })
+    for page in range(1, max_pages + 1):
+        params["page"] = page
+        async with session.get(API_URL, headers=headers, params=params, timeout=TIMEOUT) as resp:
+            if resp.status != 200:
+                logger.warning("NewsAPI returned %d for query '%s' (page %d)", resp.status, query, page)
+                failed = True
+                break
+            data = await resp.json()
 
+        items = data.get("articles", [])
+        for item in items:
+            url = item.get("url", "")
+            url_h = url_digest(url)
+            published = item.get("publishedAt") or ""
+            if watermark and published and published < watermark:
+                caught_up = True
+                break
+            # ISO 8601 UTC timestamps compare as strings
+            if published and (newest is None or published > newest):
+                newest = published
+            if url_h in seen_urls:
+                continue
+            seen_urls.add(url_h)
+
+            title = item.get("title", "").strip()
+            if not title or title == "[Removed]":
+                continue
+
+            source_name = (item.get("source") or {}).get("name", "unknown")
+            assets = tagger.tag(title) or [default_asset]
+
+            articles.append({
+                "title": title,
+                "url": url,
+                "source": source_name,
+                "related_asset": assets[0],
+                "related_assets": assets,
+                "published": published,
+                "time": ts,
+            })
+
+        if caught_up or len(items) < settings.newsapi_page_size:
+            break
+    else:
+        if watermark:
+            logger.warning(
+                "NewsAPI query '%s' has more than %d pages since %s — older articles skipped",
+                query, max_pages, watermark,
+            )
+
+    if newest != watermark and not failed:
+        poll_state.set(key, {"published_at": newest})
+    FEED_POLLS.labels(feed="newsapi", result="new_entries" if articles else "no_new_entries").inc()
     return articles
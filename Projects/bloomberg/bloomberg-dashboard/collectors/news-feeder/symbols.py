@@ -0,0 +1,94 @@
+import json
+import logging
+import os
+
+from config import settings
+
+logger = logging.getLogger("news-feeder.symbols")
+
+# Copied into market-feeder and news-feeder, whose images are built from
+# their own directories: change both copies together (tests/test_shared_modules.py).
+# The kiosk only reads the list of symbols (kiosk-controller/symbols.py).
+
+# Repository copy, used when running outside the container (local dev, market-feeder bench)
+_REPO_FILE = os.path.join(os.path.dirname(__file__), "..", "..", "config", "symbols.json")
+
+
+class Instrument:
+    """One entry of the symbol registry."""
+
+    __slots__ = ("symbol", "asset_type", "name", "aliases", "providers")
+
+    def __init__(self, symbol: str, asset_type: str, name: str, aliases: tuple[str, ...], providers: dict[str, str]):
+        self.symbol = symbol
+        self.asset_type = asset_type
+        self.name = name
+        self.aliases = aliases
+        self.providers = providers
+
+    def __repr__(self) -> str:
+        return f"Instrument({self.symbol} {self.asset_type} {self.providers})"
+
+
+class SymbolRegistry:
+    """The symbol universe from ``config/symbols.json``, indexed once at load.
+
+    Every lookup is a dict access: canonical symbol to instrument,
+    (provider, provider symbol) to instrument, and provider to its
+    instruments in file order.
+    """
+
+    def __init__(self, entries: list[dict]):
+        self._by_symbol: dict[str, Instrument] = {}
+        self._by_provider_symbol: dict[tuple[str, str], Instrument] = {}
+        self._by_provider: dict[str, list[Instrument]] = {}
+
+        for entry in entries:
+            instrument = Instrument(
+                entry["symbol"],
+                entry["asset_type"],
+                entry.get("name", entry["symbol"]),
+                tuple(entry.get("aliases", ())),
+                dict(entry.get("providers", {})),
+            )
+            if instrument.symbol in self._by_symbol:
+                raise ValueError(f"duplicate symbol {instrument.symbol} in registry")
+            self._by_symbol[instrument.symbol] = instrument
+            for provider, provider_symbol in instrument.providers.items():
+                key = (provider, provider_symbol)
+                if key in self._by_provider_symbol:
+                    raise ValueError(f"{provider} symbol {provider_symbol} mapped twice in registry")
+                self._by_provider_symbol[key] = instrument
+                self._by_provider.setdefault(provider, []).append(instrument)
+
+    @classmethod
+    def load(cls, path: str) -> "SymbolRegistry":
+        if not os.path.exists(path) and os.path.exists(_REPO_FILE):
+            path = _REPO_FILE
+        with open(path) as f:
+            registry = cls(json.load(f)["symbols"])
+        logger.info("Symbol registry loaded from %s — %d symbols", path, len(registry))
+        return registry
+
+    def __len__(self) -> int:
+        return len(self._by_symbol)
+
+    @property
+    def symbols(self) -> list[str]:
+        return list(self._by_symbol)
+
+    def get(self, symbol: str) -> Instrument | None:
+        return self._by_symbol.get(symbol)
+
+    def resolve(self, provider: str, provider_symbol: str) -> Instrument | None:
+        """Instrument that ``provider`` calls ``provider_symbol``, if registered."""
+        return self._by_provider_symbol.get((provider, provider_symbol))
+
+    def for_provider(self, provider: str) -> list[Instrument]:
+        return self._by_provider.get(provider, [])
+
+    def provider_symbols(self, provider: str) -> list[str]:
+        return [instrument.providers[provider] for instrument in self.for_provider(provider)]
+
+
+registry = SymbolRegistry.load(settings.symbols_file)
@@ -0,0 +1,90 @@
+import logging
+from collections import deque
+
+from symbols import SymbolRegistry, registry
+
+logger = logging.getLogger("news-feeder.tagging")
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum()
+
+
+class AssetTagger:
+    """Find the assets a headline mentions, by alias, in one pass over the text.
+
+    All aliases are compiled into an Aho–Corasick automaton, so tagging
+    costs time linear in the headline length (plus the matches found)
+    however many aliases are loaded. Matching is case-insensitive and a
+    match only counts if it is a whole word: "eth" does not match in
+    "method", nor "oil" in "turmoil".
+    """
+
+    def __init__(self, aliases: dict[str, str]):
+        # Trie of the lower-cased aliases: transitions, failure links, and for
+        # each state the (alias length, symbol) of the aliases ending there
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[tuple[tuple[int, str], ...]] = [()]
+
+        for alias, symbol in aliases.items():
+            state = 0
+            for ch in alias:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            self._out[state] += ((len(alias), symbol),)
+
+        # Breadth-first, so a state's failure target is complete before its children
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    @classmethod
+    def from_registry(cls, symbols: SymbolRegistry) -> "AssetTagger":
+        """Tagger over the aliases and names of every registered instrument."""
+        aliases: dict[str, str] = {}
+        for symbol in symbols.symbols:
+            instrument = symbols.get(symbol)
+            for alias in (*instrument.aliases, instrument.name):
+                alias = alias.strip().lower()
+                if alias and aliases.setdefault(alias, symbol) != symbol:
+                    logger.warning("Alias %r of %s already belongs to %s — ignored", alias, symbol, aliases[alias])
+        return cls(aliases)
+
+    def tag(self, text: str) -> list[str]:
+        """Symbols mentioned in ``text``, in order of first mention."""
+        text = text.lower()
+        goto, fail, out = self._goto, self._fail, self._out
+        found: list[str] = []
+        state = 0
+        for end, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            for length, symbol in out[state]:
+                start = end - length + 1
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if end + 1 < len(text) and _is_word_char(text[end + 1]):
+                    continue
+                if symbol not in found:
+                    found.append(symbol)
+        return found
+
+
+tagger = AssetTagger.from_registry(registry)
@@ -0,0 +1,53 @@
+"""Whole-word alias matching in the Aho–Corasick asset tagger."""
+from symbols import registry
+from tagging import AssetTagger
+
+ALIASES = {
+    "eth": "ETH",
+    "ethereum": "ETH",
+    "oil": "OIL",
+    "crude oil": "OIL",
+    "s&p 500": "SPX",
+    "bitcoin": "BTC",
+    "btc": "BTC",
+    "he": "HE",
+    "she": "SHE",
+    "hers": "HERS",
+}
+
+tagger = AssetTagger(ALIASES)
+
+
+def test_aliases_match_case_insensitively():
+    assert tagger.tag("Bitcoin and ETHEREUM rally") == ["BTC", "ETH"]
+
+
+def test_partial_words_do_not_match():
+    assert tagger.tag("A new method for turmoil in boiling markets") == []
+    assert tagger.tag("ethereums") == []
+
+
+def test_punctuation_is_a_word_boundary():
+    assert tagger.tag("(BTC), eth; oil.") == ["BTC", "ETH", "OIL"]
+    assert tagger.tag("S&P 500 closes higher") == ["SPX"]
+
+
+def test_symbols_are_listed_once_in_order_of_first_mention():
+    assert tagger.tag("Oil slips as bitcoin jumps; crude oil and BTC diverge") == ["OIL", "BTC"]
+
+
+def test_overlapping_aliases_found_through_failure_links():
+    # "she" ends inside "hers", and "he" inside both
+    assert tagger.tag("ushers") == []
+    assert tagger.tag("she said hers") == ["SHE", "HERS"]
+    assert tagger.tag("he, she") == ["HE", "SHE"]
+
+
+def test_multi_word_alias_must_end_on_a_boundary():
+    assert tagger.tag("crude oils") == []
+    assert tagger.tag("crude oil") == ["OIL"]
+
+
+def test_registry_aliases_load():
+    assets = AssetTagger.from_registry(registry).tag("Ethereum and Bitcoin")
+    assert assets == ["ETH", "BTC"]
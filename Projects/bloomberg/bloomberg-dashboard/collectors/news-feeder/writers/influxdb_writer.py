@@ -1,15 +1,27 @@
+import asyncio
 import logging
 import time
 
 from influxdb_client import InfluxDBClient, Point, WritePrecision
 from influxdb_client.client.write_api import SYNCHRONOUS
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
 from config import settings
-from health import WRITES_TOTAL, WRITE_ERRORS, ARTICLES_WRITTEN, ARTICLES_DEDUPED, LAST_WRITE
+from dedup import url_digest
+from health import (
+    WRITES_TOTAL, WRITE_ERRORS, ARTICLES_WRITTEN, ARTICLES_DEDUPED, LAST_WRITE, SPOOL_REPLAYED, NEAR_DUPLICATES,
+    register_status,
+)
+from near_dup import NearDuplicateIndex, Story, normalize_title, simhash
+from sentiment import SentimentScorer
+from writers.cardinality import CardinalityGuard
+from writers.spool import SegmentSpool
 
 logger = logging.getLogger("news-feeder.writer")
 
+ARTICLE_TAGS = ("related_asset", "sentiment_label", "source")
+# Headlines with fewer content words are too short to match reliably
+NEAR_DUP_MIN_WORDS = 4
+
 
 class InfluxDBWriter:
     def __init__(self):
@@ -22,57 +34,138 @@ class InfluxDBWriter:
         self._bucket = settings.influxdb_bucket
         self._org = settings.influxdb_org
 
-        self._analyzer = None
-        if settings.sentiment_enabled:
-            self._analyzer = SentimentIntensityAnalyzer()
-            logger.info("VADER sentiment analyzer enabled")
+        self._guard = None
+        if settings.cardinality_guard_enabled:
+            self._guard = CardinalityGuard(settings.cardinality_series_budget, settings.cardinality_tag_budget)
+        # Tag sets already admitted by the guard
+        self._admitted: set[tuple] = set()
 
-        logger.info("InfluxDB writer initialized — bucket=%s", self._bucket)
+        self._near_dup = None
+        if settings.near_dup_mode in ("cluster", "drop"):
+            self._near_dup = NearDuplicateIndex(settings.near_dup_distance, settings.near_dup_window)
+            register_status("near_dup", lambda: {"mode": settings.near_dup_mode, "stories": len(self._near_dup)})
 
-    def _analyze_sentiment(self, text: str) -> tuple[float, str]:
-        """Return (compound_score, label) using VADER."""
-        if not self._analyzer:
-            return 0.0, "neutral"
-
-        scores = self._analyzer.polarity_scores(text)
-        compound = scores["compound"]
+        self._scorer = None
+        if settings.sentiment_enabled:
+            self._scorer = SentimentScorer(
+                settings.sentiment_workers, settings.sentiment_batch_size, settings.sentiment_cache_size
+            )
+            register_status("sentiment", self._scorer.stats)
+
+        self._spool: SegmentSpool | None = None
+        self._last_replay = 0.0
+        self._replaying = False
+        if settings.spool_enabled:
+            try:
+                self._spool = SegmentSpool(
+                    settings.spool_dir, settings.spool_segment_bytes, settings.spool_max_bytes
+                )
+                register_status("spool", self._spool.stats)
+            except OSError:
+                logger.exception("Cannot open spool at %s — failed writes will be dropped", settings.spool_dir)
 
-        if compound >= 0.05:
-            label = "positive"
-        elif compound <= -0.05:
-            label = "negative"
-        else:
-            label = "neutral"
+        logger.info("InfluxDB writer initialized — bucket=%s", self._bucket)
 
-        return round(compound, 4), label
+    async def _score(self, pairs: list[tuple[dict, Story | None]]) -> list[tuple[float, str]]:
+        """(compound_score, label) of each article; a story is scored once and its score reused."""
+        if self._scorer is None:
+            return [(0.0, "neutral")] * len(pairs)
+
+        unscored: dict[int, tuple[dict, Story | None]] = {}
+        for article, story in pairs:
+            if story is None:
+                unscored[id(article)] = (article, None)
+            elif story.score is None:
+                unscored.setdefault(id(story), (article, story))
+        results = await self._scorer.score([article.get("title", "") for article, _ in unscored.values()])
+        for (_, story), (score, label) in zip(unscored.values(), results):
+            if story is not None:
+                story.score, story.label = score, label
+        scores = dict(zip(unscored, results))
+
+        return [
+            (story.score, story.label) if story is not None else scores[id(article)]
+            for article, story in pairs
+        ]
+
+    def _check_tags(self, tags: tuple) -> tuple[tuple, dict[str, str]]:
+        """Tag values to write (within the cardinality budget) and the raw values of folded tags."""
+        if self._guard is None or tags in self._admitted:
+            return tags, {}
+        written, folded = self._guard.admit("article", ARTICLE_TAGS, tags)
+        if not folded:
+            self._admitted.add(tags)
+        return written, folded
+
+    def _assign_stories(self, articles: list[dict], source: str) -> list[tuple[dict, Story | None]]:
+        """Pair each article with the story it is a near-duplicate of (or starts).
+
+        In ``drop`` mode, near-duplicates are left out.
+        """
+        if self._near_dup is None:
+            return [(article, None) for article in articles]
+        now = time.monotonic()
+        kept = []
+        for article in articles:
+            words = normalize_title(article.get("title", ""))
+            if len(words) < NEAR_DUP_MIN_WORDS:
+                kept.append((article, None))
+                continue
+            signature = simhash(words)
+            story = self._near_dup.match(signature, now)
+            if story is None:
+                story = Story(url_digest(article.get("url") or article.get("title", "")).hex(), signature, now)
+                self._near_dup.add(story)
+            else:
+                NEAR_DUPLICATES.labels(source=source).inc()
+                if settings.near_dup_mode == "drop":
+                    ARTICLES_DEDUPED.labels(source=source).inc()
+                    continue
+            kept.append((article, story))
+        return kept
 
     async def write_articles(self, articles: list[dict], source: str = "unknown"):
-        """Write articles to InfluxDB with sentiment analysis."""
+        """Write articles to InfluxDB with sentiment analysis.
+
+        Near-duplicate headlines share the story_id field of the first
+        article of their story and reuse its sentiment.
+        """
         if not articles:
             return
 
+        payload = None
         try:
+            pairs = self._assign_stories(articles, source)
+            sentiments = await self._score(pairs)
             influx_points = []
-            for article in articles:
+            for (article, story), (score, label) in zip(pairs, sentiments):
                 title = article.get("title", "")
-                score, label = self._analyze_sentiment(title)
-
-                point = (
-                    Point("article")
-                    .tag("source", article.get("source", source))
-                    .tag("sentiment_label", label)
-                    .tag("related_asset", article.get("related_asset", "UNKNOWN"))
-                    .field("title", title)
-                    .field("url", article.get("url", ""))
-                    .field("score", score)
-                )
+
+                tags = (article.get("related_asset", "UNKNOWN"), label, article.get("source", source))
+                tags, folded = self._check_tags(tags)
+                point = Point("article")
+                for key, value in zip(ARTICLE_TAGS, tags):
+                    point.tag(key, value)
+                point.field("title", title).field("url", article.get("url", "")).field("score", score)
+                for key, value in folded.items():
+                    point.field(key, value)
+                if story is not None:
+                    point.field("story_id", story.story_id)
+                if article.get("related_assets"):
+                    point.field("related_assets", ",".join(article["related_assets"]))
 
                 if "time" in article:
-                    point = point.time(article["time"], WritePrecision.NS)
+                    ts = article["time"]
+                    if folded:
+                        ts = self._guard.folded_time("article", ts)
+                    point = point.time(ts, WritePrecision.NS)
 
                 influx_points.append(point)
 
-            self._write_api.write(bucket=self._bucket, org=self._org, record=influx_points)
+            if not influx_points:
+                return
+            payload = "\n".join(p.to_line_protocol() for p in influx_points).encode()
+            await self._write(payload)
 
             WRITES_TOTAL.labels(source=source).inc()
             ARTICLES_WRITTEN.labels(source=source).inc(len(influx_points))
@@ -83,9 +176,52 @@ class InfluxDBWriter:
         except Exception:
             WRITE_ERRORS.labels(source=source).inc()
             logger.exception("InfluxDB write error (source=%s, articles=%d)", source, len(articles))
-            raise
+            if self._spool is None or payload is None:
+                raise
+            # Keep the batch on disk; it is replayed after the next successful write
+            try:
+                self._spool.append(payload)
+            except OSError:
+                logger.exception("Spool append failed — batch dropped")
+            return
+
+        await self._replay_spool()
+
+    async def _write(self, payload: bytes):
+        # The client is synchronous: keep the event loop free while it waits on InfluxDB
+        await asyncio.to_thread(self._write_api.write, bucket=self._bucket, org=self._org, record=payload)
+
+    async def _replay_spool(self):
+        """Replay up to ``spool_replay_batch`` spooled payloads, at most once per interval."""
+        if self._spool is None or not self._spool.records or self._replaying:
+            return
+        now = time.monotonic()
+        if now - self._last_replay < settings.spool_replay_interval:
+            return
+        self._last_replay = now
+
+        # Writes from other sources can run meanwhile; only one replay may peek and pop
+        self._replaying = True
+        try:
+            for _ in range(settings.spool_replay_batch):
+                payload = self._spool.peek()
+                if payload is None:
+                    return
+                try:
+                    await self._write(payload)
+                except Exception:
+                    logger.warning("Spool replay failed — %d batches still pending", len(self._spool))
+                    return
+                self._spool.pop()
+                SPOOL_REPLAYED.inc()
+        finally:
+            self._replaying = False
 
     def close(self):
+        if self._scorer is not None:
+            self._scorer.close()
+        if self._spool is not None:
+            self._spool.close()
         try:
             self._write_api.close()
             self._client.close()
@@ -0,0 +1,192 @@
+import logging
+import mmap
+import os
+import struct
+import zlib
+
+from health import SPOOL_RECORDS, SPOOL_BYTES, SPOOL_EVICTED
+
+logger = logging.getLogger("news-feeder.spool")
+
+# Copied into market-feeder and news-feeder, whose images are built from
+# their own directories: change both copies together (tests/test_shared_modules.py).
+
+# Segment header: write offset, read offset
+_HEADER = struct.Struct("<QQ")
+# Record frame: payload length, crc32 of payload
+_FRAME = struct.Struct("<II")
+
+
+class _Segment:
+    def __init__(self, path: str, seq: int, size: int | None = None):
+        self.path = path
+        self.seq = seq
+        create = size is not None
+        self._file = open(path, "w+b" if create else "r+b")
+        if create:
+            self._file.truncate(size)
+        self.size = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), self.size)
+        if create:
+            self.write_off = self.read_off = _HEADER.size
+            self._sync_header()
+        else:
+            self.write_off, self.read_off = _HEADER.unpack_from(self._mm, 0)
+        self.records = self._recover()
+
+    def _recover(self) -> int:
+        """Count intact records, truncating at the first torn or corrupt one."""
+        count = 0
+        off = self.read_off
+        while off + _FRAME.size <= self.write_off:
+            length, crc = _FRAME.unpack_from(self._mm, off)
+            end = off + _FRAME.size + length
+            if end > self.write_off or zlib.crc32(self._mm[off + _FRAME.size:end]) != crc:
+                logger.warning("Spool segment %s truncated at offset %d", self.path, off)
+                break
+            count += 1
+            off = end
+        if off != self.write_off:
+            self.write_off = off
+            self._sync_header()
+        return count
+
+    def _sync_header(self):
+        _HEADER.pack_into(self._mm, 0, self.write_off, self.read_off)
+
+    def fits(self, length: int) -> bool:
+        return self.write_off + _FRAME.size + length <= self.size
+
+    def append(self, payload: bytes):
+        off = self.write_off
+        _FRAME.pack_into(self._mm, off, len(payload), zlib.crc32(payload))
+        start = off + _FRAME.size
+        self._mm[start:start + len(payload)] = payload
+        self.write_off = start + len(payload)
+        self.records += 1
+        self._sync_header()
+
+    def peek(self) -> bytes:
+        length, _ = _FRAME.unpack_from(self._mm, self.read_off)
+        start = self.read_off + _FRAME.size
+        return self._mm[start:start + length]
+
+    def pop(self):
+        length, _ = _FRAME.unpack_from(self._mm, self.read_off)
+        self.read_off += _FRAME.size + length
+        self.records -= 1
+        if self.records == 0:
+            # Fully replayed — rewind so the space is reused
+            self.write_off = self.read_off = _HEADER.size
+        self._sync_header()
+
+    @property
+    def unread_bytes(self) -> int:
+        return self.write_off - self.read_off
+
+    def close(self, delete: bool = False):
+        self._mm.close()
+        self._file.close()
+        if delete:
+            os.unlink(self.path)
+
+
+class SegmentSpool:
+    """Size-capped, append-only on-disk FIFO of failed write payloads.
+
+    Payloads go into fixed-size memory-mapped segment files named
+    ``spool-<seq>.seg``. Each segment keeps its write and read offsets in a
+    16-byte header, so a restarted feeder resumes replay where it stopped.
+    When the spool would grow past ``max_bytes``, the oldest segment is
+    dropped whole and its records are counted as evicted.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int, max_bytes: int):
+        self._dir = directory
+        self._segment_bytes = segment_bytes
+        self._max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._segments: list[_Segment] = []
+        for name in sorted(os.listdir(directory)):
+            if name.startswith("spool-") and name.endswith(".seg"):
+                seq = int(name[6:-4])
+                self._segments.append(_Segment(os.path.join(directory, name), seq))
+        # Drop fully replayed segments left behind by a previous run
+        while len(self._segments) > 1 and self._segments[0].records == 0:
+            self._segments.pop(0).close(delete=True)
+        self._next_seq = self._segments[-1].seq + 1 if self._segments else 0
+        self._update_metrics()
+        if self.records:
+            logger.info("Spool loaded — %d pending batches in %d segments", self.records, len(self._segments))
+
+    def __len__(self) -> int:
+        return self.records
+
+    @property
+    def records(self) -> int:
+        return sum(s.records for s in self._segments)
+
+    @property
+    def pending_bytes(self) -> int:
+        return sum(s.unread_bytes for s in self._segments)
+
+    @property
+    def disk_bytes(self) -> int:
+        return sum(s.size for s in self._segments)
+
+    def append(self, payload: bytes):
+        tail = self._segments[-1] if self._segments else None
+        if tail is None or not tail.fits(len(payload)):
+            tail = self._new_segment(len(payload))
+        tail.append(payload)
+        self._update_metrics()
+
+    def peek(self) -> bytes | None:
+        """Oldest pending payload, or None when the spool is empty."""
+        for segment in self._segments:
+            if segment.records:
+                return segment.peek()
+        return None
+
+    def pop(self):
+        """Discard the payload returned by the last ``peek``."""
+        for i, segment in enumerate(self._segments):
+            if segment.records:
+                segment.pop()
+                if segment.records == 0 and i < len(self._segments) - 1:
+                    segment.close(delete=True)
+                    del self._segments[i]
+                break
+        self._update_metrics()
+
+    def stats(self) -> dict:
+        return {
+            "records": self.records,
+            "bytes": self.pending_bytes,
+            "segments": len(self._segments),
+            "disk_bytes": self.disk_bytes,
+        }
+
+    def close(self):
+        for segment in self._segments:
+            segment.close()
+        self._segments = []
+
+    def _new_segment(self, length: int) -> _Segment:
+        size = max(self._segment_bytes, _HEADER.size + _FRAME.size + length)
+        while self._segments and self.disk_bytes + size > self._max_bytes:
+            oldest = self._segments.pop(0)
+            if oldest.records:
+                SPOOL_EVICTED.inc(oldest.records)
+                logger.warning("Spool full — evicted %d batches from %s", oldest.records, oldest.path)
+            oldest.close(delete=True)
+        seq = self._next_seq
+        self._next_seq += 1
+        segment = _Segment(os.path.join(self._dir, f"spool-{seq:08d}.seg"), seq, size)
+        self._segments.append(segment)
+        return segment
+
+    def _update_metrics(self):
+        SPOOL_RECORDS.set(self.records)
+        SPOOL_BYTES.set(self.pending_bytes)
@@ -11,6 +11,9 @@ class Settings(BaseSettings):
     default_timeframe: str = "1h"
     default_exchange: str = "all"
 
+    # Shared symbol registry (mounted from config/symbols.json)
+    symbols_file: str = "/etc/bloomberg/symbols.json"
+
     # Auto-cycle
     cycle_interval_min: int = 10
     cycle_interval_max: int = 300
@@ -26,13 +29,6 @@ class Settings(BaseSettings):
     model_config = {"env_prefix": "KIOSK_", "case_sensitive": False}
 
 
-ASSETS = [
-    "BTC", "ETH", "SOL", "BNB", "XRP",
-    "AAPL", "MSFT", "TSLA",
-    "SP500", "NASDAQ", "EURUSD", "GBPUSD",
-    "GOLD", "CRUDE_OIL",
-]
-
 TIMEFRAMES = ["5m", "15m", "1h", "4h", "1d"]
 
 EXCHANGES = ["all", "coingecko", "yahoo"]
@@ -1,8 +1,9 @@
 import asyncio
 import logging
 
-from config import ASSETS, DASHBOARDS
+from config import DASHBOARDS
 from state import state_manager
+from symbols import ASSETS
 from ws_manager import ws_manager
 
 logger = logging.getLogger("kiosk.cycle")
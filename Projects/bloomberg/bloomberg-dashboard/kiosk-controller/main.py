@@ -9,8 +9,9 @@ from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 
-from config import settings, ASSETS, TIMEFRAMES, EXCHANGES, DASHBOARDS
+from config import settings, TIMEFRAMES, EXCHANGES, DASHBOARDS
 from state import state_manager
+from symbols import ASSETS
 from ws_manager import ws_manager
 from cycle import start_cycle, stop_cycle, is_cycling
 
@@ -0,0 +1,23 @@
+import json
+import logging
+import os
+
+from config import settings
+
+logger = logging.getLogger("kiosk.symbols")
+
+# Repository copy, used when running outside the container (local dev)
+_REPO_FILE = os.path.join(os.path.dirname(__file__), "..", "config", "symbols.json")
+
+
+def _load(path: str) -> list[str]:
+    if not os.path.exists(path) and os.path.exists(_REPO_FILE):
+        path = _REPO_FILE
+    with open(path) as f:
+        assets = [entry["symbol"] for entry in json.load(f)["symbols"]]
+    logger.info("Symbol registry loaded from %s — %d symbols", path, len(assets))
+    return assets
+
+
+# Canonical symbols offered by the kiosk, in registry order
+ASSETS = _load(settings.symbols_file)
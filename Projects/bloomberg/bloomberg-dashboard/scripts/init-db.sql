@@ -57,6 +57,24 @@ CREATE TABLE IF NOT EXISTS api_users (
     last_login_at TIMESTAMP WITH TIME ZONE
 );
 
+-- Sharding des collectors : instances vivantes et baux de partitions
+-- (le market-feeder crée aussi ces tables au démarrage en mode shard)
+CREATE TABLE IF NOT EXISTS feeder_instances (
+    service VARCHAR(50) NOT NULL,
+    instance_id VARCHAR(100) NOT NULL,
+    started_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    heartbeat_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (service, instance_id)
+);
+
+CREATE TABLE IF NOT EXISTS feeder_partition_leases (
+    service VARCHAR(50) NOT NULL,
+    partition INTEGER NOT NULL,
+    owner VARCHAR(100) NOT NULL,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (service, partition)
+);
+
 -- Index pour les performances
 CREATE INDEX IF NOT EXISTS idx_watchlists_user_id ON watchlists(user_id);
 CREATE INDEX IF NOT EXISTS idx_alert_rules_user_id ON alert_rules(user_id);